@@ -0,0 +1,59 @@
+"""
+Measure runtime and memory usage of the conversion.
+
+```
+poetry run python -m benchmarks.convert_memory data/conceptnet-assertions-5.7.0.csv.gz --debug
+```
+
+The peak of the Python heap is measured with `tracemalloc`, which slows down
+the conversion considerably. The runtime is thus measured in a separate run.
+"""
+
+import resource
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from knowledge_graph import convert_csv
+
+
+@click.command()
+@click.argument("conceptnet_csv", default="data/conceptnet-assertions-5.7.0.csv.gz")
+@click.option("--debug", is_flag=True)
+@click.option("--memory-budget", type=int)
+def main(conceptnet_csv: str, debug: bool, memory_budget: Optional[int]) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+
+        def run() -> float:
+            start = time.perf_counter()
+            convert_csv.convert(
+                conceptnet_csv,
+                Path(tmp, "nodes.csv"),
+                Path(tmp, "relationships.csv"),
+                debug=debug,
+                memory_budget=memory_budget,
+                spill_dir=tmp,
+            )
+
+            return time.perf_counter() - start
+
+        duration = run()
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        tracemalloc.start()
+        run()
+        _, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    click.echo()
+    click.echo(f"seconds: {duration:.2f}")
+    click.echo(f"peak RSS: {max_rss / 1024:.1f} MiB")
+    click.echo(f"peak heap (tracemalloc): {heap_peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Measure how the conversion scales with the number of worker processes.
+
+```
+poetry run python -m benchmarks.convert_workers data/conceptnet-assertions-5.7.0.csv.gz
+```
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from knowledge_graph import convert_csv
+
+
+@click.command()
+@click.argument("conceptnet_csv", default="data/conceptnet-assertions-5.7.0.csv.gz")
+@click.option("--max-workers", default=8, show_default=True)
+@click.option("--batch-size", default=20000, show_default=True)
+def main(conceptnet_csv: str, max_workers: int, batch_size: int) -> None:
+    worker_counts = [1]
+
+    while worker_counts[-1] * 2 <= max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+
+    if worker_counts[-1] != max_workers:
+        worker_counts.append(max_workers)
+
+    baseline = None
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in worker_counts:
+            start = time.perf_counter()
+            convert_csv.convert(
+                conceptnet_csv,
+                Path(tmp, "nodes.csv"),
+                Path(tmp, "relationships.csv"),
+                workers=workers,
+                batch_size=batch_size,
+            )
+            duration = time.perf_counter() - start
+            baseline = baseline or duration
+            results.append((workers, duration, baseline / duration))
+
+    click.echo()
+    click.echo(f"{'workers':>8} {'seconds':>10} {'speedup':>8} {'efficiency':>10}")
+
+    for workers, duration, speedup in results:
+        click.echo(
+            f"{workers:>8} {duration:>10.2f} {speedup:>7.2f}x {speedup / workers:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
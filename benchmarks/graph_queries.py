@@ -0,0 +1,116 @@
+"""
+Compare the queries of `knowledge_graph.graph` with the equivalent Cypher.
+
+Requires the CSR arrays of `convert --csr` and, unless `--no-cypher` is passed,
+the database of the same conversion configured in `.env`.
+
+```
+poetry run python -m benchmarks.graph_queries data/neo4j/import/csr
+```
+
+Cypher has no weighted shortest path without plugins,
+so paths are only measured for the in-process graph.
+"""
+
+import random
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import click
+
+from knowledge_graph import database
+from knowledge_graph.graph import Graph
+
+_cypher_neighbors = """
+UNWIND $uris AS uri
+MATCH (:Concept {uri: uri})-[r]->(m:Concept)
+WHERE r.weight >= $min_weight
+RETURN uri, m.uri
+"""
+
+_cypher_expand = """
+UNWIND $uris AS uri
+MATCH (:Concept {uri: uri})-[*..%d]->(m:Concept)
+RETURN DISTINCT uri, m.uri
+"""
+
+
+@click.command()
+@click.argument("csr_dir", default="data/neo4j/import/csr")
+@click.option("--queries", default=10000, show_default=True)
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--hops", default=2, show_default=True)
+@click.option("--min-weight", default=1.0, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+@click.option("--no-cypher", is_flag=True, help="Skip the queries to the database.")
+def main(
+    csr_dir: str,
+    queries: int,
+    batch_size: int,
+    hops: int,
+    min_weight: float,
+    seed: int,
+    no_cypher: bool,
+) -> None:
+    graph = Graph.load(Path(csr_dir))
+    rng = random.Random(seed)
+    uris = graph.uris(rng.randrange(graph.node_count) for _ in range(queries))
+    batches = [uris[i : i + batch_size] for i in range(0, len(uris), batch_size)]
+
+    def measure(name: str, count: int, run: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        run()
+        duration = time.perf_counter() - start
+        click.echo(f"{name:<32} {count / duration:>12.0f} queries/s")
+
+    def neighbors() -> None:
+        for batch in batches:
+            graph.neighbors(graph.ids(batch), min_weight=min_weight)
+
+    def expand() -> None:
+        for batch in batches:
+            graph.expand(graph.ids(batch), hops)
+
+    def paths() -> None:
+        ids = graph.ids(uris).tolist()
+        graph.shortest_paths(zip(ids, ids[1:] + ids[:1]), max_cost=hops)
+
+    measure("graph neighbors", queries, neighbors)
+    measure(f"graph {hops}-hop expansion", queries, expand)
+    measure("graph shortest paths", queries, paths)
+
+    if no_cypher:
+        return
+
+    driver = database.driver()
+
+    with driver.session() as session:
+
+        def run_cypher(query: str, batches: List[List[str]]) -> Callable[[], None]:
+            def run() -> None:
+                for batch in batches:
+                    session.run(query, uris=batch, min_weight=min_weight).consume()
+
+            return run
+
+        single = [[uri] for uri in uris[: queries // 10]]
+        measure(
+            "cypher neighbors, one per query",
+            len(single),
+            run_cypher(_cypher_neighbors, single),
+        )
+        measure(
+            "cypher neighbors, UNWIND", queries, run_cypher(_cypher_neighbors, batches)
+        )
+        measure(
+            f"cypher {hops}-hop expansion, UNWIND",
+            queries,
+            run_cypher(_cypher_expand % hops, batches),
+        )
+
+    driver.close()
+
+
+if __name__ == "__main__":
+    main()
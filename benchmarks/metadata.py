@@ -0,0 +1,62 @@
+"""
+Compare the throughput of the metadata extraction with `ast.literal_eval`.
+
+```
+poetry run python -m benchmarks.metadata data/conceptnet-assertions-5.7.0.csv.gz
+```
+"""
+
+import ast
+import csv
+import gzip
+import itertools
+import time
+from typing import Callable, List
+
+import click
+
+from knowledge_graph.metadata import Metadata
+
+
+def _literal_eval(text: str) -> float:
+    return float(ast.literal_eval(text).get("weight", 1.0))
+
+
+def _metadata(text: str) -> float:
+    return Metadata.parse(text).weight
+
+
+@click.command()
+@click.argument("conceptnet_csv", default="data/conceptnet-assertions-5.7.0.csv.gz")
+@click.option("--rows", default=200000, show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+def main(conceptnet_csv: str, rows: int, repeat: int) -> None:
+    with gzip.open(conceptnet_csv, "rt") as f:
+        reader = csv.reader(f, delimiter="\t")
+        texts = [row[4] for row in itertools.islice(reader, rows)]
+
+    click.echo(f"{'parser':>14} {'rows/s':>12}")
+    baseline = None
+
+    for name, parse in (("literal_eval", _literal_eval), ("Metadata.parse", _metadata)):
+        throughput = _measure(parse, texts, repeat)
+        baseline = baseline or throughput
+        click.echo(f"{name:>14} {throughput:>12,.0f} ({throughput / baseline:.1f}x)")
+
+
+def _measure(parse: Callable[[str], float], texts: List[str], repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for text in texts:
+            parse(text)
+
+        best = min(best, time.perf_counter() - start)
+
+    return len(texts) / best
+
+
+if __name__ == "__main__":
+    main()
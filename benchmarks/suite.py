@@ -0,0 +1,220 @@
+"""
+Benchmark suite whose results can be compared between commits.
+
+A synthetic dump (see `benchmarks.synthetic`) is converted in a separate process
+to measure throughput, peak memory and output size. Micro-benchmarks cover the
+URI helpers and the node and relationship objects of the conversion.
+The results are written as JSON, by default to `benchmarks/results/<commit>.json`.
+
+```
+poetry run python -m benchmarks.suite --rows 200000
+poetry run python -m benchmarks.suite --compare benchmarks/results/<old commit>.json
+```
+"""
+
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import click
+
+import knowledge_graph
+from knowledge_graph import convert_csv, uri
+from knowledge_graph.convert_csv import Node, Relationship
+from knowledge_graph.metadata import Metadata
+
+from . import synthetic
+
+Results = Dict[str, Any]
+
+_assertion = "/a/[/r/RelatedTo/,/c/en/cat/n/,/c/en/animal/]"
+_start = Node.from_uri("/c/en/cat/n")
+_end = Node.from_uri("/c/en/animal")
+_relationship = Relationship.from_uri("/r/RelatedTo", _start, _end, Metadata())
+
+micro_benchmarks: Dict[str, Callable[[], Any]] = {
+    "join_uri": lambda: uri.join_uri("/c", "en", "cat"),
+    "concept_uri": lambda: uri.concept_uri("en", "cat", "n"),
+    "split_uri": lambda: uri.split_uri("/c/en/cat/n/animal"),
+    "uri_prefix": lambda: uri.uri_prefix("/c/en/cat/n/animal"),
+    "assertion_uri": lambda: uri.assertion_uri(
+        "/r/RelatedTo", "/c/en/cat/n", "/c/en/animal"
+    ),
+    "parse_compound_uri": lambda: uri.parse_compound_uri(_assertion),
+    "get_uri_language": lambda: uri.get_uri_language(_assertion),
+    "uri_to_label": lambda: uri.uri_to_label("/c/en/canary_islands/n"),
+    "Node.from_uri": lambda: Node.from_uri("/c/en/cat/n/wn/animal"),
+    "Node.uri": lambda: _start.uri,
+    "Relationship.uri": lambda: _relationship.uri,
+}
+
+
+def _convert(dump: str, directory: str) -> float:
+    start = time.perf_counter()
+    convert_csv.convert(
+        dump, Path(directory, "nodes.csv"), Path(directory, "relationships.csv")
+    )
+
+    return time.perf_counter() - start
+
+
+def run_convert(dump: Path, rows: int) -> Results:
+    with tempfile.TemporaryDirectory() as tmp:
+        # A fresh process per run, so the peak RSS belongs to the conversion alone.
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            duration = pool.apply(_convert, (str(dump), tmp))
+
+        max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        output_bytes = sum(path.stat().st_size for path in Path(tmp).iterdir())
+
+    return {
+        "rows": rows,
+        "seconds": duration,
+        "rows_per_second": rows / duration,
+        "peak_rss_mib": max_rss / 1024,
+        "input_bytes": dump.stat().st_size,
+        "output_bytes": output_bytes,
+    }
+
+
+def run_micro(repeat: int) -> Results:
+    results = {}
+
+    for name, function in micro_benchmarks.items():
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat, number)) / number
+        results[name] = {"ops_per_second": 1 / best}
+
+    return results
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metrics(results: Results) -> Dict[str, Tuple[float, bool]]:
+    """Flatten the results to values and whether higher values are better."""
+
+    metrics = {
+        "convert rows/s": (results["convert"]["rows_per_second"], True),
+        "convert peak RSS (MiB)": (results["convert"]["peak_rss_mib"], False),
+        "convert output (bytes)": (results["convert"]["output_bytes"], False),
+    }
+
+    for name, micro in results["micro"].items():
+        metrics[f"{name} ops/s"] = (micro["ops_per_second"], True)
+
+    return metrics
+
+
+def compare(previous: Results, current: Results, tolerance: float) -> bool:
+    """Print the relative changes and return whether any metric regressed."""
+
+    old_metrics = _metrics(previous)
+    regressed = False
+
+    click.echo(f"\nChanges since {previous.get('commit') or 'previous run'}:")
+
+    for name, (value, higher_is_better) in _metrics(current).items():
+        if name not in old_metrics or not old_metrics[name][0]:
+            continue
+
+        change = value / old_metrics[name][0] - 1
+        worse = -change if higher_is_better else change
+        flag = ""
+
+        if worse > tolerance:
+            regressed = True
+            flag = "  REGRESSION"
+
+        click.echo(f"{name:>28} {change:>+8.1%}{flag}")
+
+    return regressed
+
+
+@click.command()
+@click.option("--rows", default=200000, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+@click.option("--repeat", default=5, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False))
+@click.option(
+    "--compare",
+    "previous_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Results of an earlier run to compare with.",
+)
+@click.option(
+    "--tolerance",
+    default=0.1,
+    show_default=True,
+    help="Relative change that counts as a regression.",
+)
+def main(
+    rows: int,
+    seed: int,
+    repeat: int,
+    output: Optional[str],
+    previous_path: Optional[str],
+    tolerance: float,
+) -> None:
+    commit = _commit()
+    results: Results = {
+        "commit": commit,
+        "version": knowledge_graph.__version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "seed": seed,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = Path(tmp, "synthetic.csv.gz")
+        click.echo(f"Generating {rows} assertions")
+        synthetic.generate(dump, rows, seed)
+        results["convert"] = run_convert(dump, rows)
+
+    results["micro"] = run_micro(repeat)
+
+    convert = results["convert"]
+    click.echo()
+    click.echo(f"{'convert rows/s':>28} {convert['rows_per_second']:>14,.0f}")
+    click.echo(f"{'convert peak RSS (MiB)':>28} {convert['peak_rss_mib']:>14.1f}")
+    click.echo(f"{'convert output (bytes)':>28} {convert['output_bytes']:>14,}")
+
+    for name, micro in results["micro"].items():
+        click.echo(f"{name + ' ops/s':>28} {micro['ops_per_second']:>14,.0f}")
+
+    output_path = Path(output or f"benchmarks/results/{commit or 'latest'}.json")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with output_path.open("w") as f:
+        json.dump(results, f, indent=2)
+
+    click.echo(f"\nWrote {output_path}")
+
+    if previous_path:
+        with open(previous_path) as f:
+            previous = json.load(f)
+
+        if compare(previous, results, tolerance):
+            raise click.ClickException("Performance regressed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Generate a synthetic dump of assertions that resembles ConceptNet.
+
+The same seed always produces the same file, so benchmark results of
+different commits are comparable without downloading the real dump.
+
+```
+poetry run python -m benchmarks.synthetic data/synthetic.csv.gz --rows 1000000
+```
+
+The dump mixes languages (about half of the concepts are English or German),
+adds part-of-speech suffixes and sense labels to some concepts, repeats
+assertions with other datasets and weights, and contains `dbpedia/` relations
+as well as external URLs. Concept frequencies follow a Zipf distribution.
+"""
+
+import gzip
+import itertools
+import json
+import random
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import click
+
+from knowledge_graph.uri import assertion_uri, concept_uri, join_uri
+
+# Approximate shares in the real dump.
+languages = {
+    "en": 0.35,
+    "de": 0.1,
+    "fr": 0.15,
+    "ja": 0.08,
+    "it": 0.08,
+    "es": 0.07,
+    "ru": 0.07,
+    "nl": 0.05,
+    "zh": 0.05,
+}
+relations = {
+    "RelatedTo": 0.35,
+    "FormOf": 0.1,
+    "Synonym": 0.1,
+    "DerivedFrom": 0.08,
+    "IsA": 0.07,
+    "ExternalURL": 0.07,
+    "AtLocation": 0.04,
+    "UsedFor": 0.04,
+    "HasContext": 0.04,
+    "Antonym": 0.03,
+    "dbpedia/genre": 0.03,
+    "dbpedia/occupation": 0.03,
+    "PartOf": 0.03,
+}
+datasets = ["/d/wiktionary/en", "/d/conceptnet/4/en", "/d/wordnet/3.1", "/d/verbosity"]
+weights = [1.0, 1.0, 1.0, 2.0, 0.5, 0.25, 4.0]
+pos_tags = "nvars"
+syllables = ["ka", "te", "ru", "mi", "so", "lo", "ber", "an", "ä", "ö", "é", "ß"]
+
+duplicate_share = 0.1
+pos_share = 0.4
+sense_share = 0.05
+compound_share = 0.15
+
+
+def _words(rng: random.Random, count: int) -> List[str]:
+    words = set()
+
+    while len(words) < count:
+        word = "".join(rng.choices(syllables, k=rng.randint(2, 5)))
+
+        if rng.random() < compound_share:
+            word += "_" + "".join(rng.choices(syllables, k=rng.randint(2, 4)))
+
+        words.add(word)
+
+    return sorted(words)
+
+
+def assertions(rows: int, seed: int = 0) -> Iterator[Tuple[str, ...]]:
+    """Generate `rows` assertions with the fields of the dump."""
+
+    rng = random.Random(seed)
+    words = _words(rng, max(10, rows // 3))
+    word_weights = list(
+        itertools.accumulate(1 / rank for rank in range(1, len(words) + 1))
+    )
+    language_names, language_weights = zip(*languages.items())
+    relation_names, relation_weights = zip(*relations.items())
+
+    def concept() -> str:
+        language = rng.choices(language_names, language_weights)[0]
+        word = rng.choices(words, cum_weights=word_weights)[0]
+        more = []
+
+        if rng.random() < pos_share:
+            more.append(rng.choice(pos_tags))
+
+            if rng.random() < sense_share / pos_share:
+                more.extend(["wn", rng.choice(words)])
+
+        return concept_uri(language, word, *more)
+
+    count = 0
+
+    while count < rows:
+        relation = join_uri("r", rng.choices(relation_names, relation_weights)[0])
+        start = concept()
+
+        if relation == "/r/ExternalURL":
+            end = f"http://dbpedia.org/resource/{rng.choice(words).title()}"
+        else:
+            end = concept()
+
+        uri = assertion_uri(relation, start, end)
+        copies = 2 if rng.random() < duplicate_share else 1
+
+        for _ in range(min(copies, rows - count)):
+            metadata = {
+                "dataset": rng.choice(datasets),
+                "license": "cc:by-sa/4.0",
+                "sources": [{"contributor": "/s/resource/synthetic"}],
+                "weight": rng.choice(weights),
+            }
+            count += 1
+
+            yield uri, relation, start, end, json.dumps(metadata)
+
+
+def generate(path: Path, rows: int, seed: int = 0) -> None:
+    # Without a file name and mtime in the header, the same seed gives the same bytes.
+    with path.open("wb") as raw, gzip.GzipFile("", "wb", fileobj=raw, mtime=0) as f:
+        for row in assertions(rows, seed):
+            f.write(("\t".join(row) + "\n").encode("utf-8"))
+
+
+@click.command()
+@click.argument("path", default="data/synthetic.csv.gz")
+@click.option("--rows", default=1000000, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(path: str, rows: int, seed: int) -> None:
+    generate(Path(path), rows, seed)
+    click.echo(f"Wrote {rows} assertions to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare the batched `UriCodec` with calling the functions of `uri.py` per URI.
+
+```
+poetry run python -m benchmarks.uri_codec --rows 200000
+```
+
+The URIs are taken from a synthetic dump (see `benchmarks.synthetic`),
+so concepts repeat with a realistic frequency.
+"""
+
+import time
+from typing import Any, Callable, List
+
+import click
+
+from knowledge_graph import uri
+from knowledge_graph.uri_codec import UriCodec
+
+from . import synthetic
+
+
+def _parse_concepts(uris: List[str]) -> Any:
+    columns: List[List[Any]] = [[], [], [], []]
+
+    for concept in uris:
+        pieces = uri.split_uri(concept)
+        columns[0].append(pieces[1])
+        columns[1].append(pieces[2])
+        columns[2].append(pieces[3] if len(pieces) > 3 else None)
+        columns[3].append("/".join(pieces[4:]) if len(pieces) > 4 else None)
+
+    return columns
+
+
+def _build_concepts(columns: Any) -> List[str]:
+    result = []
+
+    for language, text, pos, disambiguation in zip(*columns):
+        more = [] if pos is None else [pos]
+
+        if pos is not None and disambiguation is not None:
+            more.extend(disambiguation.split("/"))
+
+        result.append(uri.concept_uri(language, text, *more))
+
+    return result
+
+
+def _measure(function: Callable[[], Any], count: int, repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best / count * 1e9
+
+
+@click.command()
+@click.option("--rows", default=200000, show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(rows: int, repeat: int, seed: int) -> None:
+    assertions = [
+        row for row in synthetic.assertions(rows, seed) if uri.is_concept(row[3])
+    ]
+    concepts = [row[2] for row in assertions] + [row[3] for row in assertions]
+    relations = [row[1] for row in assertions]
+    starts = [row[2] for row in assertions]
+    ends = [row[3] for row in assertions]
+    assertion_uris = [row[0] for row in assertions]
+
+    codec = UriCodec()
+    columns = codec.parse_concepts(concepts)
+
+    cases = [
+        (
+            "parse concepts",
+            len(concepts),
+            lambda: _parse_concepts(concepts),
+            lambda: codec.parse_concepts(concepts),
+        ),
+        (
+            "build concepts",
+            len(concepts),
+            lambda: _build_concepts(columns),
+            lambda: codec.build_concepts(*columns),
+        ),
+        (
+            "parse assertions",
+            len(assertion_uris),
+            lambda: [uri.parse_compound_uri(a) for a in assertion_uris],
+            lambda: codec.parse_assertions(assertion_uris),
+        ),
+        (
+            "build assertions",
+            len(assertions),
+            lambda: [uri.assertion_uri(*a) for a in zip(relations, starts, ends)],
+            lambda: codec.build_assertions(relations, starts, ends),
+        ),
+    ]
+
+    click.echo(f"{'':>18} {'uri.py ns/URI':>14} {'codec ns/URI':>14} {'speedup':>8}")
+
+    for name, count, baseline, batched in cases:
+        before = _measure(baseline, count, repeat)
+        after = _measure(batched, count, repeat)
+        click.echo(f"{name:>18} {before:>14.0f} {after:>14.0f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Apply the output of `convert --since` to the running database.
+
+Relationships are removed first, then nodes are removed and added,
+and finally relationships are added and reweighted.
+Each batch of rows is sent as a single `UNWIND` query in its own transaction.
+Cypher does not allow parameters for relationship types,
+so the relationships are grouped by their type (the delta is sorted by it).
+"""
+
+import csv
+import itertools
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+import click
+
+from . import database, delta
+from .uri import assertion_uri, join_uri
+
+Row = Dict[str, Any]
+
+_remove_relationships = """
+UNWIND $rows AS row
+MATCH (:Concept {uri: row.start})-[r:`%s`]->(:Concept {uri: row.end})
+DELETE r
+"""
+
+_remove_nodes = """
+UNWIND $rows AS row
+MATCH (n:Concept {uri: row.uri})
+DETACH DELETE n
+"""
+
+_add_nodes = """
+UNWIND $rows AS row
+MERGE (n:Concept {uri: row.uri})
+SET n.name = row.name, n.language = row.language, n.pos = row.pos,
+    n.source = 'conceptnet'
+"""
+
+_add_relationships = """
+UNWIND $rows AS row
+MATCH (start:Concept {uri: row.start}), (end:Concept {uri: row.end})
+MERGE (start)-[r:`%s`]->(end)
+SET r.uri = row.uri, r.weight = row.weight, r.source = 'conceptnet'
+"""
+
+_reweight_relationships = """
+UNWIND $rows AS row
+MATCH (:Concept {uri: row.start})-[r:`%s`]->(:Concept {uri: row.end})
+SET r.weight = row.weight
+"""
+
+
+@click.command("apply-delta")
+@click.argument("delta_dir", default="data/neo4j/import/delta/")
+@click.option("--batch-size", default=10000, show_default=True)
+def main(delta_dir: str, batch_size: int) -> None:
+    steps = [
+        (delta.relationships_removed, _remove_relationships, _relationship_row),
+        (delta.nodes_removed, _remove_nodes, _node_row),
+        (delta.nodes_added, _add_nodes, _node_row),
+        (delta.relationships_added, _add_relationships, _relationship_row),
+        (delta.relationships_reweighted, _reweight_relationships, _relationship_row),
+    ]
+    driver = database.driver()
+
+    with driver.session() as session:
+        for filename, query, parse in steps:
+            path = Path(delta_dir, filename)
+            count = 0
+
+            for batch_query, batch in _batches(path, query, parse, batch_size):
+                session.write_transaction(_run, batch_query, batch)
+                count += len(batch)
+
+            click.echo(f"Applied {count} rows of {filename}")
+
+    database.next_generation(driver)
+    driver.close()
+
+
+def _run(tx, query: str, rows: List[Row]) -> None:
+    tx.run(query, rows=rows).consume()
+
+
+def _node_row(row: Row) -> Row:
+    return row
+
+
+def _relationship_row(row: Row) -> Row:
+    if "weight" in row:
+        row["weight"] = float(row["weight"])
+        row["uri"] = assertion_uri(join_uri("r", row["type"]), row["start"], row["end"])
+
+    return row
+
+
+def _batches(
+    path: Path, query: str, parse: Callable[[Row], Row], batch_size: int
+) -> Iterator[Tuple[str, List[Row]]]:
+    with path.open(newline="") as f:
+        rows: Iterable[Row] = map(parse, csv.DictReader(f))
+
+        if "%s" not in query:
+            groups: Iterable = [(query, rows)]
+        else:
+            groups = (
+                (query % _escape(category), group)
+                for category, group in itertools.groupby(rows, lambda row: row["type"])
+            )
+
+        for group_query, group in groups:
+            while True:
+                batch = list(itertools.islice(group, batch_size))
+
+                if not batch:
+                    break
+
+                yield group_query, batch
+
+
+def _escape(category: str) -> str:
+    """
+    >>> _escape("Weird`Type")
+    'Weird``Type'
+    """
+    return category.replace("`", "``")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,61 @@
+import sys
+from pathlib import Path
+from typing import Optional
+
 import click
 
-from . import convert_csv, import_csv, post_process
+from . import (
+    apply_delta,
+    convert_csv,
+    gzip_index,
+    import_csv,
+    load_postgres,
+    metrics,
+    node_stats,
+    post_process,
+    service,
+)
+
+
+class _InstrumentedGroup(click.Group):
+    """Report the metrics of all chained commands, even if one of them fails."""
+
+    def invoke(self, ctx: click.Context):
+        completed = False
+
+        try:
+            result = super().invoke(ctx)
+            completed = True
+
+            return result
+        finally:
+            click.echo(metrics.run.summary(), err=True)
+            metrics_json: Optional[str] = ctx.params.get("metrics_json")
+
+            if metrics_json:
+                metrics.run.write(
+                    Path(metrics_json), command=sys.argv[1:], completed=completed
+                )
 
 
-@click.group(chain=True)
-def main():
+@click.group(chain=True, cls=_InstrumentedGroup)
+@click.option(
+    "--metrics-json",
+    type=click.Path(dir_okay=False),
+    help="Write phase timings, counters and peak memory of the run to this file.",
+)
+def main(metrics_json: Optional[str]):
     pass
 
 
+main.add_command(gzip_index.main)
 main.add_command(convert_csv.main)
+main.add_command(node_stats.main)
 main.add_command(import_csv.main)
 main.add_command(post_process.main)
+main.add_command(apply_delta.main)
+main.add_command(load_postgres.main)
+main.add_command(service.main)
 
 
 if __name__ == "__main__":
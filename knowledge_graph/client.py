@@ -0,0 +1,303 @@
+"""
+Read-side API for the concept graph in the database configured in `.env`.
+
+```
+with Client() as client:
+    cats = client.concepts([("cat", "en"), ("katze", "de")])
+    neighbors = client.neighbors(["/c/en/cat/noun"], relations=["IsA"])
+    weights = client.weights([("/c/en/cat/noun", "/c/en/animal")])
+```
+
+Each method takes a batch of keys and returns one result per key.
+The keys that are not cached are looked up with a single `UNWIND` query.
+Results are cached for `ttl` seconds, but only as long as the graph is not
+changed: every `generation_interval` seconds, the generation of the graph is
+checked (see `database.generation`) and the cache is cleared when it differs.
+The cache holds at most `cache_size` concepts, neighbors and weights, so the
+results of a few hubs take the place of many small results.
+"""
+
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+from neo4j import Driver
+
+from . import database
+
+K = t.TypeVar("K")
+V = t.TypeVar("V")
+
+
+class TtlCache(t.Generic[K, V]):
+    """Thread-safe LRU mapping whose entries expire after `ttl` seconds.
+
+    The summed `sizeof` of the values (one per entry by default) is at most
+    `maxsize`, the least recently used entries are evicted first.
+    `epoch` counts the calls of `clear`: a value that was looked up before is
+    only stored if `put` gets the epoch from before the lookup and it is current.
+
+    >>> cache = TtlCache(2, ttl=60.0)
+    >>> cache.put("a", 1); cache.put("b", 2); cache.put("c", 3)
+    >>> cache.get("a"), cache.get("c"), (cache.hits, cache.misses)
+    (None, 3, (1, 1))
+    >>> cache = TtlCache(3, ttl=60.0, sizeof=len)
+    >>> cache.put("a", [1]); cache.put("b", [1, 2, 3])
+    >>> cache.get("a"), cache.get("b"), cache.size
+    (None, [1, 2, 3], 3)
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: t.Callable[[], float] = time.monotonic,
+        sizeof: t.Callable[[V], int] = lambda value: 1,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.size = 0
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._sizeof = sizeof
+        self._items: "OrderedDict[K, t.Tuple[float, V, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K, default: t.Optional[V] = None) -> t.Optional[V]:
+        with self._lock:
+            item = self._items.get(key)
+
+            if item is None or item[0] < self._clock():
+                if item is not None:
+                    self._remove(key)
+
+                self.misses += 1
+                return default
+
+            self._items.move_to_end(key)
+            self.hits += 1
+
+            return item[1]
+
+    def put(self, key: K, value: V, epoch: t.Optional[int] = None) -> None:
+        size = self._sizeof(value)
+
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+
+            if key in self._items:
+                self._remove(key)
+
+            self._items[key] = (self._clock() + self.ttl, value, size)
+            self.size += size
+
+            while self.size > self.maxsize:
+                self._remove(next(iter(self._items)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+            self.epoch += 1
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _remove(self, key: K) -> None:
+        self.size -= self._items.pop(key)[2]
+
+
+def result_size(value: t.Sized) -> int:
+    """Size of a cached result, which counts its concepts, neighbors or weights.
+
+    >>> result_size([]), result_size({"IsA": 2.0, "RelatedTo": 1.0})
+    (1, 2)
+    """
+    return max(1, len(value))
+
+
+class Concept(t.NamedTuple):
+    uri: str
+    name: str
+    language: str
+    pos: str
+
+
+class Neighbor(t.NamedTuple):
+    relation: str
+    uri: str
+    weight: float
+
+
+_concepts = """
+UNWIND $keys AS key
+MATCH (n:Concept {language: key[1], name: key[0]})
+RETURN key, n.uri AS uri, n.name AS name, n.language AS language, n.pos AS pos
+ORDER BY uri
+"""
+
+_neighbors = """
+UNWIND $uris AS uri
+MATCH (:Concept {uri: uri})%s(m:Concept)
+WHERE $relations IS NULL OR type(r) IN $relations
+RETURN uri, type(r) AS relation, m.uri AS neighbor, r.weight AS weight
+ORDER BY weight DESC, neighbor
+"""
+
+_weights = """
+UNWIND $pairs AS pair
+MATCH (:Concept {uri: pair[0]})-[r]->(:Concept {uri: pair[1]})
+WHERE $relations IS NULL OR type(r) IN $relations
+RETURN pair, type(r) AS relation, r.weight AS weight
+"""
+
+_patterns = {"out": "-[r]->", "in": "<-[r]-", "both": "-[r]-"}
+_missing = object()
+
+
+class Client:
+    """Batched and cached lookups with a pooled driver (see `database.driver`)."""
+
+    def __init__(
+        self,
+        driver: t.Optional[Driver] = None,
+        cache_size: int = 100000,
+        ttl: float = 300.0,
+        generation_interval: float = 10.0,
+    ):
+        self.driver = driver or database.driver()
+        self.cache: TtlCache[t.Hashable, t.Any] = TtlCache(
+            cache_size, ttl, sizeof=result_size
+        )
+        self._owns_driver = driver is None
+        self._generation_interval = generation_interval
+        self._generation: t.Optional[str] = None
+        self._generation_checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def concepts(self, keys: t.Sequence[t.Tuple[str, str]]) -> t.List[t.List[Concept]]:
+        """Concepts by `(name, language)`, e.g., `("cat", "en")` finds all POS."""
+
+        def fetch(tx, missing):
+            found: t.Dict[t.Tuple[str, str], t.List[Concept]] = {}
+
+            for record in tx.run(_concepts, keys=[list(key) for key in missing]):
+                concept = Concept(*(record[f] for f in Concept._fields))
+                found.setdefault(tuple(record["key"]), []).append(concept)
+
+            return found
+
+        return self._lookup("concepts", [tuple(key) for key in keys], fetch, list)
+
+    def neighbors(
+        self,
+        uris: t.Sequence[str],
+        relations: t.Optional[t.Iterable[str]] = None,
+        direction: str = "out",
+    ) -> t.List[t.List[Neighbor]]:
+        """Relationships of the concepts (optionally only of some types),
+        ordered by descending weight.
+        """
+
+        query = _neighbors % _patterns[direction]
+        selected = None if relations is None else sorted(set(relations))
+
+        def fetch(tx, missing):
+            found: t.Dict[str, t.List[Neighbor]] = {}
+
+            for record in tx.run(query, uris=list(missing), relations=selected):
+                neighbor = Neighbor(
+                    record["relation"], record["neighbor"], record["weight"]
+                )
+                found.setdefault(record["uri"], []).append(neighbor)
+
+            return found
+
+        scope = ("neighbors", direction, None if selected is None else tuple(selected))
+
+        return self._lookup(scope, list(uris), fetch, list)
+
+    def weights(
+        self,
+        pairs: t.Sequence[t.Tuple[str, str]],
+        relations: t.Optional[t.Iterable[str]] = None,
+    ) -> t.List[t.Dict[str, float]]:
+        """Weights of the relationships from the first to the second concept by type."""
+
+        selected = None if relations is None else sorted(set(relations))
+
+        def fetch(tx, missing):
+            found: t.Dict[t.Tuple[str, str], t.Dict[str, float]] = {}
+            rows = [list(pair) for pair in missing]
+
+            for record in tx.run(_weights, pairs=rows, relations=selected):
+                found.setdefault(tuple(record["pair"]), {})[record["relation"]] = (
+                    record["weight"]
+                )
+
+            return found
+
+        scope = ("weights", None if selected is None else tuple(selected))
+
+        return self._lookup(scope, [tuple(pair) for pair in pairs], fetch, dict)
+
+    def invalidate(self) -> None:
+        """Clear the cache, e.g., after changing the graph from this process."""
+
+        self.cache.clear()
+
+    def close(self) -> None:
+        if self._owns_driver:
+            self.driver.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _lookup(
+        self,
+        scope: t.Hashable,
+        keys: t.List[t.Any],
+        fetch: t.Callable[[t.Any, t.List[t.Any]], t.Dict[t.Any, t.Any]],
+        empty: t.Callable[[], t.Any],
+    ) -> t.List[t.Any]:
+        self._check_generation()
+        # Results of a lookup that overlaps a change of the graph are not cached.
+        epoch = self.cache.epoch
+        results = [self.cache.get((scope, key), _missing) for key in keys]
+        missing = list(dict.fromkeys(k for k, r in zip(keys, results) if r is _missing))
+
+        if missing:
+            with self.driver.session() as session:
+                found = session.read_transaction(fetch, missing)
+
+            for key in missing:
+                found.setdefault(key, empty())
+                self.cache.put((scope, key), found[key], epoch)
+
+            results = [
+                found[key] if result is _missing else result
+                for key, result in zip(keys, results)
+            ]
+
+        return results
+
+    def _check_generation(self) -> None:
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._generation_checked < self._generation_interval:
+                return
+
+            self._generation_checked = now
+            generation = database.generation(self.driver)
+
+            if generation != self._generation:
+                self.cache.clear()
+                self._generation = generation
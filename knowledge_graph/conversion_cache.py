@@ -0,0 +1,159 @@
+"""
+Content-addressed cache of converted CSV files.
+
+A build is identified by the SHA-256 digest of the dump and the settings of the
+conversion (filters, POS mapping, selected rows and the version of the format).
+Since the output of `convert` is sorted, the same key always yields the same files.
+Each build is a directory named after its key:
+
+```
+cache/
+  digests.json             digests of dumps by path, size and modification time
+  3f9a.../
+    build.json             the settings of the build
+    nodes.csv
+    relationships.csv
+```
+
+Files are hard-linked into and out of the cache (or copied across file systems),
+so a hit takes about as long as listing the directory. Therefore, output files
+must never be written in place (see `knowledge_graph.sharded_csv.open_atomic`). Only `max_builds` builds
+are kept, the least recently used ones are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Mapping
+
+
+class ConversionCache:
+    def __init__(self, directory: Path, max_builds: int = 3):
+        self.directory = directory
+        self.max_builds = max_builds
+
+    def key(self, dump: Path, settings: Mapping[str, Any]) -> str:
+        return _digest({"dump": self.digest(dump), "settings": settings})
+
+    def digest(self, dump: Path) -> str:
+        """SHA-256 digest of a file, which is only computed again if it changed."""
+
+        stat = dump.stat()
+        path = str(dump.resolve())
+        signature = [stat.st_size, stat.st_mtime_ns]
+        digests_path = self.directory / "digests.json"
+        digests: Dict[str, Any] = {}
+
+        if digests_path.exists():
+            with digests_path.open() as f:
+                digests = json.load(f)
+
+        cached = digests.get(path)
+
+        if cached is not None and cached["signature"] == signature:
+            return cached["sha256"]
+
+        sha256 = hashlib.sha256()
+
+        with dump.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(chunk)
+
+        digests[path] = {"signature": signature, "sha256": sha256.hexdigest()}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_json(digests_path, digests)
+
+        return sha256.hexdigest()
+
+    def restore(self, key: str, files: Mapping[str, Path]) -> bool:
+        """Link the files of a build to their destinations (by their names in the
+        cache) and return whether the build exists.
+        """
+
+        build = self.directory / key
+
+        if not all((build / name).exists() for name in files):
+            return False
+
+        for name, path in files.items():
+            _link(build / name, path)
+
+        # The modification time of the settings marks the last use.
+        os.utime(build / "build.json")
+
+        return True
+
+    def store(
+        self, key: str, files: Mapping[str, Path], settings: Mapping[str, Any]
+    ) -> None:
+        """Add a build with the given files and evict the least recently used ones."""
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f"{key}.", dir=self.directory))
+
+        try:
+            for name, path in files.items():
+                _link(path, tmp / name)
+
+            _write_json(tmp / "build.json", settings)
+
+            # Another process may have stored the same build in the meantime.
+            if not (self.directory / key).exists():
+                os.rename(tmp, self.directory / key)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self) -> None:
+        builds = sorted(
+            (path for path in self.directory.glob("*/build.json")),
+            key=lambda path: path.stat().st_mtime,
+        )
+
+        for path in builds[: max(0, len(builds) - self.max_builds)]:
+            shutil.rmtree(path.parent, ignore_errors=True)
+
+
+def _digest(value: Any) -> str:
+    """Digest of a JSON value that does not depend on the order of the keys.
+
+    >>> _digest({"a": 1, "b": [2]}) == _digest({"b": (2,), "a": 1})
+    True
+    """
+
+    encoded = json.dumps(value, sort_keys=True, default=list).encode("utf-8")
+
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _link(source: Path, destination: Path) -> None:
+    """Replace `destination` with a hard link to (or a copy of) `source`."""
+
+    # Renaming a link over another link to the same file does nothing.
+    if destination.exists() and os.path.samefile(source, destination):
+        return
+
+    tmp = destination.with_name(destination.name + ".tmp")
+
+    if tmp.exists():
+        tmp.unlink()
+
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+
+    os.replace(tmp, destination)
+
+
+def _write_json(path: Path, value: Any) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+
+    with tmp.open("w") as f:
+        json.dump(value, f, indent=2, sort_keys=True, default=list)
+
+    os.replace(tmp, path)
@@ -1,26 +1,55 @@
-import ast
 import csv
 import gzip
+import itertools
+import multiprocessing
 import os
+import random
 import subprocess
 import sys
-from dataclasses import dataclass, field
+import time
+from array import array
+from collections import Counter, deque
+from contextlib import closing, contextmanager
+from dataclasses import asdict, dataclass, replace
+from multiprocessing.pool import AsyncResult
 from os import chown
 from pathlib import Path
-from typing import Any, Dict, List, Mapping, Optional
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import click
+import numpy as np
 
-from .uri import (
-    assertion_uri,
-    concept_uri,
-    is_concept,
-    is_relation,
-    join_uri,
-    split_uri,
-)
+from . import delta, equivalence, gzip_index, metrics, sampling
+from . import metadata as metadata_fields
+from .conversion_cache import ConversionCache
+from .csr import CsrBuilder
+from .delta import ManifestWriter
+from .external_sort import ExternalSorter
+from .interning import Vocabulary, pack_edge, unpack_edge
+from .metadata import Metadata
+from .name_index import NameIndexBuilder
+from .prefilter import Prefilter
+from .sharded_csv import ShardedWriter, find_shards, open_atomic, shard_paths
+from .uri import is_concept, is_relation, join_uri
+from .uri_codec import UriCodec, build_assertion, build_concept, parse_concept
 
 lang_filter = ["de", "en"]
+relation_exclude_filter = ["dbpedia/"]
 
 # POS tags
 # n: NOUN
@@ -39,29 +68,41 @@ pos_replacements = {
 
 pos_default = "other"
 
+# Version of the files written by `convert`, which is part of the cache key.
+# Increase it whenever the output changes for the same dump and settings.
+FORMAT_VERSION = 1
+
+_mebibyte = 1024 * 1024
+_default_manifest = "conceptnet-manifest.tsv.gz"
+_default_manifest_budget = 256
+_rejection_reasons = ("relation", "language", "self-loop", "invalid")
+_codec = UriCodec()
+
 
 @dataclass(frozen=True)
 class Node:
+    __slots__ = ("language", "name", "pos")
+
     language: str
     name: str
     pos: Optional[str]
 
+    def __reduce__(self):
+        # Frozen dataclasses with slots cannot be restored attribute by attribute.
+        return Node, (self.language, self.name, self.pos)
+
     @classmethod
     def from_uri(cls, uri: str) -> "Node":
-        uri_parts = split_uri(uri)
-        pos = pos_default
-
-        if len(uri_parts) > 3:
-            pos = pos_replacements.get(uri_parts[3], pos_default)
+        language, name, pos, _ = parse_concept(uri)
 
-        return cls(uri_parts[1], uri_parts[2], pos)
+        return cls(sys.intern(language), name, pos_replacements.get(pos, pos_default))
 
     @property
     def uri(self):
         if self.pos == pos_default:
-            return concept_uri(self.language, self.name)
+            return build_concept(self.language, self.name)
 
-        return concept_uri(self.language, self.name, self.pos)
+        return build_concept(self.language, self.name, self.pos)
 
     @property
     def label(self):
@@ -74,26 +115,35 @@ class Node:
 
 @dataclass(frozen=True)
 class Relationship:
+    __slots__ = ("category", "start", "end", "metadata")
+
     category: str
     start: Node
     end: Node
-    weight: float
+    metadata: Metadata
+
+    def __reduce__(self):
+        return Relationship, (self.category, self.start, self.end, self.metadata)
 
     @classmethod
     def from_uri(
-        cls, uri: str, start: Node, end: Node, weight: float
+        cls, uri: str, start: Node, end: Node, metadata: Metadata
     ) -> "Relationship":
         return cls(
             uri[3 : len(uri)],
             start,
             end,
-            weight,
+            metadata,
         )
 
+    @property
+    def weight(self) -> float:
+        return self.metadata.weight
+
     @property
     def uri(self) -> str:
         rel_uri = join_uri("r", self.category)
-        return assertion_uri(rel_uri, self.start.uri, self.end.uri)
+        return build_assertion(rel_uri, self.start.uri, self.end.uri)
 
     @property
     def source(self):
@@ -109,94 +159,1189 @@ class Relationship:
     default="conceptnet-relationships.csv",
 )
 @click.option("--debug", is_flag=True)
+@click.option(
+    "--language",
+    "languages",
+    multiple=True,
+    default=lang_filter,
+    show_default=True,
+    help="Only keep concepts of this language (can be repeated).",
+)
+@click.option(
+    "--include-relation",
+    "include_relations",
+    multiple=True,
+    help=(
+        "Only keep relations of this category (can be repeated)."
+        " A trailing slash matches all categories with this prefix."
+    ),
+)
+@click.option(
+    "--exclude-relation",
+    "exclude_relations",
+    multiple=True,
+    default=relation_exclude_filter,
+    show_default=True,
+    help=(
+        "Drop relations of this category (can be repeated)."
+        " A trailing slash matches all categories with this prefix."
+        " Pass an empty string to keep all relations."
+    ),
+)
+@click.option(
+    "--self-loops",
+    type=click.Choice(["drop", "keep"]),
+    default="drop",
+    show_default=True,
+    help="Whether to keep relationships whose start and end are the same node.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    help="Number of processes that parse the assertions in parallel.",
+)
+@click.option(
+    "--batch-size",
+    default=20000,
+    show_default=True,
+    help="Number of rows that are sent to a worker at once.",
+)
+@click.option(
+    "--shards",
+    default=0,
+    show_default=True,
+    help=(
+        "Split each CSV file into a header file and this many gzipped parts"
+        " (use with import --sharded)."
+    ),
+)
+@click.option(
+    "--csr",
+    "csr_dir",
+    type=click.Path(file_okay=False),
+    help="Also write the graph as memory-mappable NumPy arrays to this directory.",
+)
+@click.option(
+    "--names",
+    "names_dir",
+    type=click.Path(file_okay=False),
+    help=(
+        "Also write a sorted table of the concept names for prefix and fuzzy"
+        " lookups (see knowledge_graph.name_index) to this directory."
+    ),
+)
+@click.option(
+    "--memory-budget",
+    type=int,
+    help="Spill nodes and relationships to disk when they exceed this many MiB.",
+)
+@click.option(
+    "--spill-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="Directory for the temporary files of --memory-budget.",
+)
+@click.option(
+    "--metadata",
+    multiple=True,
+    type=click.Choice(metadata_fields.fields),
+    help="Metadata to export as relationship properties in addition to the weight.",
+)
+@click.option(
+    "--manifest",
+    type=click.Path(dir_okay=False),
+    help="Record the keys and weights of all nodes and relationships in this file.",
+)
+@click.option(
+    "--since",
+    type=click.Path(exists=True, dir_okay=False),
+    help=(
+        "Manifest of a previous conversion. Only the differences to it are written."
+        f" The new manifest defaults to NEO4J_IMPORT_DIR/{_default_manifest}."
+    ),
+)
+@click.option(
+    "--delta-dir",
+    type=click.Path(file_okay=False),
+    help="Directory for the output of --since. Defaults to NEO4J_IMPORT_DIR/delta.",
+)
+@click.option(
+    "--equivalence-relation",
+    "equivalence_relations",
+    multiple=True,
+    help=(
+        "Add the class of the concepts that are connected by relations of this"
+        " category (can be repeated) as node properties."
+    ),
+)
+@click.option(
+    "--equivalence-members",
+    type=click.Path(dir_okay=False),
+    help="Write the members of each class of --equivalence-relation to this file.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help=(
+        "Reuse the CSV files of a previous conversion of the same dump with the same"
+        " settings from this directory (and add new ones to it)."
+    ),
+)
+@click.option(
+    "--cache-size",
+    default=3,
+    show_default=True,
+    help="Number of conversions to keep in --cache-dir.",
+)
+@click.option(
+    "--sampling",
+    "sampling_strategy",
+    type=click.Choice(sampling.strategies),
+    help=(
+        "Convert a sample that keeps the structure of the graph:"
+        " a snowball from --seed-concept, relationships stratified by languages"
+        " and relation, or a uniform reservoir of relationships."
+    ),
+)
+@click.option(
+    "--sampling-size",
+    default=10000,
+    show_default=True,
+    help="Nodes of a snowball sample or relationships of the other samples.",
+)
+@click.option(
+    "--seed-concept",
+    "seed_concepts",
+    multiple=True,
+    help="Start of the snowball (can be repeated), e.g., /c/en/cat for all POS.",
+)
+@click.option(
+    "--snowball-fanout",
+    default=20,
+    show_default=True,
+    help="Neighbors that each node adds to the snowball at most.",
+)
+@click.option("--random-seed", default=0, show_default=True)
+@click.option(
+    "--start-row",
+    default=0,
+    show_default=True,
+    help="First row of the assertions to convert (e.g., to resume a conversion).",
+)
+@click.option("--end-row", type=int, help="Stop before this row of the assertions.")
+@click.option(
+    "--sample",
+    type=int,
+    help="Convert this many rows spread uniformly over the dump (needs build-index).",
+)
 def main(
     neo4j_import_dir: str,
     conceptnet_csv: str,
     nodes_csv: str,
     relationships_csv: str,
     debug: bool,
+    languages: Tuple[str, ...],
+    include_relations: Tuple[str, ...],
+    exclude_relations: Tuple[str, ...],
+    self_loops: str,
+    workers: int,
+    batch_size: int,
+    memory_budget: Optional[int],
+    spill_dir: Optional[str],
+    metadata: Tuple[str, ...],
+    manifest: Optional[str],
+    since: Optional[str],
+    delta_dir: Optional[str],
+    start_row: int,
+    end_row: Optional[int],
+    sample: Optional[int],
+    shards: int,
+    csr_dir: Optional[str],
+    equivalence_relations: Tuple[str, ...],
+    equivalence_members: Optional[str],
+    names_dir: Optional[str],
+    cache_dir: Optional[str],
+    cache_size: int,
+    sampling_strategy: Optional[str],
+    sampling_size: int,
+    seed_concepts: Tuple[str, ...],
+    snowball_fanout: int,
+    random_seed: int,
 ) -> None:
-    nodes_path = Path(neo4j_import_dir, nodes_csv)
-    relationships_path = Path(neo4j_import_dir, relationships_csv)
-
     _check_access(neo4j_import_dir, os.W_OK)
 
-    nodes = set()
-    relationships: Dict[str, Relationship] = {}
+    if since and not manifest:
+        manifest = str(Path(neo4j_import_dir, _default_manifest))
+
+    convert(
+        conceptnet_csv,
+        Path(neo4j_import_dir, nodes_csv),
+        Path(neo4j_import_dir, relationships_csv),
+        debug,
+        workers,
+        batch_size,
+        memory_budget,
+        spill_dir,
+        metadata,
+        Path(manifest) if manifest else None,
+        Path(since) if since else None,
+        Path(delta_dir) if delta_dir else None,
+        start_row,
+        end_row,
+        sample,
+        Prefilter(
+            languages, include_relations, exclude_relations, self_loops == "keep"
+        ),
+        shards,
+        Path(csr_dir) if csr_dir else None,
+        equivalence_relations,
+        Path(equivalence_members) if equivalence_members else None,
+        Path(names_dir) if names_dir else None,
+        ConversionCache(Path(cache_dir), cache_size) if cache_dir else None,
+        (
+            sampling.Sampling(
+                sampling_strategy,
+                sampling_size,
+                seed_concepts,
+                snowball_fanout,
+                random_seed,
+            )
+            if sampling_strategy
+            else None
+        ),
+    )
+
+
+def convert(
+    conceptnet_csv: str,
+    nodes_path: Path,
+    relationships_path: Path,
+    debug: bool = False,
+    workers: int = 1,
+    batch_size: int = 20000,
+    memory_budget: Optional[int] = None,
+    spill_dir: Optional[str] = None,
+    metadata: Sequence[str] = (),
+    manifest_path: Optional[Path] = None,
+    since: Optional[Path] = None,
+    delta_dir: Optional[Path] = None,
+    start_row: int = 0,
+    end_row: Optional[int] = None,
+    sample: Optional[int] = None,
+    prefilter: Optional[Prefilter] = None,
+    shards: int = 0,
+    csr_dir: Optional[Path] = None,
+    equivalence_relations: Sequence[str] = (),
+    equivalence_members: Optional[Path] = None,
+    names_dir: Optional[Path] = None,
+    cache: Optional[ConversionCache] = None,
+    sample_graph: Optional[sampling.Sampling] = None,
+) -> None:
+    """Convert the assertions to CSV files for `neo4j-admin import`.
+
+    Only the rows from `start_row` to `end_row` are read, or a `sample` of rows
+    that is spread over the whole dump. Both use the index of `build-index`
+    if it exists, a sample requires it.
+
+    If `since` points to the manifest of a previous conversion,
+    only the differences to it are written to `delta_dir`.
+    This requires `manifest_path`, which may be the same as `since`.
+
+    If `shards` is set, each CSV file is split into a header file and this many
+    gzipped parts, which are compressed by `workers` threads.
+
+    If `csr_dir` is set, the graph is also written there as a bundle of
+    NumPy arrays with CSR adjacency (see `knowledge_graph.csr`).
+
+    If `equivalence_relations` are given, the concepts that are connected by
+    relations of these categories form classes (see `knowledge_graph.equivalence`)
+    whose id and size are added to the nodes. `equivalence_members` lists them.
+
+    If `names_dir` is set, the names of the concepts are written there as a
+    sorted table for autocompletion (see `knowledge_graph.name_index`).
+
+    If a `cache` is given, the CSV files are restored from it when the dump and
+    the settings have been converted before, and stored in it otherwise.
+    It is not used together with the other outputs.
+
+    If `sample_graph` is given, only a sample of the graph is converted
+    (see `knowledge_graph.sampling`). A snowball sample reads the dump twice.
+
+    The rows are selected by `prefilter`, which keeps German and English
+    concepts and drops DBpedia relations as well as self-loops by default.
+    """
 
-    with gzip.open(conceptnet_csv, "rt") as f:
-        rows = csv.reader(f, delimiter="\t")
+    # Keep the order of the columns independent of the order of the options.
+    selected = tuple(name for name in metadata_fields.fields if name in metadata)
+    graph: Union[_InMemoryGraph, _ExternalGraph]
+
+    if memory_budget:
+        graph = _ExternalGraph(memory_budget * _mebibyte, spill_dir, debug)
+    else:
+        graph = _InMemoryGraph(selected)
+
+    prefilter = prefilter or Prefilter()
+    counts: Counter = Counter()
+    equivalent = frozenset(equivalence_relations)
+    cache_files = _cache_files(nodes_path, relationships_path, shards)
+
+    if sample_graph is not None and sample_graph.strategy == "snowball":
+        if not sample_graph.seeds:
+            raise click.ClickException("A snowball sample needs a --seed-concept.")
+
+    cache_key = None
+
+    if cache is not None:
+        if csr_dir or names_dir or manifest_path or since or equivalence_members:
+            print("Not using the cache, since there are outputs besides the CSV files")
+        else:
+            settings = _cache_settings(
+                prefilter,
+                selected,
+                debug,
+                start_row,
+                end_row,
+                sample,
+                shards,
+                equivalent,
+                sample_graph,
+            )
+            cache_key = cache.key(Path(conceptnet_csv), settings)
+            _remove_stale_parts((nodes_path, relationships_path), cache_files)
+
+            if cache.restore(cache_key, cache_files):
+                print(f"Restored the CSV files from {cache.directory / cache_key}")
+                metrics.run.update(conversion_cache="hit")
+                return
+
+            metrics.run.update(conversion_cache="miss")
+
+            # Restored files are links into the cache, which must not be overwritten.
+            for path in cache_files.values():
+                if path.exists():
+                    path.unlink()
+
+    sets: equivalence.UnionFind[Node] = equivalence.UnionFind()
+    sampled_nodes: Optional[Set[Node]] = None
+
+    if sample_graph is not None and sample_graph.strategy == "snowball":
+        with _open_lines(Path(conceptnet_csv), start_row, end_row, sample) as lines:
+            print(f"Reading {conceptnet_csv} to sample nodes")
+            parsed = _parse(lines, prefilter, selected, Counter(), workers, batch_size)
+
+            with metrics.run.phase("convert.sample"), closing(parsed):
+                sampled_nodes = sampling.snowball(
+                    ((rel.start, rel.end) for rel in parsed),
+                    _seed_matcher(sample_graph.seeds),
+                    sample_graph.size,
+                    random.Random(sample_graph.random_seed),
+                    sample_graph.fanout,
+                )
+
+        print(f"Sampled {len(sampled_nodes)} nodes")
+
+    with _open_lines(Path(conceptnet_csv), start_row, end_row, sample) as lines:
         print(f"Reading {conceptnet_csv}")
+        progress = metrics.Progress(lines.fraction)
+        # Driven by the rows that are read, since rejected rows and samples
+        # may not yield any relationships for a long time.
+        lines.on_rows = lambda: progress.update(
+            lines.rows, kept=counts["kept"], **graph.stats()
+        )
+        clock = time.perf_counter
+        started = clock()
+        dedup_seconds = 0.0
 
-        for i, row in enumerate(rows):
-            rel_uri = row[1]
-            start_uri = row[2]
-            end_uri = row[3]
-
-            if is_concept(start_uri) and is_concept(end_uri) and is_relation(rel_uri):
-                start = Node.from_uri(start_uri)
-                end = Node.from_uri(end_uri)
-
-                if (
-                    start.language in lang_filter
-                    and end.language in lang_filter
-                    and start != end
-                ):
-                    nodes.add(start)
-                    nodes.add(end)
-
-                    rel_metadata: Mapping[str, str] = ast.literal_eval(row[4])
-                    weight = float(rel_metadata.get("weight", 1.0))
-                    rel = Relationship.from_uri(rel_uri, start, end, weight)
-
-                    # Relationships can occur more then once,
-                    # if two different datasets yield in the same relationsip.
-                    # They are merged by combining their weights.
-                    if rel.uri in relationships.keys():
-                        merged_weight = relationships[rel.uri].weight + rel.weight
-                        rel = Relationship.from_uri(rel_uri, start, end, merged_weight)
-
-                    if not rel.category.startswith("dbpedia/"):
-                        relationships[rel.uri] = rel
-
-            if debug and len(nodes) >= 10000:
-                break
-
-    with nodes_path.open("w") as f:
-        writer = csv.writer(f)
-        print(f"Writing {nodes_csv}")
-        writer.writerow(("uri:ID", ":LABEL", "name", "language", "pos", "source"))
-
-        for n in nodes:
-            writer.writerow((n.uri, n.label, n.name, n.language, n.pos, n.source))
-
-    with relationships_path.open("w") as f:
-        writer = csv.writer(f)
-        print(f"Writing {relationships_csv}")
-        writer.writerow(
-            (
-                ":START_ID",
-                ":END_ID",
-                ":TYPE",
-                "uri",
-                # "dataset",
-                "weight:double",
-                "source",
+        parsed = _parse(lines, prefilter, selected, counts, workers, batch_size)
+
+        if sample_graph is not None:
+            parsed = _sample(parsed, sample_graph, sampled_nodes)
+
+        with closing(parsed):
+            for rel in parsed:
+                start = clock()
+                graph.add(rel)
+
+                if rel.category in equivalent:
+                    sets.union(rel.start, rel.end)
+
+                dedup_seconds += clock() - start
+
+                # Rows that are skipped do not change the number of nodes,
+                # so checking here is equivalent to checking after every row.
+                if debug and graph.node_count >= 10000:
+                    break
+
+        progress.close()
+        total_seconds = clock() - started
+
+    # Reading includes the decompression, parsing includes the prefilter.
+    metrics.run.add_time("convert.read", lines.seconds)
+    metrics.run.add_time("convert.parse", total_seconds - lines.seconds - dedup_seconds)
+    metrics.run.add_time("convert.dedup", dedup_seconds)
+    metrics.run.update(
+        rows_read=lines.rows,
+        rows_kept=counts["kept"],
+        rows_rejected={name: counts[name] for name in _rejection_reasons},
+    )
+
+    print(
+        f"Kept {counts['kept']} rows, rejected "
+        + ", ".join(f"{counts[name]} by {name}" for name in _rejection_reasons)
+    )
+
+    nodes: Iterable[Tuple[str, Node]] = graph.nodes()
+    relationships: Iterable[_Edge] = graph.relationships()
+    manifest = None
+    classes: Optional[Dict[Node, equivalence.Class]] = None
+
+    if equivalent:
+        with metrics.run.phase("convert.equivalence"):
+            classes = sets.classes(lambda node: node.uri)
+
+        print(f"Found {len(set(classes.values()))} equivalence classes")
+        metrics.run.update(equivalence_classes=len(set(classes.values())))
+
+    if manifest_path is not None:
+        budget = (memory_budget or _default_manifest_budget) * _mebibyte
+        manifest = ManifestWriter(budget, spill_dir)
+        nodes = _record_nodes(nodes, manifest)
+        relationships = _record_relationships(relationships, manifest)
+
+    if csr_dir is not None:
+        csr = CsrBuilder()
+        nodes = _record_csr_nodes(nodes, csr)
+        relationships = _record_csr_relationships(relationships, csr)
+
+    if names_dir is not None:
+        names = NameIndexBuilder()
+        nodes = _record_names_nodes(nodes, names)
+        relationships = _record_names_relationships(relationships, names)
+
+    with metrics.run.phase("convert.write"):
+        if since is None:
+            node_count = _write_nodes(nodes_path, nodes, shards, workers, classes)
+            relationship_count = _write_relationships(
+                relationships_path, relationships, selected, shards, workers
+            )
+            metrics.run.update(
+                nodes_written=node_count, relationships_written=relationship_count
             )
+        else:
+            print(f"Comparing with {since}")
+            deque(itertools.chain(nodes, relationships), maxlen=0)
+
+    if manifest is not None and manifest_path is not None:
+        # The previous manifest may be overwritten, so it has to be compared first.
+        tmp_manifest_path = manifest_path.with_name(manifest_path.name + ".tmp")
+        print(f"Writing {manifest_path.name}")
+
+        with metrics.run.phase("convert.manifest"):
+            manifest.write(tmp_manifest_path)
+
+        if since is not None:
+            delta_dir = delta_dir or nodes_path.with_name("delta")
+            print(f"Writing delta to {delta_dir}")
+
+            with metrics.run.phase("convert.delta"):
+                delta.write_delta(since, tmp_manifest_path, delta_dir)
+
+        os.replace(tmp_manifest_path, manifest_path)
+
+    if classes is not None and equivalence_members is not None:
+        print(f"Writing {equivalence_members.name}")
+        equivalence.write_members(
+            equivalence_members,
+            ((node.uri, node_class) for node, node_class in classes.items()),
         )
 
-        for r in relationships.values():
+    if csr_dir is not None:
+        print(f"Writing CSR arrays to {csr_dir}")
+
+        with metrics.run.phase("convert.csr"):
+            csr.write(csr_dir)
+
+    if names_dir is not None:
+        print(f"Writing name index to {names_dir}")
+
+        with metrics.run.phase("convert.names"):
+            names.write(names_dir)
+
+    if cache is not None and cache_key is not None:
+        print(f"Adding the CSV files to {cache.directory}")
+        cache.store(cache_key, cache_files, settings)
+
+
+def _cache_settings(
+    prefilter: Prefilter,
+    selected: Tuple[str, ...],
+    debug: bool,
+    start_row: int,
+    end_row: Optional[int],
+    sample: Optional[int],
+    shards: int,
+    equivalent: Iterable[str],
+    sample_graph: Optional[sampling.Sampling],
+) -> Dict[str, Any]:
+    """Everything besides the dump that determines the CSV files."""
+
+    return {
+        "format": FORMAT_VERSION,
+        "prefilter": asdict(prefilter),
+        "pos_replacements": pos_replacements,
+        "pos_default": pos_default,
+        "metadata": selected,
+        "debug": debug,
+        "rows": [start_row, end_row, sample],
+        "shards": shards,
+        "equivalence_relations": sorted(equivalent),
+        "sampling": None if sample_graph is None else asdict(sample_graph),
+    }
+
+
+def _cache_files(
+    nodes_path: Path, relationships_path: Path, shards: int
+) -> Dict[str, Path]:
+    """The output files by their names in the cache.
+
+    >>> files = _cache_files(Path("n.csv"), Path("r.csv"), 1)
+    >>> sorted((name, path.name) for name, path in files.items())[:2]
+    [('nodes-00001.csv.gz', 'n-00001.csv.gz'), ('nodes-header.csv', 'n-header.csv')]
+    """
+
+    files = {}
+
+    for name, path in (("nodes", nodes_path), ("relationships", relationships_path)):
+        if shards:
+            header, parts = shard_paths(path, shards)
+            cache_header, cache_parts = shard_paths(Path(f"{name}.csv"), shards)
+
+            files[cache_header.name] = header
+            files.update(
+                (cache_part.name, part) for cache_part, part in zip(cache_parts, parts)
+            )
+        else:
+            files[f"{name}.csv"] = path
+
+    return files
+
+
+def _remove_stale_parts(paths: Iterable[Path], cache_files: Mapping[str, Path]) -> None:
+    """Remove the parts of earlier conversions with more shards.
+
+    A cache hit only links the files of the current settings into place,
+    but `import --sharded` reads all parts next to the header.
+    """
+
+    keep = set(cache_files.values())
+
+    for path in paths:
+        for part in find_shards(path)[1]:
+            if part not in keep:
+                part.unlink()
+
+
+class _Lines:
+    """Count the rows that have been read and the time spent reading them.
+
+    `on_rows` is called every `report_every` rows (e.g., to show the progress),
+    independently of how many of them are kept.
+    """
+
+    report_every = 4096
+
+    def __init__(
+        self,
+        lines: Iterable[bytes],
+        total_rows: Optional[int] = None,
+        position: Optional[Callable[[], int]] = None,
+        size: Optional[int] = None,
+    ):
+        self._lines = lines
+        self._total_rows = total_rows
+        self._position = position
+        self._size = size
+        self.rows = 0
+        self.seconds = 0.0
+        self.on_rows: Optional[Callable[[], None]] = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        iterator = iter(self._lines)
+        clock = time.perf_counter
+
+        while True:
+            start = clock()
+            line = next(iterator, None)
+            self.seconds += clock() - start
+
+            if line is None:
+                return
+
+            self.rows += 1
+
+            if self.on_rows is not None and self.rows % self.report_every == 0:
+                self.on_rows()
+
+            yield line
+
+    def fraction(self) -> Optional[float]:
+        """Share of the input that has been read, if it is known."""
+
+        if self._total_rows:
+            return min(1.0, self.rows / self._total_rows)
+
+        if self._position is not None and self._size:
+            return self._position() / self._size
+
+        return None
+
+
+@contextmanager
+def _open_lines(
+    dump: Path, start_row: int, end_row: Optional[int], sample: Optional[int]
+) -> Iterator[_Lines]:
+    if sample is not None:
+        if not gzip_index.has_index(dump):
+            raise click.ClickException(f"Run build-index on {dump} to draw a sample.")
+
+        with closing(gzip_index.IndexedDump(dump).sample(sample)) as lines:
+            yield _Lines(lines, total_rows=sample)
+
+    elif (start_row or end_row is not None) and gzip_index.has_index(dump):
+        indexed_dump = gzip_index.IndexedDump(dump)
+        end = indexed_dump.rows if end_row is None else min(end_row, indexed_dump.rows)
+
+        with closing(indexed_dump.lines(start_row, end_row)) as lines:
+            yield _Lines(lines, total_rows=end - start_row)
+
+    elif end_row is not None:
+        with gzip.open(dump, "rb") as f:
+            lines = itertools.islice(f, start_row, end_row)
+            yield _Lines(lines, total_rows=end_row - start_row)
+
+    else:
+        # The ETA is based on the compressed bytes that have been consumed.
+        with dump.open("rb") as raw, gzip.GzipFile(fileobj=raw) as f:
+            lines = itertools.islice(f, start_row, None)
+            yield _Lines(lines, position=raw.tell, size=dump.stat().st_size)
+
+
+def _write_nodes(
+    path: Path,
+    nodes: Iterable[Tuple[str, Node]],
+    shards: int,
+    threads: int,
+    classes: Optional[Mapping[Node, equivalence.Class]] = None,
+) -> int:
+    header: Tuple[str, ...] = ("uri:ID", ":LABEL", "name", "language", "pos", "source")
+    count = 0
+
+    if classes is not None:
+        header += ("equivalence_class", "equivalence_class_size:int")
+
+    with _open_csv(path, header, shards, threads) as writer:
+        for uri, n in nodes:
+            row: Tuple[Any, ...] = (uri, n.label, n.name, n.language, n.pos, n.source)
+
+            if classes is not None:
+                # Concepts without equivalent relations form a class on their own.
+                row += classes.get(n, (uri, 1))
+
+            writer.writerow(row)
+            count += 1
+
+    return count
+
+
+def _write_relationships(
+    path: Path,
+    relationships: Iterable["_Edge"],
+    selected: Tuple[str, ...],
+    shards: int,
+    threads: int,
+) -> int:
+    header = (
+        ":START_ID",
+        ":END_ID",
+        ":TYPE",
+        "uri",
+        *(f"{name}:string[]" for name in selected),
+        "weight:double",
+        "source",
+    )
+    count = 0
+
+    with _open_csv(path, header, shards, threads) as writer:
+        for e in relationships:
             writer.writerow(
                 (
-                    r.start.uri,
-                    r.end.uri,
-                    r.category,
-                    r.uri,
-                    # r.dataset,
-                    r.weight,
-                    r.source,
+                    e.start_uri,
+                    e.end_uri,
+                    e.category,
+                    e.uri,
+                    *(";".join(getattr(e.metadata, name)) for name in selected),
+                    e.metadata.weight,
+                    "conceptnet",
                 )
             )
+            count += 1
+
+    return count
+
+
+@contextmanager
+def _open_csv(
+    path: Path, header: Sequence[str], shards: int, threads: int
+) -> Iterator[Any]:
+    if shards:
+        print(f"Writing {shards} parts of {path.name}")
+
+        with ShardedWriter(path, header, shards, threads) as writer:
+            yield writer
+    else:
+        print(f"Writing {path.name}")
+
+        with open_atomic(path) as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+
+            yield writer
+
+
+def _record_nodes(
+    nodes: Iterable[Tuple[str, Node]], manifest: ManifestWriter
+) -> Iterator[Tuple[str, Node]]:
+    for uri, n in nodes:
+        manifest.add_node(uri, n.name, n.language, n.pos)
+        yield uri, n
+
+
+def _record_relationships(
+    relationships: Iterable["_Edge"], manifest: ManifestWriter
+) -> Iterator["_Edge"]:
+    for e in relationships:
+        manifest.add_relationship(e.category, e.start_uri, e.end_uri, e.metadata.weight)
+        yield e
+
+
+def _record_csr_nodes(
+    nodes: Iterable[Tuple[str, Node]], csr: CsrBuilder
+) -> Iterator[Tuple[str, Node]]:
+    for uri, n in nodes:
+        csr.add_node(uri)
+        yield uri, n
+
+
+def _record_csr_relationships(
+    relationships: Iterable["_Edge"], csr: CsrBuilder
+) -> Iterator["_Edge"]:
+    for e in relationships:
+        csr.add_relationship(e.category, e.start_uri, e.end_uri, e.metadata.weight)
+        yield e
+
+
+def _record_names_nodes(
+    nodes: Iterable[Tuple[str, Node]], names: NameIndexBuilder
+) -> Iterator[Tuple[str, Node]]:
+    for uri, n in nodes:
+        names.add_node(uri)
+        yield uri, n
+
+
+def _record_names_relationships(
+    relationships: Iterable["_Edge"], names: NameIndexBuilder
+) -> Iterator["_Edge"]:
+    for e in relationships:
+        names.add_relationship(e.start_uri, e.end_uri)
+        yield e
+
+
+class _Edge(NamedTuple):
+    """A merged relationship whose URIs have been built for writing."""
+
+    start_uri: str
+    end_uri: str
+    category: str
+    uri: str
+    metadata: Metadata
+
+
+class _InMemoryGraph:
+    """Nodes and relationships with integer ids.
+
+    The output is sorted like the one of `_ExternalGraph`, so it does not depend
+    on the order of the assertions (or the memory budget).
+    Each distinct node gets a dense id and each relation category a small one,
+    so a relationship is identified by a packed integer of these three ids.
+    The weights are kept in an array, other metadata only if it is exported.
+    URIs are only built once when the CSV files are written.
+    """
+
+    def __init__(self, selected: Tuple[str, ...]):
+        self._selected = selected
+        self._nodes: Vocabulary[Node] = Vocabulary()
+        self._categories: Vocabulary[str] = Vocabulary()
+        # Packed relationship -> index into the weights.
+        self._relationships: Dict[int, int] = {}
+        self._weights = array("d")
+        self._metadata: List[Metadata] = []
+        self._node_uris: Optional[List[str]] = None
+        self._node_order_cache: Optional[List[int]] = None
+
+    def add(self, rel: Relationship) -> None:
+        start = self._nodes.add(rel.start)
+        end = self._nodes.add(rel.end)
+
+        # Relationships can occur more then once,
+        # if two different datasets yield in the same relationsip.
+        # They are merged by combining their weights.
+        key = pack_edge(self._categories.add(rel.category), start, end)
+        index = self._relationships.get(key)
+
+        if index is None:
+            self._relationships[key] = len(self._weights)
+            self._weights.append(rel.weight)
+
+            if self._selected:
+                self._metadata.append(rel.metadata)
+        else:
+            self._weights[index] += rel.weight
+
+            if self._selected:
+                self._metadata[index] = self._metadata[index].merge(rel.metadata)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._nodes)
+
+    def stats(self) -> Dict[str, int]:
+        return {"nodes": len(self._nodes), "relationships": len(self._relationships)}
+
+    def nodes(self) -> Iterator[Tuple[str, Node]]:
+        node_uris = self._uris()
+        nodes = self._nodes.values
+
+        return ((node_uris[i], nodes[i]) for i in self._node_order())
+
+    def relationships(self) -> Iterator[_Edge]:
+        node_uris = self._uris()
+        rel_uris = [join_uri("r", category) for category in self._categories.values]
+
+        for category, start, end, index in self._relationship_order():
+            start_uri = node_uris[start]
+            end_uri = node_uris[end]
+            weight = self._weights[index]
+
+            if self._selected:
+                metadata = replace(self._metadata[index], weight=weight)
+            else:
+                metadata = Metadata(weight)
+
+            yield _Edge(
+                start_uri,
+                end_uri,
+                self._categories[category],
+                build_assertion(rel_uris[category], start_uri, end_uri),
+                metadata,
+            )
+
+    def _uris(self) -> List[str]:
+        if self._node_uris is None:
+            nodes = self._nodes.values
+            self._node_uris = _codec.build_concepts(
+                [node.language for node in nodes],
+                [node.name for node in nodes],
+                [None if node.pos == pos_default else node.pos for node in nodes],
+            )
+
+        return self._node_uris
+
+    def _node_order(self) -> List[int]:
+        if self._node_order_cache is None:
+            self._node_order_cache = _argsort(self._uris())
+
+        return self._node_order_cache
+
+    def _relationship_order(self) -> Iterator[Tuple[int, int, int, int]]:
+        """The category, start, end and weight index of each relationship,
+        sorted by the category and the URIs of the nodes like `_ExternalGraph`.
+        """
+
+        columns = [array("q") for _ in range(3)]
+
+        for key in self._relationships:
+            for column, value in zip(columns, unpack_edge(key)):
+                column.append(value)
+
+        categories, starts, ends = (np.frombuffer(c, dtype=np.int64) for c in columns)
+        indexes = np.fromiter(self._relationships.values(), np.int64)
+        node_ranks = _ranks(self._node_order())
+        category_ranks = _ranks(_argsort(self._categories.values))
+        # The last key is the primary one.
+        order = np.lexsort(
+            (node_ranks[ends], node_ranks[starts], category_ranks[categories])
+        )
+
+        return zip(
+            categories[order].tolist(),
+            starts[order].tolist(),
+            ends[order].tolist(),
+            indexes[order].tolist(),
+        )
+
+
+def _argsort(values: Sequence[str]) -> List[int]:
+    return sorted(range(len(values)), key=values.__getitem__)
+
+
+def _ranks(order: Sequence[int]) -> np.ndarray:
+    """
+    >>> _ranks([2, 0, 1]).tolist()
+    [1, 2, 0]
+    """
+
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[np.asarray(order, dtype=np.int64)] = np.arange(len(order))
+
+    return ranks
+
+
+class _ExternalGraph:
+    """Collect nodes and relationships in sorted runs on disk.
+
+    Peak memory is bounded by `budget` (in bytes) regardless of the input size.
+    The output is sorted (nodes by URI, relationships by category, start and end).
+    Relationship records carry their row number, so duplicates are merged
+    in input order and the summed weights are identical to `_InMemoryGraph`.
+    """
+
+    def __init__(self, budget: int, directory: Optional[str], debug: bool):
+        self._node_sorter = ExternalSorter(budget // 4, directory, unique=True)
+        self._relationship_sorter = ExternalSorter(budget - budget // 4, directory)
+        self._records = 0
+        # Only needed for the --debug cutoff, which limits the number of nodes.
+        self._debug_nodes: Optional[Set[Node]] = set() if debug else None
+
+    def add(self, rel: Relationship) -> None:
+        start_uri = rel.start.uri
+        end_uri = rel.end.uri
+
+        for uri, node in ((start_uri, rel.start), (end_uri, rel.end)):
+            self._node_sorter.add("\t".join((uri, node.language, node.name, node.pos)))
+
+            if self._debug_nodes is not None:
+                self._debug_nodes.add(node)
+
+        self._relationship_sorter.add(
+            "\t".join(
+                (
+                    rel.category,
+                    start_uri,
+                    end_uri,
+                    f"{self._records:012x}",
+                    repr(rel.weight),
+                    *(
+                        ";".join(getattr(rel.metadata, name))
+                        for name in metadata_fields.fields
+                    ),
+                )
+            )
+        )
+        self._records += 1
+
+    @property
+    def node_count(self) -> int:
+        return len(self._debug_nodes or ())
+
+    def stats(self) -> Dict[str, int]:
+        # Duplicates are only merged when the sorted records are read.
+        return {"records": self._records}
+
+    def nodes(self) -> Iterator[Tuple[str, Node]]:
+        for line in self._node_sorter.sorted():
+            uri, language, name, pos = line.split("\t")
+            yield uri, Node(language, name, pos)
+
+    def relationships(self) -> Iterator[_Edge]:
+        records = (line.split("\t") for line in self._relationship_sorter.sorted())
+
+        for (category, start_uri, end_uri), group in itertools.groupby(
+            records, key=lambda record: tuple(record[:3])
+        ):
+            metadata = _parse_metadata_record(next(group)[4:])
+
+            for duplicate in group:
+                metadata = metadata.merge(_parse_metadata_record(duplicate[4:]))
+
+            yield _Edge(
+                start_uri,
+                end_uri,
+                category,
+                build_assertion(join_uri("r", category), start_uri, end_uri),
+                metadata,
+            )
+
+
+def _parse(
+    lines: Iterable[bytes],
+    prefilter: Prefilter,
+    selected: Tuple[str, ...],
+    counts: Counter,
+    workers: int,
+    batch_size: int,
+) -> Iterator[Relationship]:
+    if workers > 1:
+        return _parse_parallel(lines, prefilter, selected, counts, workers, batch_size)
+
+    return _parse_lines(lines, prefilter, selected, counts)
+
+
+def _sample(
+    relationships: Iterator[Relationship],
+    sample_graph: sampling.Sampling,
+    nodes: Optional[Set[Node]],
+) -> Iterator[Relationship]:
+    """The relationships of the sample, the others are read but not returned."""
+
+    rng = random.Random(sample_graph.random_seed)
+
+    with closing(relationships):
+        if nodes is not None:
+            # The subgraph induced by the nodes of the snowball.
+            for rel in relationships:
+                if rel.start in nodes and rel.end in nodes:
+                    yield rel
+
+            return
+
+        selection: Union[sampling.Reservoir, sampling.StratifiedSample]
+
+        if sample_graph.strategy == "stratified":
+            selection = sampling.StratifiedSample(
+                sample_graph.size,
+                rng,
+                key=lambda rel: (rel.start.language, rel.end.language, rel.category),
+            )
+        else:
+            selection = sampling.Reservoir(sample_graph.size, rng)
+
+        for rel in relationships:
+            selection.add(rel)
+
+    yield from selection
+
+
+def _seed_matcher(seeds: Iterable[str]) -> Callable[[Node], bool]:
+    """Match nodes by the URIs of concepts, all POS match if it is left out.
+
+    >>> matches = _seed_matcher(["/c/en/cat", "/c/de/katze/n"])
+    >>> [matches(Node.from_uri(uri)) for uri in ["/c/en/cat/v", "/c/de/katze/v"]]
+    [True, False]
+    """
+
+    keys = set()
+
+    for seed in seeds:
+        language, name, pos, _ = parse_concept(seed)
+        keys.add((language, name, pos and pos_replacements.get(pos, pos_default)))
+
+    def matches(node: Node) -> bool:
+        return any((node.language, node.name, pos) in keys for pos in (None, node.pos))
+
+    return matches
+
+
+def _parse_metadata_record(record: Sequence[str]) -> Metadata:
+    weight, *values = record
+
+    return Metadata(
+        float(weight), *(tuple(value.split(";")) if value else () for value in values)
+    )
+
+
+def _parse_row(row: Sequence[str], selected: Tuple[str, ...]) -> Optional[Relationship]:
+    rel_uri = row[1]
+    start_uri = row[2]
+    end_uri = row[3]
+
+    if is_concept(start_uri) and is_concept(end_uri) and is_relation(rel_uri):
+        start = Node.from_uri(start_uri)
+        end = Node.from_uri(end_uri)
+        rel_metadata = Metadata.parse(row[4]).select(selected)
+
+        return Relationship.from_uri(rel_uri, start, end, rel_metadata)
+
+    return None
+
+
+def _parse_lines(
+    lines: Iterable[bytes],
+    prefilter: Prefilter,
+    selected: Tuple[str, ...],
+    counts: Counter,
+) -> Iterator[Relationship]:
+    for row in csv.reader(prefilter(lines, counts), delimiter="\t"):
+        rel = _parse_row(row, selected)
+
+        if rel is None:
+            counts["invalid"] += 1
+        elif rel.start == rel.end and not prefilter.keep_self_loops:
+            counts["self-loop"] += 1
+        else:
+            counts["kept"] += 1
+            yield rel
+
+
+def _parse_batch(
+    lines: List[bytes], prefilter: Prefilter, selected: Tuple[str, ...]
+) -> Tuple[List[Relationship], Counter]:
+    counts: Counter = Counter()
+
+    return list(_parse_lines(lines, prefilter, selected, counts)), counts
+
+
+def _parse_parallel(
+    lines: Iterable[bytes],
+    prefilter: Prefilter,
+    selected: Tuple[str, ...],
+    counts: Counter,
+    workers: int,
+    batch_size: int,
+) -> Iterator[Relationship]:
+    """Filter and parse batches of rows in worker processes.
+
+    The results are yielded in the order of the input, so consuming them gives
+    exactly the same output as the single-process variant.
+    At most two batches per worker are in flight to bound the memory usage.
+    """
+
+    with multiprocessing.Pool(workers) as pool:
+        pending: Deque[AsyncResult] = deque()
+
+        for batch in _batched(lines, batch_size):
+            pending.append(pool.apply_async(_parse_batch, (batch, prefilter, selected)))
+
+            if len(pending) >= 2 * workers:
+                rels, batch_counts = pending.popleft().get()
+                counts.update(batch_counts)
+                yield from rels
+
+        while pending:
+            rels, batch_counts = pending.popleft().get()
+            counts.update(batch_counts)
+            yield from rels
+
+
+def _batched(items: Iterable[bytes], size: int) -> Iterator[List[bytes]]:
+    iterator = iter(items)
+
+    while True:
+        batch = list(itertools.islice(iterator, size))
+
+        if not batch:
+            return
+
+        yield batch
 
 
 def _check_access(dir: str, mode: int) -> None:
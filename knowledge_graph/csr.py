@@ -0,0 +1,194 @@
+"""
+Binary graph bundle with compressed sparse row (CSR) adjacency.
+
+The bundle is a directory of NumPy arrays that can be memory-mapped,
+so loading it takes milliseconds and does not copy any data:
+
+- `node_uris.npy` and `node_offsets.npy`: the UTF-8 encoded node URIs in sorted
+  order. The URI of node `i` is `node_uris[node_offsets[i]:node_offsets[i + 1]]`.
+- `indptr.npy` and `indices.npy`: the outgoing relationships of node `i` end at
+  the nodes `indices[indptr[i]:indptr[i + 1]]` (sorted by end node).
+- `relations.npy` and `weights.npy`: the relation category (as an index into
+  `relations.json`) and the float32 weight of each outgoing relationship.
+- `reverse_indptr.npy`, `reverse_indices.npy` and `reverse_edges.npy`: the
+  incoming relationships in the same format. `reverse_edges` holds the positions
+  of these relationships in the outgoing arrays to look up relations and weights.
+"""
+
+import json
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .interning import Vocabulary
+
+
+class CsrBuilder:
+    """Collect nodes and relationships and write them as a graph bundle.
+
+    All nodes have to be added before the first relationship.
+    """
+
+    def __init__(self) -> None:
+        self._uris: List[str] = []
+        self._ids: Optional[Dict[str, int]] = None
+        self._relations: Vocabulary[str] = Vocabulary()
+        self._starts = array("l")
+        self._ends = array("l")
+        self._categories = array("l")
+        self._weights = array("f")
+
+    def add_node(self, uri: str) -> None:
+        if self._ids is not None:
+            raise RuntimeError("Nodes have to be added before relationships.")
+
+        self._uris.append(uri)
+
+    def add_relationship(
+        self, category: str, start_uri: str, end_uri: str, weight: float
+    ) -> None:
+        if self._ids is None:
+            self._uris.sort()
+            self._ids = {uri: i for i, uri in enumerate(self._uris)}
+
+        self._starts.append(self._ids[start_uri])
+        self._ends.append(self._ids[end_uri])
+        self._categories.append(self._relations.add(category))
+        self._weights.append(weight)
+
+    def write(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+
+        if self._ids is None:
+            self._uris.sort()
+
+        encoded = [uri.encode("utf-8") for uri in self._uris]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(uri) for uri in encoded], out=offsets[1:])
+        np.save(directory / "node_uris.npy", np.frombuffer(b"".join(encoded), np.uint8))
+        np.save(directory / "node_offsets.npy", offsets)
+
+        node_count = len(encoded)
+        starts = np.asarray(self._starts)
+        ends = np.asarray(self._ends)
+        categories = np.asarray(self._categories)
+        weights = np.asarray(self._weights)
+
+        order = np.lexsort((ends, starts))
+        np.save(directory / "indptr.npy", _indptr(starts, node_count))
+        np.save(directory / "indices.npy", ends[order].astype(np.int32))
+        np.save(
+            directory / "relations.npy",
+            categories[order].astype(_category_dtype(len(self._relations))),
+        )
+        np.save(directory / "weights.npy", weights[order])
+
+        # Positions of the edges in the sorted outgoing arrays.
+        sorted_starts = starts[order]
+        sorted_ends = ends[order]
+        reverse_order = np.lexsort((sorted_starts, sorted_ends))
+        np.save(directory / "reverse_indptr.npy", _indptr(ends, node_count))
+        np.save(
+            directory / "reverse_indices.npy",
+            sorted_starts[reverse_order].astype(np.int32),
+        )
+        np.save(directory / "reverse_edges.npy", reverse_order.astype(np.int64))
+
+        with (directory / "relations.json").open("w") as f:
+            json.dump(self._relations.values, f)
+
+
+class CsrGraph:
+    """A graph bundle written by `CsrBuilder`, memory-mapped by default."""
+
+    def __init__(self, directory: Path, mmap: bool = True):
+        mode = "r" if mmap else None
+
+        def load(name: str) -> np.ndarray:
+            return np.load(directory / f"{name}.npy", mmap_mode=mode)
+
+        self.node_uris = load("node_uris")
+        self.node_offsets = load("node_offsets")
+        self.indptr = load("indptr")
+        self.indices = load("indices")
+        self.relations = load("relations")
+        self.weights = load("weights")
+        self.reverse_indptr = load("reverse_indptr")
+        self.reverse_indices = load("reverse_indices")
+        self.reverse_edges = load("reverse_edges")
+
+        with (directory / "relations.json").open() as f:
+            self.relation_names: List[str] = json.load(f)
+
+        # Indexing memoryviews is much faster than indexing arrays element-wise.
+        self._uri_bytes = memoryview(self.node_uris)
+        self._offsets = memoryview(self.node_offsets)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_offsets) - 1
+
+    @property
+    def relationship_count(self) -> int:
+        return len(self.indices)
+
+    def uri(self, node: int) -> str:
+        start, end = self._offsets[node], self._offsets[node + 1]
+
+        return self._uri_bytes[start:end].tobytes().decode("utf-8")
+
+    def node(self, uri: str) -> int:
+        """Find the id of a node by binary search over the sorted URIs."""
+
+        encoded = uri.encode("utf-8")
+        low, high = 0, self.node_count
+
+        while low < high:
+            mid = (low + high) // 2
+            start, end = self._offsets[mid], self._offsets[mid + 1]
+
+            if self._uri_bytes[start:end].tobytes() < encoded:
+                low = mid + 1
+            else:
+                high = mid
+
+        if low == self.node_count or self.uri(low) != uri:
+            raise KeyError(uri)
+
+        return low
+
+    def successors(self, node: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """End nodes, relation codes and weights of the outgoing relationships."""
+
+        start, end = self.indptr[node], self.indptr[node + 1]
+
+        return (
+            self.indices[start:end],
+            self.relations[start:end],
+            self.weights[start:end],
+        )
+
+    def predecessors(self, node: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Start nodes, relation codes and weights of the incoming relationships."""
+
+        start, end = self.reverse_indptr[node], self.reverse_indptr[node + 1]
+        edges = self.reverse_edges[start:end]
+
+        return (
+            self.reverse_indices[start:end],
+            self.relations[edges],
+            self.weights[edges],
+        )
+
+
+def _indptr(nodes: np.ndarray, node_count: int) -> np.ndarray:
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(nodes, minlength=node_count), out=indptr[1:])
+
+    return indptr
+
+
+def _category_dtype(count: int) -> type:
+    return np.uint8 if count <= 256 else np.uint16
@@ -0,0 +1,50 @@
+"""
+Connection to the Neo4j database that is configured in `.env`.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+from neo4j import Driver, GraphDatabase
+
+
+def driver(**config) -> Driver:
+    neo4j_url = "neo4j://" + os.getenv("NEO4J_URL")
+    neo4j_auth = os.getenv("NEO4J_AUTH").split("/", 1)
+
+    return GraphDatabase.driver(
+        neo4j_url,
+        auth=tuple(neo4j_auth),
+        encrypted=False,
+        **config,
+    )
+
+
+# A new store (e.g., after `import`) has a new id and creation date,
+# changes to a running database increase the counter of `next_generation`.
+_generation = """
+CALL db.info() YIELD id, creationDate
+OPTIONAL MATCH (g:ImportGeneration)
+RETURN id + '/' + creationDate + '/' + toString(coalesce(g.value, 0)) AS generation
+"""
+
+_next_generation = """
+MERGE (g:ImportGeneration)
+SET g.value = coalesce(g.value, 0) + 1
+"""
+
+
+def generation(driver: Driver) -> str:
+    """Identify the current state of the graph, e.g., to invalidate caches."""
+
+    with driver.session() as session:
+        return session.run(_generation).single()["generation"]
+
+
+def next_generation(driver: Driver) -> None:
+    """Mark that the graph has been changed."""
+
+    with driver.session() as session:
+        session.run(_next_generation).consume()
@@ -0,0 +1,141 @@
+"""
+Incremental updates between two conversions of the ConceptNet assertions.
+
+Every conversion can record a manifest: a gzipped file that lists all nodes
+and all relationships together with their weights, sorted by their keys.
+The manifests of two conversions can thus be compared with a single merge
+pass that only keeps one entry per manifest in memory. The result is a delta
+that can be applied to a running database with `apply-delta`.
+"""
+
+import csv
+import gzip
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from .external_sort import ExternalSorter
+
+_node_prefix = "N\t"
+_relationship_prefix = "R\t"
+
+nodes_added = "nodes-added.csv"
+nodes_removed = "nodes-removed.csv"
+relationships_added = "relationships-added.csv"
+relationships_removed = "relationships-removed.csv"
+relationships_reweighted = "relationships-reweighted.csv"
+
+
+class ManifestWriter:
+    """Collect the keys and weights of a conversion in sorted order."""
+
+    def __init__(self, budget: int, directory: Optional[str] = None):
+        self._nodes = ExternalSorter(budget // 4, directory)
+        self._relationships = ExternalSorter(budget - budget // 4, directory)
+
+    def add_node(self, uri: str, name: str, language: str, pos: str) -> None:
+        self._nodes.add("\t".join((uri, name, language, pos)))
+
+    def add_relationship(
+        self, category: str, start_uri: str, end_uri: str, weight: float
+    ) -> None:
+        self._relationships.add("\t".join((category, start_uri, end_uri, repr(weight))))
+
+    def write(self, path: Path) -> None:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.writelines(_node_prefix + line + "\n" for line in self._nodes.sorted())
+            f.writelines(
+                _relationship_prefix + line + "\n"
+                for line in self._relationships.sorted()
+            )
+
+
+def read_manifest(path: Path, prefix: str) -> Iterator[List[str]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(prefix):
+                yield line[len(prefix) : -1].split("\t")
+
+
+def write_delta(previous: Path, current: Path, delta_dir: Path) -> None:
+    """Write the differences between two manifests as CSV files to `delta_dir`."""
+
+    delta_dir.mkdir(parents=True, exist_ok=True)
+
+    old_nodes = _keyed(read_manifest(previous, _node_prefix), 1)
+    new_nodes = _keyed(read_manifest(current, _node_prefix), 1)
+    header = ("uri", "name", "language", "pos")
+
+    with _writer(delta_dir / nodes_added, header) as added, _writer(
+        delta_dir / nodes_removed, header[:1]
+    ) as removed:
+        for old, new in diff(old_nodes, new_nodes):
+            if old is None:
+                added.writerow(new)
+            elif new is None:
+                removed.writerow(old[:1])
+
+    old_relationships = _keyed(read_manifest(previous, _relationship_prefix), 3)
+    new_relationships = _keyed(read_manifest(current, _relationship_prefix), 3)
+    header = ("type", "start", "end", "weight")
+
+    with _writer(delta_dir / relationships_added, header) as added, _writer(
+        delta_dir / relationships_removed, header[:3]
+    ) as removed, _writer(delta_dir / relationships_reweighted, header) as reweighted:
+        for old, new in diff(old_relationships, new_relationships):
+            if old is None:
+                added.writerow(new)
+            elif new is None:
+                removed.writerow(old[:3])
+            else:
+                reweighted.writerow(new)
+
+
+def diff(
+    old: Iterable[Tuple[str, List[str]]], new: Iterable[Tuple[str, List[str]]]
+) -> Iterator[Tuple[Optional[List[str]], Optional[List[str]]]]:
+    """Compare two sequences of records sorted by their keys.
+
+    Yields pairs of old and new records that differ.
+    For added records the old one is `None` and vice versa.
+
+    >>> old = [("a", ["a", "1.0"]), ("b", ["b", "1.0"]), ("c", ["c", "1.0"])]
+    >>> new = [("b", ["b", "1.0"]), ("c", ["c", "2.0"]), ("d", ["d", "1.0"])]
+    >>> list(diff(old, new))
+    [(['a', '1.0'], None), (['c', '1.0'], ['c', '2.0']), (None, ['d', '1.0'])]
+    """
+
+    old_iter = iter(old)
+    new_iter = iter(new)
+    old_item = next(old_iter, None)
+    new_item = next(new_iter, None)
+
+    while old_item is not None or new_item is not None:
+        if new_item is None or (old_item is not None and old_item[0] < new_item[0]):
+            yield old_item[1], None
+            old_item = next(old_iter, None)
+        elif old_item is None or new_item[0] < old_item[0]:
+            yield None, new_item[1]
+            new_item = next(new_iter, None)
+        else:
+            if old_item[1] != new_item[1]:
+                yield old_item[1], new_item[1]
+
+            old_item = next(old_iter, None)
+            new_item = next(new_iter, None)
+
+
+def _keyed(
+    records: Iterable[List[str]], key_length: int
+) -> Iterator[Tuple[str, List[str]]]:
+    for record in records:
+        yield "\t".join(record[:key_length]), record
+
+
+@contextmanager
+def _writer(path: Path, header: Tuple[str, ...]) -> Iterator[Any]:
+    with path.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+
+        yield writer
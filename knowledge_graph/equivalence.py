@@ -0,0 +1,106 @@
+"""
+Equivalence classes of concepts that are connected by chosen relations.
+
+For example, with `Synonym` and `FormOf`, all surface forms and synonyms of a
+term end up in one class. Each class is identified by its smallest URI, so the
+ids do not depend on the order of the assertions. Canonicalizing a term then is
+a lookup of the `equivalence_class` property instead of a variable-length path.
+"""
+
+import csv
+from pathlib import Path
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+# The id and size of a class.
+Class = Tuple[str, int]
+
+
+class UnionFind(Generic[K]):
+    """Disjoint sets with union by size and path halving.
+
+    Only items that have been passed to `union` are stored.
+
+    >>> sets = UnionFind()
+    >>> sets.union("a", "b"); sets.union("c", "d"); sets.union("b", "d")
+    >>> sets.find("a") == sets.find("c"), sets.find("e")
+    (True, 'e')
+    """
+
+    def __init__(self) -> None:
+        self._parents: Dict[K, K] = {}
+        self._sizes: Dict[K, int] = {}
+
+    def find(self, item: K) -> K:
+        parents = self._parents
+
+        while True:
+            parent = parents.get(item, item)
+
+            if parent == item:
+                return item
+
+            grandparent = parents[parent]
+            parents[item] = grandparent
+            item = grandparent
+
+    def union(self, a: K, b: K) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+
+        if root_a == root_b:
+            return
+
+        size_a = self._sizes.get(root_a, 1)
+        size_b = self._sizes.get(root_b, 1)
+
+        if size_a < size_b:
+            root_a, root_b = root_b, root_a
+
+        self._parents[root_b] = root_a
+        self._parents.setdefault(root_a, root_a)
+        self._sizes[root_a] = size_a + size_b
+        self._sizes.pop(root_b, None)
+
+    def __len__(self) -> int:
+        return len(self._parents)
+
+    def classes(self, key: Callable[[K], str]) -> Dict[K, Class]:
+        """The class of each stored item, identified by the smallest `key` of its members.
+
+        >>> sets = UnionFind()
+        >>> sets.union(3, 1); sets.union(2, 1); sets.union(5, 4)
+        >>> sorted(sets.classes(str).items())
+        [(1, ('1', 3)), (2, ('1', 3)), (3, ('1', 3)), (4, ('4', 2)), (5, ('4', 2))]
+        """
+
+        members: Dict[K, List[K]] = {}
+
+        for item in self._parents:
+            members.setdefault(self.find(item), []).append(item)
+
+        result: Dict[K, Class] = {}
+
+        for group in members.values():
+            label = (min(map(key, group)), len(group))
+
+            for item in group:
+                result[item] = label
+
+        return result
+
+
+def write_members(path: Path, classes: Iterable[Tuple[str, Class]]) -> int:
+    """Write the `(uri, class)` pairs of classes with more than one member.
+
+    The rows are sorted by class and URI, the number of rows is returned.
+    """
+
+    rows = sorted((class_id, uri) for uri, (class_id, size) in classes if size > 1)
+
+    with path.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("class", "uri"))
+        writer.writerows(rows)
+
+    return len(rows)
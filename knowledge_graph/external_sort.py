@@ -0,0 +1,130 @@
+"""
+Sorting of text lines that do not fit into memory.
+
+Lines are buffered until the memory budget is exhausted.
+The buffer is then sorted and written to a temporary file (a run).
+When all lines have been added, the runs are combined with a k-way merge
+that only keeps one line per run in memory.
+"""
+
+import heapq
+import itertools
+import sys
+import tempfile
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional
+
+# Approximate costs of keeping a line in a list or set on top of the string itself.
+_list_overhead = 8
+_set_overhead = 60
+
+
+class ExternalSorter:
+    """Sort lines with bounded memory.
+
+    If `unique` is set, duplicate lines are removed.
+    Lines must not contain line breaks.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        directory: Optional[str] = None,
+        unique: bool = False,
+        max_fan_in: int = 128,
+    ):
+        self.budget = budget
+        self.unique = unique
+        self.max_fan_in = max_fan_in
+        self._tmp = tempfile.TemporaryDirectory(prefix="sort-", dir=directory)
+        self._runs: List[Path] = []
+        self._run_ids = itertools.count()
+        self._buffer = set() if unique else []
+        self._buffer_size = 0
+        self._overhead = _set_overhead if unique else _list_overhead
+
+    def add(self, line: str) -> None:
+        if self.unique:
+            if line in self._buffer:
+                return
+
+            self._buffer.add(line)
+        else:
+            self._buffer.append(line)
+
+        self._buffer_size += sys.getsizeof(line) + self._overhead
+
+        if self._buffer_size >= self.budget:
+            self._spill()
+
+    @property
+    def runs(self) -> int:
+        return len(self._runs)
+
+    def sorted(self) -> Iterator[str]:
+        """Yield all lines in sorted order.
+
+        This consumes the sorter, the temporary files are removed afterwards.
+        """
+
+        try:
+            if not self._runs:
+                lines: Iterable[str] = sorted(self._buffer)
+                self._reset_buffer()
+                yield from lines
+                return
+
+            if self._buffer:
+                self._spill()
+
+            while len(self._runs) > self.max_fan_in:
+                merged = self._runs[: self.max_fan_in]
+                del self._runs[: self.max_fan_in]
+                self._runs.append(self._write_run(self._merge(merged)))
+
+                for run in merged:
+                    run.unlink()
+
+            yield from self._merge(self._runs)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._reset_buffer()
+        self._runs = []
+        self._tmp.cleanup()
+
+    def _reset_buffer(self) -> None:
+        self._buffer = set() if self.unique else []
+        self._buffer_size = 0
+
+    def _spill(self) -> None:
+        self._runs.append(self._write_run(sorted(self._buffer)))
+        self._reset_buffer()
+
+    def _write_run(self, lines: Iterable[str]) -> Path:
+        path = Path(self._tmp.name, f"run-{next(self._run_ids):06}.txt")
+
+        with path.open("w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+
+        return path
+
+    def _merge(self, runs: List[Path]) -> Iterator[str]:
+        files: List[IO[str]] = [run.open(encoding="utf-8") for run in runs]
+
+        try:
+            merged = heapq.merge(*(_strip(f) for f in files))
+
+            if self.unique:
+                merged = (line for line, _ in itertools.groupby(merged))
+
+            yield from merged
+        finally:
+            for f in files:
+                f.close()
+
+
+def _strip(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        yield line[:-1]
@@ -0,0 +1,458 @@
+"""
+In-process queries on the converted graph without a database round trip.
+
+The graph is backed by the CSR arrays of `convert --csr` (see `knowledge_graph.csr`),
+so loading it is cheap and the operating system shares the pages between processes.
+Nodes are referred to by their integer ids, which `ids` looks up for many URIs.
+Neighbor queries and k-hop expansions gather the adjacency of a whole batch of
+nodes with a few NumPy operations. Shortest paths use Dijkstra's algorithm with
+the cost `1 / weight` per relationship, so strong relationships are preferred.
+URI lookups, expansions and paths are kept in bounded LRU caches.
+"""
+
+import csv
+import heapq
+from collections import OrderedDict
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import numpy as np
+
+from .csr import CsrBuilder, CsrGraph
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_directions = ("out", "in", "both")
+_missing = object()
+
+
+class LruCache(Generic[K, V]):
+    """Mapping that evicts the least recently used entries beyond `maxsize`.
+
+    >>> cache = LruCache(2)
+    >>> cache.put("a", 1); cache.put("b", 2); cache.get("a"); cache.put("c", 3)
+    1
+    >>> cache.get("b"), cache.get("c"), (cache.hits, cache.misses)
+    (None, 3, (2, 1))
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[K, V]" = OrderedDict()
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._items.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class Neighbors(NamedTuple):
+    """Relationships of a batch of nodes as parallel arrays.
+
+    `query[i]` is the position of the queried node in the batch,
+    `node[i]` the id of its neighbor.
+    """
+
+    query: np.ndarray
+    node: np.ndarray
+    relation: np.ndarray
+    weight: np.ndarray
+
+
+class Expansion(NamedTuple):
+    """Nodes reached from a batch of seeds with their number of hops."""
+
+    seed: np.ndarray
+    node: np.ndarray
+    hops: np.ndarray
+
+
+class WeightedPath(NamedTuple):
+    nodes: List[int]
+    cost: float
+
+
+class Graph:
+    def __init__(self, csr: CsrGraph, cache_size: int = 100000):
+        self.csr = csr
+        self._relation_codes = {
+            name: code for code, name in enumerate(csr.relation_names)
+        }
+        self._id_cache: LruCache[str, int] = LruCache(cache_size)
+        self._expansion_cache: LruCache[tuple, Tuple[np.ndarray, np.ndarray]] = (
+            LruCache(cache_size)
+        )
+        self._path_cache: LruCache[tuple, Any] = LruCache(cache_size)
+
+    @classmethod
+    def load(cls, directory: Path, cache_size: int = 100000) -> "Graph":
+        return cls(CsrGraph(directory), cache_size)
+
+    @classmethod
+    def from_csv(
+        cls,
+        nodes_csv: Path,
+        relationships_csv: Path,
+        directory: Path,
+        cache_size: int = 100000,
+    ) -> "Graph":
+        """Build the CSR arrays in `directory` from the CSV files of `convert`."""
+
+        builder = CsrBuilder()
+
+        with nodes_csv.open(newline="") as f:
+            rows = csv.reader(f)
+            next(rows)
+
+            for row in rows:
+                builder.add_node(row[0])
+
+        with relationships_csv.open(newline="") as f:
+            rows = csv.reader(f)
+            weight = next(rows).index("weight:double")
+
+            for row in rows:
+                builder.add_relationship(row[2], row[0], row[1], float(row[weight]))
+
+        builder.write(directory)
+
+        return cls.load(directory, cache_size)
+
+    @property
+    def node_count(self) -> int:
+        return self.csr.node_count
+
+    def ids(self, uris: Iterable[str]) -> np.ndarray:
+        """Look up the ids of nodes, -1 marks unknown URIs."""
+
+        result = []
+
+        for uri in uris:
+            id = self._id_cache.get(uri)
+
+            if id is None:
+                try:
+                    id = self.csr.node(uri)
+                except KeyError:
+                    id = -1
+
+                self._id_cache.put(uri, id)
+
+            result.append(id)
+
+        return np.array(result, dtype=np.int64)
+
+    def uris(self, ids: Iterable[int]) -> List[str]:
+        return [self.csr.uri(id) for id in ids]
+
+    def neighbors(
+        self,
+        nodes: Sequence[int],
+        categories: Optional[Iterable[str]] = None,
+        min_weight: float = 0.0,
+        direction: str = "out",
+    ) -> Neighbors:
+        """Find the neighbors of all `nodes` at once.
+
+        Relationships can be restricted to `categories` (e.g., `IsA`)
+        and to a weight of at least `min_weight`.
+        `direction` is `out`, `in` or `both`. Unknown nodes (-1) have no neighbors.
+        """
+
+        if direction not in _directions:
+            raise ValueError(f"Unknown direction {direction!r}.")
+
+        nodes = np.asarray(nodes, dtype=np.int64)
+        parts = []
+
+        if direction in ("out", "both"):
+            query, edges = _gather(self.csr.indptr, nodes)
+            parts.append((query, self.csr.indices[edges], edges))
+
+        if direction in ("in", "both"):
+            query, positions = _gather(self.csr.reverse_indptr, nodes)
+            parts.append(
+                (
+                    query,
+                    self.csr.reverse_indices[positions],
+                    self.csr.reverse_edges[positions],
+                )
+            )
+
+        query = np.concatenate([part[0] for part in parts])
+        node = np.concatenate([part[1] for part in parts]).astype(np.int64)
+        edges = np.concatenate([part[2] for part in parts])
+        relation = self.csr.relations[edges]
+        weight = self.csr.weights[edges]
+
+        mask = weight >= min_weight
+
+        if categories is not None:
+            mask &= self._category_mask(categories)[relation]
+
+        return Neighbors(query[mask], node[mask], relation[mask], weight[mask])
+
+    def expand(
+        self,
+        seeds: Sequence[int],
+        hops: int,
+        categories: Optional[Iterable[str]] = None,
+        min_weight: float = 0.0,
+        direction: str = "out",
+    ) -> Expansion:
+        """Find all nodes within `hops` relationships of each seed.
+
+        All seeds are expanded together, one batch of neighbor queries per hop.
+        The seeds themselves are included with zero hops, unknown seeds (-1) reach
+        nothing.
+        """
+
+        seeds = np.asarray(seeds, dtype=np.int64)
+        categories = None if categories is None else frozenset(categories)
+        key = (hops, categories, min_weight, direction)
+        results: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        uncached = []
+
+        for seed in np.unique(seeds).tolist():
+            if seed < 0:
+                results[seed] = (np.empty(0, np.int64), np.empty(0, np.int64))
+                continue
+
+            cached = self._expansion_cache.get((seed, *key))
+
+            if cached is None:
+                uncached.append(seed)
+            else:
+                results[seed] = cached
+
+        missing = np.array(uncached, dtype=np.int64)
+
+        if len(missing):
+            n = self.node_count
+            # A pair of seed and reached node is identified by seed * n + node.
+            frontier_seed = np.arange(len(missing))
+            frontier = missing
+            visited = [frontier_seed * n + frontier]
+            distances = [np.zeros(len(missing), dtype=np.int64)]
+            seen = visited[0]
+
+            for hop in range(1, hops + 1):
+                if not len(frontier):
+                    break
+
+                found = self.neighbors(frontier, categories, min_weight, direction)
+                pairs = np.unique(frontier_seed[found.query] * n + found.node)
+                pairs = pairs[~np.isin(pairs, seen, assume_unique=True)]
+                seen = np.union1d(seen, pairs)
+                visited.append(pairs)
+                distances.append(np.full(len(pairs), hop, dtype=np.int64))
+                frontier_seed, frontier = np.divmod(pairs, n)
+
+            pairs = np.concatenate(visited)
+            hop_counts = np.concatenate(distances)
+            order = np.argsort(pairs, kind="stable")
+            pairs, hop_counts = pairs[order], hop_counts[order]
+            seed_index, reached = np.divmod(pairs, n)
+            bounds = np.searchsorted(seed_index, np.arange(len(missing) + 1))
+
+            for i, seed in enumerate(missing.tolist()):
+                result = (
+                    reached[bounds[i] : bounds[i + 1]],
+                    hop_counts[bounds[i] : bounds[i + 1]],
+                )
+                results[seed] = result
+                self._expansion_cache.put((seed, *key), result)
+
+        parts = [results[seed] for seed in seeds.tolist()]
+
+        return Expansion(
+            np.repeat(np.arange(len(seeds)), [len(part[0]) for part in parts]),
+            np.concatenate([part[0] for part in parts] or [np.empty(0, np.int64)]),
+            np.concatenate([part[1] for part in parts] or [np.empty(0, np.int64)]),
+        )
+
+    def shortest_paths(
+        self,
+        pairs: Iterable[Tuple[int, int]],
+        categories: Optional[Iterable[str]] = None,
+        min_weight: float = 0.0,
+        direction: str = "out",
+        max_cost: float = float("inf"),
+    ) -> List[Optional[WeightedPath]]:
+        """Find the cheapest path for each pair of start and end node.
+
+        Pairs with the same start node share a single search.
+        The result is None if there is no path that costs at most `max_cost`
+        or if one of the nodes is unknown (-1).
+        """
+
+        pairs = list(pairs)
+        categories = None if categories is None else frozenset(categories)
+        key = (categories, min_weight, direction, max_cost)
+        results: Dict[Tuple[int, int], Optional[WeightedPath]] = {}
+        targets: Dict[int, set] = {}
+
+        for start, end in pairs:
+            if start < 0 or end < 0:
+                results[start, end] = None
+                continue
+
+            cached = self._path_cache.get((start, end, *key), _missing)
+
+            if cached is not _missing:
+                results[start, end] = cached
+            else:
+                targets.setdefault(start, set()).add(end)
+
+        allowed = None if categories is None else self._category_mask(categories)
+
+        for start, ends in targets.items():
+            found = _dijkstra(
+                lambda node: self._weighted_neighbors(
+                    node, allowed, min_weight, direction
+                ),
+                start,
+                ends,
+                max_cost,
+            )
+
+            for end in ends:
+                results[start, end] = found.get(end)
+                self._path_cache.put((start, end, *key), found.get(end))
+
+        return [results[pair] for pair in pairs]
+
+    def _weighted_neighbors(
+        self,
+        node: int,
+        allowed: Optional[np.ndarray],
+        min_weight: float,
+        direction: str,
+    ) -> Iterable[Tuple[int, float]]:
+        parts = []
+
+        if direction in ("out", "both"):
+            parts.append(self.csr.successors(node))
+
+        if direction in ("in", "both"):
+            parts.append(self.csr.predecessors(node))
+
+        for nodes, relations, weights in parts:
+            mask = (weights >= min_weight) & (weights > 0)
+
+            if allowed is not None:
+                mask &= allowed[relations]
+
+            yield from zip(nodes[mask].tolist(), (1.0 / weights[mask]).tolist())
+
+    def _category_mask(self, categories: Iterable[str]) -> np.ndarray:
+        mask = np.zeros(len(self.csr.relation_names), dtype=bool)
+
+        for category in categories:
+            code = self._relation_codes.get(category)
+
+            # Categories that do not occur in the graph match nothing.
+            if code is not None:
+                mask[code] = True
+
+        return mask
+
+
+def _gather(indptr: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of the adjacency entries of all `nodes` and the node they belong to.
+
+    >>> query, positions = _gather(np.array([0, 2, 2, 5]), np.array([2, 0]))
+    >>> query.tolist(), positions.tolist()
+    ([0, 0, 0, 1, 1], [2, 3, 4, 0, 1])
+    >>> _gather(np.array([0, 2, 2, 5]), np.array([-1, 0]))[0].tolist()
+    [1, 1]
+    """
+
+    # Unknown nodes (-1) have no entries.
+    known = nodes >= 0
+    safe = np.where(known, nodes, 0)
+    starts = indptr[safe]
+    lengths = np.where(known, indptr[safe + 1] - starts, 0)
+    query = np.repeat(np.arange(len(nodes)), lengths)
+    # Offset of every entry within the adjacency of its node.
+    offsets = np.arange(len(query)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    return query, np.repeat(starts, lengths) + offsets
+
+
+def _dijkstra(
+    neighbors: Callable[[int], Iterable[Tuple[int, float]]],
+    start: int,
+    ends: set,
+    max_cost: float,
+) -> Dict[int, WeightedPath]:
+    """Search from `start` until all `ends` have been reached.
+
+    >>> edges = {0: [(1, 1.0), (2, 4.0)], 1: [(2, 1.0)], 2: []}
+    >>> _dijkstra(edges.__getitem__, 0, {2}, 10.0)
+    {2: WeightedPath(nodes=[0, 1, 2], cost=2.0)}
+    """
+
+    costs = {start: 0.0}
+    previous: Dict[int, int] = {}
+    remaining = set(ends)
+    found = {}
+    heap = [(0.0, start)]
+
+    while heap and remaining:
+        cost, node = heapq.heappop(heap)
+
+        if cost > costs[node]:
+            continue
+
+        if node in remaining:
+            remaining.discard(node)
+            path = [node]
+
+            while path[-1] != start:
+                path.append(previous[path[-1]])
+
+            found[node] = WeightedPath(path[::-1], cost)
+
+        for neighbor, edge_cost in neighbors(node):
+            new_cost = cost + edge_cost
+
+            if new_cost <= max_cost and new_cost < costs.get(neighbor, float("inf")):
+                costs[neighbor] = new_cost
+                previous[neighbor] = node
+                heapq.heappush(heap, (new_cost, neighbor))
+
+    return found
@@ -0,0 +1,142 @@
+"""
+Random access to the gzipped assertions.
+
+Gzip streams can only be decompressed from the beginning.
+`build-index` decompresses the dump once and stores two sidecar files next to it:
+the access points of `indexed_gzip` (a zran index that records the
+decompressor state every few MiB) and the uncompressed offsets of every n-th row.
+With these files, reading can start at any row without decompressing
+everything before it. This requires the optional dependency `indexed_gzip`
+(`poetry install -E index`).
+"""
+
+import io
+import itertools
+import json
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+import click
+
+_mebibyte = 1024 * 1024
+
+
+def index_paths(dump: Path) -> Tuple[Path, Path]:
+    return (
+        dump.with_name(dump.name + ".zran"),
+        dump.with_name(dump.name + ".rows.json"),
+    )
+
+
+def has_index(dump: Path) -> bool:
+    return all(path.exists() for path in index_paths(dump))
+
+
+class IndexedDump:
+    """Read rows of a gzipped dump for which `build_index` has been run."""
+
+    def __init__(self, dump: Path):
+        self.dump = dump
+        self._zran_path, rows_path = index_paths(dump)
+
+        with rows_path.open() as f:
+            rows_index = json.load(f)
+
+        self.rows: int = rows_index["rows"]
+        self.every: int = rows_index["every"]
+        self.checkpoints: List[int] = rows_index["checkpoints"]
+
+    def lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the rows `start` (inclusive) to `end` (exclusive)."""
+
+        checkpoint = min(start // self.every, len(self.checkpoints) - 1)
+
+        with self._open(self.checkpoints[checkpoint]) as f:
+            skip = start - checkpoint * self.every
+            stop = None if end is None else end - checkpoint * self.every
+
+            yield from itertools.islice(f, skip, stop)
+
+    def sample(self, size: int, chunks: int = 100) -> Iterator[bytes]:
+        """Yield about `size` rows that are spread uniformly over the dump.
+
+        The sample consists of runs of consecutive rows that start at evenly
+        spaced checkpoints, so only these runs need to be decompressed.
+        """
+
+        chunks = max(1, min(chunks, size, len(self.checkpoints)))
+        chunk_size = min(-(-size // chunks), self.every)
+        step = len(self.checkpoints) / chunks
+
+        for i in range(chunks):
+            checkpoint = self.checkpoints[int(i * step)]
+
+            with self._open(checkpoint) as f:
+                yield from itertools.islice(f, chunk_size)
+
+    def _open(self, offset: int) -> io.BufferedReader:
+        igzip = _import_indexed_gzip()
+        f = igzip.IndexedGzipFile(str(self.dump), index_file=str(self._zran_path))
+        f.seek(offset)
+
+        # Without the additional buffer, reading lines is much slower.
+        return io.BufferedReader(f, _mebibyte)
+
+
+def build_index(dump: Path, spacing: int, every: int) -> None:
+    igzip = _import_indexed_gzip()
+    zran_path, rows_path = index_paths(dump)
+    checkpoints = []
+    offset = 0
+    rows = 0
+
+    with igzip.IndexedGzipFile(str(dump), spacing=spacing) as f:
+        for line in f:
+            if rows % every == 0:
+                checkpoints.append(offset)
+
+            offset += len(line)
+            rows += 1
+
+        f.export_index(str(zran_path))
+
+    with rows_path.open("w") as f:
+        json.dump({"rows": rows, "every": every, "checkpoints": checkpoints}, f)
+
+
+def _import_indexed_gzip() -> Any:
+    try:
+        import indexed_gzip
+    except ImportError:
+        raise click.ClickException(
+            "Random access to the dump requires indexed_gzip (poetry install -E index)."
+        )
+
+    return indexed_gzip
+
+
+@click.command("build-index")
+@click.argument("conceptnet_csv", default="data/conceptnet-assertions-5.7.0.csv.gz")
+@click.option(
+    "--spacing",
+    default=4,
+    show_default=True,
+    help="Distance between decompression access points in MiB.",
+)
+@click.option(
+    "--every",
+    default=100000,
+    show_default=True,
+    help="Number of rows between two row checkpoints.",
+)
+def main(conceptnet_csv: str, spacing: int, every: int) -> None:
+    dump = Path(conceptnet_csv)
+    click.echo(f"Indexing {conceptnet_csv}")
+    build_index(dump, spacing * _mebibyte, every)
+
+    for path in index_paths(dump):
+        click.echo(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from pathlib import Path
 
 import click
 
+from . import metrics, online_import
+from .sharded_csv import find_shards
 
 """
 NULL values in CSVs: https://github.com/neo4j/neo4j/issues/2521
@@ -11,39 +13,99 @@ NULL values in CSVs: https://github.com/neo4j/neo4j/issues/2521
 
 
 def import_statement(key: str, files: t.Iterable[str]) -> t.List[str]:
+    """
+    Files that are separated by commas form a group (e.g., a header and its parts),
+    which is imported as one input.
+
+    >>> import_statement("nodes", ["a.csv", "a-header.csv,a-00001.csv.gz"])
+    ['--nodes', 'import/a.csv', '--nodes', 'import/a-header.csv,import/a-00001.csv.gz']
+    """
     stmt = []
     for file in files:
         stmt.append(f"--{key}")
-        stmt.append(f"import/{file}")
+        stmt.append(",".join(f"import/{part}" for part in file.split(",")))
 
     return stmt
 
 
+def shard_group(import_dir: Path, file: str) -> str:
+    header, parts = find_shards(import_dir / file)
+
+    if not header.exists() or not parts:
+        raise click.ClickException(f"There are no parts of {file} in {import_dir}.")
+
+    return ",".join(path.name for path in [header, *parts])
+
+
 @click.command("import")
 @click.option("--nodes", multiple=True, default=["conceptnet-nodes.csv"])
 @click.option(
     "--relationships", multiple=True, default=["conceptnet-relationships.csv"]
 )
-def main(nodes, relationships):
+@click.option(
+    "--sharded",
+    is_flag=True,
+    help="Import the header files and gzipped parts written by convert --shards.",
+)
+@click.option(
+    "--online",
+    is_flag=True,
+    help="Load the files into the running database instead of replacing it.",
+)
+@click.option(
+    "--workers",
+    default=4,
+    show_default=True,
+    help="Concurrent sessions of --online.",
+)
+@click.option(
+    "--batch-size",
+    default=10000,
+    show_default=True,
+    help="Rows per transaction of --online.",
+)
+@click.option(
+    "--retries",
+    default=5,
+    show_default=True,
+    help="Attempts per failed batch of --online.",
+)
+def main(nodes, relationships, sharded, online, workers, batch_size, retries):
+    import_dir = Path("data/neo4j/import")
+
+    if online:
+        online_import.load_online(
+            import_dir, nodes, relationships, sharded, workers, batch_size, retries
+        )
+        return
+
+    if sharded:
+        nodes = [shard_group(import_dir, file) for file in nodes]
+        relationships = [shard_group(import_dir, file) for file in relationships]
+
     node_imports = import_statement("nodes", nodes)
     relationship_imports = import_statement("relationships", relationships)
 
     subprocess.run(["sudo", "docker-compose", "stop", "neo4j"])
     subprocess.run(["sudo", "rm", "-rf", "data/neo4j/data"])
     subprocess.run(["sudo", "mkdir", "data/neo4j/data"])
-    subprocess.run(
-        [
-            "sudo",
-            "docker-compose",
-            "run",
-            "--rm",
-            "neo4j",
-            "bin/neo4j-admin",
-            "import",
-        ]
-        + node_imports
-        + relationship_imports
-    )
+
+    with metrics.run.phase("import"):
+        result = subprocess.run(
+            [
+                "sudo",
+                "docker-compose",
+                "run",
+                "--rm",
+                "neo4j",
+                "bin/neo4j-admin",
+                "import",
+            ]
+            + node_imports
+            + relationship_imports
+        )
+
+    metrics.run.update(import_returncode=result.returncode)
     subprocess.run(["sudo", "docker-compose", "start", "neo4j"])
 
 
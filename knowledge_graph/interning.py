@@ -0,0 +1,76 @@
+"""
+Compact integer representation of nodes and relationships.
+
+Every distinct value (e.g., a node or a relation category) is assigned a dense
+integer id in the order of its first appearance. A relationship is then
+identified by a single integer that packs the ids of its category, start node
+and end node. Python stores such integers far more compactly than tuples or
+assertion URIs and hashes them faster.
+"""
+
+from typing import Dict, Generic, Hashable, List, Tuple, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+# Supports up to 2^31 nodes, the category id occupies the remaining high bits.
+_node_bits = 31
+_node_mask = (1 << _node_bits) - 1
+
+
+class Vocabulary(Generic[T]):
+    """Assign dense integer ids to hashable values.
+
+    >>> categories = Vocabulary()
+    >>> categories.add("IsA"), categories.add("Synonym"), categories.add("IsA")
+    (0, 1, 0)
+    >>> len(categories), categories[1]
+    (2, 'Synonym')
+    """
+
+    __slots__ = ("_ids", "values")
+
+    def __init__(self) -> None:
+        self._ids: Dict[T, int] = {}
+        self.values: List[T] = []
+
+    def add(self, value: T) -> int:
+        id = self._ids.get(value)
+
+        if id is None:
+            id = len(self.values)
+            self._ids[value] = id
+            self.values.append(value)
+
+        return id
+
+    def id(self, value: T) -> int:
+        return self._ids[value]
+
+    def __contains__(self, value: T) -> bool:
+        return value in self._ids
+
+    def __getitem__(self, id: int) -> T:
+        return self.values[id]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def pack_edge(category: int, start: int, end: int) -> int:
+    """
+    >>> pack_edge(3, 42, 7) == (3 << 62) | (42 << 31) | 7
+    True
+    """
+    return (((category << _node_bits) | start) << _node_bits) | end
+
+
+def unpack_edge(key: int) -> Tuple[int, int, int]:
+    """
+    >>> unpack_edge(pack_edge(3, 42, 7))
+    (3, 42, 7)
+    """
+    end = key & _node_mask
+    key >>= _node_bits
+    start = key & _node_mask
+
+    return key >> _node_bits, start, end
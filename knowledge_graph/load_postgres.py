@@ -0,0 +1,415 @@
+"""
+Load the converted graph into the Postgres database of `docker-compose.yml`.
+
+The tables are replaced on every load:
+
+- `concept (id, uri, name, language, pos)`, partitioned by `language`.
+- `relation (id, name)` with the relationship types.
+- `relationship (start_language, start_id, end_language, end_id, relation_id,
+  weight, ...)`, partitioned by `start_language`. The metadata columns of
+  `convert --metadata` are loaded as text arrays, the assertion URI is left out
+  (it can be rebuilt from the relation and the URIs of the concepts).
+
+Concepts are numbered in the order of the nodes file, so relationships refer
+to them by integers. The rows are sent with `COPY FROM STDIN` over `--streams`
+parallel connections, and the keys, indexes and foreign keys are only created
+afterwards (also in parallel), which is much faster than maintaining them
+during the load. This requires `poetry install -E postgres`.
+"""
+
+import os
+import queue
+import threading
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import click
+from dotenv import load_dotenv
+
+from . import metrics
+from .online_import import open_rows
+
+load_dotenv()
+
+_escapes = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_value(value: t.Any) -> str:
+    """Format a value for the text format of `COPY`.
+
+    >>> copy_value("a\\tb"), copy_value(None), copy_value(1.5)
+    ('a\\\\tb', '\\\\N', '1.5')
+    """
+
+    if value is None:
+        return "\\N"
+
+    return str(value).translate(_escapes)
+
+
+def array_literal(values: t.Iterable[str]) -> str:
+    """
+    >>> print(array_literal(["/d/wordnet/3.1", 'say "hi"']))
+    {"/d/wordnet/3.1","say \\"hi\\""}
+    """
+
+    quoted = (
+        '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values
+    )
+
+    return "{" + ",".join(quoted) + "}"
+
+
+def _table(name: str, language: str) -> str:
+    """Name of a partition, languages like `zh-Hans` are not valid identifiers.
+
+    >>> _table("concept", "en"), _table("concept", "zh-Hans")
+    ('concept_en', 'concept_zh_hans')
+    """
+
+    return f"{name}_{''.join(c if c.isalnum() else '_' for c in language.lower())}"
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def schema(languages: t.Iterable[str], metadata: t.Sequence[str]) -> t.List[str]:
+    statements = [
+        "DROP TABLE IF EXISTS relationship, relation, concept CASCADE",
+        """CREATE TABLE concept (
+            id integer NOT NULL,
+            uri text NOT NULL,
+            name text NOT NULL,
+            language text NOT NULL,
+            pos text
+        ) PARTITION BY LIST (language)""",
+        "CREATE TABLE relation (id smallint NOT NULL, name text NOT NULL)",
+        """CREATE TABLE relationship (
+            start_language text NOT NULL,
+            start_id integer NOT NULL,
+            end_language text NOT NULL,
+            end_id integer NOT NULL,
+            relation_id smallint NOT NULL,
+            weight double precision%s
+        ) PARTITION BY LIST (start_language)"""
+        % "".join(f",\n            {field} text[]" for field in metadata),
+    ]
+
+    for language in sorted(languages):
+        for table in ("concept", "relationship"):
+            statements.append(
+                f"CREATE TABLE {_table(table, language)} PARTITION OF {table}"
+                f" FOR VALUES IN ({_literal(language)})"
+            )
+
+    return statements
+
+
+# The statements of a group are run in order, the groups in parallel.
+indexes = [
+    [
+        "ALTER TABLE concept ADD PRIMARY KEY (language, id)",
+        "ALTER TABLE relation ADD PRIMARY KEY (id)",
+        "ALTER TABLE relationship ADD FOREIGN KEY (relation_id) REFERENCES relation",
+        "ALTER TABLE relationship ADD FOREIGN KEY (start_language, start_id)"
+        " REFERENCES concept (language, id)",
+        "ALTER TABLE relationship ADD FOREIGN KEY (end_language, end_id)"
+        " REFERENCES concept (language, id)",
+    ],
+    ["CREATE UNIQUE INDEX ON concept (uri, language)"],
+    ["CREATE INDEX ON concept (language, name)"],
+    ["CREATE INDEX ON relationship (start_id)"],
+    ["CREATE INDEX ON relationship (end_id)"],
+    ["CREATE INDEX ON relationship (relation_id)"],
+]
+
+
+class _Stream:
+    """File-like object from which `copy_expert` reads the chunks of a queue."""
+
+    def __init__(self, chunks: "queue.Queue[t.Optional[bytes]]"):
+        self._chunks = chunks
+        self._chunk = b""
+        self._offset = 0
+        self._done = False
+
+    def read(self, size: int = -1) -> bytes:
+        while self._offset >= len(self._chunk):
+            chunk = self._chunks.get()
+
+            if chunk is None:
+                self._done = True
+                return b""
+
+            self._chunk, self._offset = chunk, 0
+
+        end = len(self._chunk) if size < 0 else self._offset + size
+        data = self._chunk[self._offset : end]
+        self._offset += len(data)
+
+        return data
+
+    def drain(self) -> None:
+        """Discard the remaining chunks, so that the producer is not blocked."""
+
+        while not self._done:
+            self._done = self._chunks.get() is None
+
+
+@contextmanager
+def _transaction(connect: t.Callable[[], t.Any]) -> t.Iterator[t.Any]:
+    """A cursor whose statements are committed at the end."""
+
+    connection = connect()
+
+    try:
+        # The connection commits or rolls back, the cursor is closed.
+        with connection, connection.cursor() as cursor:
+            yield cursor
+    finally:
+        connection.close()
+
+
+def copy_parallel(
+    connect: t.Callable[[], t.Any],
+    statement: str,
+    rows: t.Iterable[t.Sequence[t.Any]],
+    streams: int,
+    chunk_rows: int = 10000,
+    progress: t.Callable[[int], None] = lambda count: None,
+) -> int:
+    """Send the rows with `streams` concurrent `COPY` statements.
+
+    Chunks of `chunk_rows` rows are distributed round-robin over the streams,
+    each of which holds at most two chunks in memory.
+    """
+
+    queues: t.List["queue.Queue[t.Optional[bytes]]"] = [
+        queue.Queue(2) for _ in range(streams)
+    ]
+    errors: t.List[BaseException] = []
+    failed = threading.Event()
+
+    def copy(chunks: "queue.Queue[t.Optional[bytes]]") -> None:
+        stream = _Stream(chunks)
+
+        try:
+            with _transaction(connect) as cursor:
+                cursor.copy_expert(statement, stream, size=1 << 20)
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+            stream.drain()
+
+    threads = [threading.Thread(target=copy, args=(q,)) for q in queues]
+
+    for thread in threads:
+        thread.start()
+
+    count = 0
+    lines: t.List[str] = []
+
+    try:
+        for row in rows:
+            lines.append("\t".join(map(copy_value, row)))
+            count += 1
+
+            if len(lines) >= chunk_rows:
+                chunk = ("\n".join(lines) + "\n").encode("utf-8")
+                queues[(count // chunk_rows) % streams].put(chunk)
+                lines = []
+                progress(count)
+
+                if failed.is_set():
+                    break
+
+        if lines and not failed.is_set():
+            queues[0].put(("\n".join(lines) + "\n").encode("utf-8"))
+    finally:
+        for q in queues:
+            q.put(None)
+
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+    progress(count)
+
+    return count
+
+
+def _column(header: t.Sequence[str], kind: str) -> int:
+    return next(i for i, c in enumerate(header) if c.partition(":")[2] == kind)
+
+
+def _connect_function() -> t.Callable[[], t.Any]:
+    try:
+        import psycopg2
+    except ImportError:
+        raise click.ClickException(
+            "Loading into Postgres requires psycopg2 (poetry install -E postgres)."
+        )
+
+    def connect() -> t.Any:
+        return psycopg2.connect(
+            host=os.getenv("POSTGRES_HOST", "localhost"),
+            port=os.getenv("POSTGRES_PORT", "5432"),
+            dbname=os.getenv("POSTGRES_DB"),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD"),
+        )
+
+    return connect
+
+
+def _execute(connect: t.Callable[[], t.Any], statements: t.Sequence[str]) -> None:
+    with _transaction(connect) as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _execute_each(connect: t.Callable[[], t.Any], statements: t.Sequence[str]) -> None:
+    """Commit each statement, so the locks are only held while it runs."""
+
+    for statement in statements:
+        _execute(connect, [statement])
+
+
+def load(
+    connect: t.Callable[[], t.Any],
+    nodes_path: Path,
+    relationships_path: Path,
+    sharded: bool,
+    streams: int,
+) -> t.Tuple[int, int]:
+    """Replace the tables with the graph and return the node and relationship counts."""
+
+    ids: t.Dict[str, t.Tuple[str, int]] = {}
+
+    with metrics.run.phase("postgres.schema"):
+        with open_rows(nodes_path, sharded) as (header, rows):
+            uri, language = _column(header, "ID"), header.index("language")
+
+            for i, row in enumerate(rows):
+                ids[row[uri]] = (row[language], i)
+
+        with open_rows(relationships_path, sharded) as (header, rows):
+            metadata = [c.partition(":")[0] for c in header if c.endswith(":string[]")]
+
+        languages = {language for language, _ in ids.values()}
+        _execute(connect, schema(languages, metadata))
+
+    with metrics.run.phase("postgres.nodes"):
+        with open_rows(nodes_path, sharded) as (header, rows):
+            columns = [_column(header, "ID"), *map(header.index, ("name", "language"))]
+            pos = header.index("pos")
+            progress = metrics.Progress()
+            node_count = copy_parallel(
+                connect,
+                "COPY concept (id, uri, name, language, pos) FROM STDIN",
+                (
+                    (i, *(row[c] for c in columns), row[pos] or None)
+                    for i, row in enumerate(rows)
+                ),
+                streams,
+                progress=progress.update,
+            )
+            progress.close()
+
+    relations: t.Dict[str, int] = {}
+
+    with metrics.run.phase("postgres.relationships"):
+        with open_rows(relationships_path, sharded) as (header, rows):
+            start, end, type_ = (
+                _column(header, k) for k in ("START_ID", "END_ID", "TYPE")
+            )
+            weight = header.index("weight:double")
+            arrays = [header.index(f"{field}:string[]") for field in metadata]
+
+            def converted() -> t.Iterator[t.Tuple[t.Any, ...]]:
+                for row in rows:
+                    relation = relations.setdefault(row[type_], len(relations))
+
+                    yield (
+                        *ids[row[start]],
+                        *ids[row[end]],
+                        relation,
+                        row[weight] or None,
+                        *(
+                            array_literal(row[i].split(";") if row[i] else [])
+                            for i in arrays
+                        ),
+                    )
+
+            fields = ", ".join(metadata)
+            progress = metrics.Progress()
+            relationship_count = copy_parallel(
+                connect,
+                "COPY relationship (start_language, start_id, end_language, end_id,"
+                f" relation_id, weight{', ' if fields else ''}{fields}) FROM STDIN",
+                converted(),
+                streams,
+                progress=progress.update,
+            )
+            progress.close()
+            copy_parallel(
+                connect,
+                "COPY relation (id, name) FROM STDIN",
+                ((i, name) for name, i in relations.items()),
+                1,
+            )
+
+    with metrics.run.phase("postgres.indexes"):
+        with ThreadPoolExecutor(streams) as executor:
+            for future in [
+                executor.submit(_execute_each, connect, group) for group in indexes
+            ]:
+                future.result()
+
+        _execute(
+            connect, ["ANALYZE concept", "ANALYZE relation", "ANALYZE relationship"]
+        )
+
+    return node_count, relationship_count
+
+
+@click.command("load-postgres")
+@click.option("--nodes", default="conceptnet-nodes.csv", show_default=True)
+@click.option(
+    "--relationships", default="conceptnet-relationships.csv", show_default=True
+)
+@click.option("--import-dir", default="data/neo4j/import", show_default=True)
+@click.option(
+    "--sharded",
+    is_flag=True,
+    help="Read the header files and gzipped parts written by convert --shards.",
+)
+@click.option(
+    "--streams",
+    default=4,
+    show_default=True,
+    help="Parallel COPY streams (and index builds).",
+)
+def main(nodes, relationships, import_dir, sharded, streams):
+    directory = Path(import_dir)
+    node_count, relationship_count = load(
+        _connect_function(),
+        directory / nodes,
+        directory / relationships,
+        sharded,
+        streams,
+    )
+
+    click.echo(f"Loaded {node_count} nodes and {relationship_count} relationships")
+    metrics.run.update(
+        postgres_nodes=node_count, postgres_relationships=relationship_count
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Extraction of the metadata stored in the fifth column of the ConceptNet assertions.
+
+The column contains a JSON object like this (shortened):
+
+```
+{"dataset": "/d/wiktionary/en", "license": "cc:by-sa/4.0",
+"sources": [{"contributor": "/s/resource/wiktionary/en",
+"process": "/s/process/wikiparsec/2"}], "weight": 1.0}
+```
+
+It is parsed with `json.loads`, which is considerably faster than
+`ast.literal_eval`. The latter is only used for rows that are not valid JSON.
+"""
+
+import ast
+import json
+from dataclasses import dataclass
+from typing import Any, Mapping, Tuple
+
+# Metadata that can be exported as relationship properties.
+# The weight is always exported.
+fields = ("dataset", "license", "contributors")
+
+
+@dataclass(frozen=True)
+class Metadata:
+    weight: float = 1.0
+    dataset: Tuple[str, ...] = ()
+    license: Tuple[str, ...] = ()
+    contributors: Tuple[str, ...] = ()
+
+    @classmethod
+    def parse(cls, text: str) -> "Metadata":
+        """
+        >>> Metadata.parse('{"dataset": "/d/verbosity", "weight": 0.5}')
+        Metadata(weight=0.5, dataset=('/d/verbosity',), license=(), contributors=())
+        >>> Metadata.parse("{'weight': 2}").weight
+        2.0
+        """
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = ast.literal_eval(text)
+
+        return cls.from_mapping(data)
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "Metadata":
+        """
+        >>> Metadata.from_mapping({
+        ...     "license": "cc:by/4.0",
+        ...     "sources": [
+        ...         {"contributor": "/s/contributor/omcs/dev"},
+        ...         {"process": "/s/process/split_words"},
+        ...     ],
+        ... })
+        Metadata(weight=1.0, dataset=(), license=('cc:by/4.0',), contributors=('/s/contributor/omcs/dev',))
+        """
+        dataset = data.get("dataset")
+        license = data.get("license")
+
+        return cls(
+            float(data.get("weight", 1.0)),
+            (dataset,) if dataset else (),
+            (license,) if license else (),
+            tuple(
+                source["contributor"]
+                for source in data.get("sources", ())
+                if "contributor" in source
+            ),
+        )
+
+    def select(self, selected: Tuple[str, ...]) -> "Metadata":
+        """Drop all fields that are not `selected` to save memory.
+
+        >>> Metadata(2.0, ("/d/verbosity",), ("cc:by/4.0",)).select(("license",))
+        Metadata(weight=2.0, dataset=(), license=('cc:by/4.0',), contributors=())
+        """
+        return Metadata(
+            self.weight,
+            *(getattr(self, field) if field in selected else () for field in fields),
+        )
+
+    def merge(self, other: "Metadata") -> "Metadata":
+        """Combine the metadata of two identical assertions.
+
+        The weights are summed, the other values are joined without duplicates.
+
+        >>> Metadata(1.0, ("/d/wordnet/3.1",)).merge(
+        ...     Metadata(0.5, ("/d/verbosity", "/d/wordnet/3.1"))
+        ... )
+        Metadata(weight=1.5, dataset=('/d/wordnet/3.1', '/d/verbosity'), license=(), contributors=())
+        """
+        return Metadata(
+            self.weight + other.weight,
+            *(_union(getattr(self, field), getattr(other, field)) for field in fields),
+        )
+
+
+def _union(first: Tuple[str, ...], second: Tuple[str, ...]) -> Tuple[str, ...]:
+    return first + tuple(value for value in second if value not in first)
@@ -0,0 +1,146 @@
+"""
+Instrumentation of long-running commands.
+
+The commands record the duration of their phases and some counters in `run`,
+the report of the current process. `cli.py` prints a summary after all commands
+have finished and writes the whole report for `--metrics-json`.
+`Progress` shows live status lines during loops that may take hours.
+"""
+
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, TextIO
+
+from . import __version__
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, Any] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def update(self, **counters: Any) -> None:
+        self.counters.update(counters)
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        return {
+            "version": __version__,
+            "started": self.started,
+            "seconds": time.time() - self.started,
+            "peak_rss_mib": peak_rss_mib(),
+            "peak_rss_children_mib": peak_rss_mib(children=True),
+            "phases": self.phases,
+            "counters": self.counters,
+            **extra,
+        }
+
+    def write(self, path: Path, **extra: Any) -> None:
+        with path.open("w") as f:
+            json.dump(self.report(**extra), f, indent=2)
+
+    def summary(self) -> str:
+        """
+        >>> metrics = Metrics()
+        >>> metrics.add_time("convert.read", 2.5)
+        >>> metrics.summary().startswith("convert.read 2.5s, peak RSS")
+        True
+        """
+
+        phases = ", ".join(
+            f"{name} {seconds:.1f}s" for name, seconds in self.phases.items()
+        )
+
+        return f"{phases}, peak RSS {peak_rss_mib():.0f} MiB".lstrip(", ")
+
+
+def peak_rss_mib(children: bool = False) -> float:
+    """Peak resident set size of this process or of its largest child process."""
+
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    max_rss = resource.getrusage(who).ru_maxrss
+
+    # Linux reports KiB, macOS bytes.
+    return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+run = Metrics()
+
+
+class Progress:
+    """Print status lines at most every `interval` seconds.
+
+    On a terminal, the line is overwritten every second.
+    Otherwise (e.g., in a log file), a new line is printed every minute.
+    `fraction` returns the completed share of the work (or None if unknown),
+    from which the remaining time is estimated. The count is given in `unit`.
+    """
+
+    def __init__(
+        self,
+        fraction: Optional[Callable[[], Optional[float]]] = None,
+        stream: TextIO = sys.stderr,
+        interval: Optional[float] = None,
+        unit: str = "rows",
+    ):
+        self._fraction = fraction
+        self._unit = unit
+        self._stream = stream
+        self._tty = stream.isatty()
+        self._interval = interval or (1.0 if self._tty else 60.0)
+        self._start = time.monotonic()
+        self._last = self._start
+        self._shown = False
+
+    def update(self, rows: int, **counters: int) -> None:
+        now = time.monotonic()
+
+        if now - self._last < self._interval:
+            return
+
+        self._last = now
+        self._show(rows, counters, now)
+
+    def close(self) -> None:
+        if self._shown and self._tty:
+            self._stream.write("\n")
+            self._stream.flush()
+
+    def _show(self, rows: int, counters: Dict[str, int], now: float) -> None:
+        elapsed = now - self._start
+        parts = [f"{rows:,} {self._unit}"]
+        parts.extend(f"{value:,} {name}" for name, value in counters.items())
+        parts.append(f"{rows / elapsed:,.0f} {self._unit}/s")
+        fraction = self._fraction() if self._fraction else None
+
+        if fraction:
+            remaining = elapsed * (1 - fraction) / fraction
+            parts.append(f"{fraction:.1%}")
+            parts.append(f"ETA {timedelta(seconds=round(remaining))}")
+
+        line = " | ".join(parts)
+
+        if self._tty:
+            self._stream.write("\r\x1b[K" + line)
+        else:
+            self._stream.write(line + "\n")
+
+        self._stream.flush()
+        self._shown = True
@@ -0,0 +1,380 @@
+"""
+Sorted, memory-mapped table of concept names for autocompletion.
+
+Names are stored like `uri_to_label` returns them (underscores become spaces),
+and the POS variants of a concept (e.g., `/c/en/run/noun` and `/c/en/run/verb`)
+are folded into one entry whose degree is the sum of their degrees.
+The directory written by `NameIndexBuilder` contains:
+
+- `names.npy` and `name_offsets.npy`: the UTF-8 encoded names, sorted by language
+  and name. Name `i` is `names[name_offsets[i]:name_offsets[i + 1]]`.
+- `degrees.npy`: the number of relationships of each entry.
+- `languages.json`: the range of entries of each language.
+
+All names with a prefix are a contiguous range that is found by binary search.
+Fuzzy lookups walk the sorted names like a trie and prune all branches whose
+edit distance to the query exceeds the limit.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .uri_codec import parse_concept
+
+
+class Completion(NamedTuple):
+    label: str
+    language: str
+    degree: int
+    distance: int = 0
+
+    @property
+    def name(self) -> str:
+        """The name as used in URIs and the `name` property of concepts."""
+
+        return self.label.replace(" ", "_")
+
+
+def normalize(query: str) -> str:
+    """
+    >>> normalize("Canary_Islands")
+    'canary islands'
+    """
+
+    return query.lower().replace("_", " ")
+
+
+class NameIndexBuilder:
+    """Collect the names of concepts and count their relationships."""
+
+    def __init__(self) -> None:
+        self._degrees: Dict[Tuple[str, str], int] = {}
+
+    def add_node(self, uri: str) -> None:
+        language, text, _, _ = parse_concept(uri)
+        self._degrees.setdefault((language, text), 0)
+
+    def add_relationship(self, start_uri: str, end_uri: str) -> None:
+        for uri in (start_uri, end_uri):
+            language, text, _, _ = parse_concept(uri)
+            key = (language, text)
+            self._degrees[key] = self._degrees.get(key, 0) + 1
+
+    def write(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        entries = sorted(
+            (language, normalize(text).encode("utf-8"), degree)
+            for (language, text), degree in self._degrees.items()
+        )
+        # Different texts (e.g., `Paris` and `paris`) may have the same label.
+        merged: List[Tuple[str, bytes, int]] = []
+
+        for language, label, degree in entries:
+            if merged and merged[-1][:2] == (language, label):
+                merged[-1] = (language, label, merged[-1][2] + degree)
+            else:
+                merged.append((language, label, degree))
+
+        offsets = np.zeros(len(merged) + 1, dtype=np.int64)
+        np.cumsum([len(label) for _, label, _ in merged], out=offsets[1:])
+        names = np.frombuffer(b"".join(label for _, label, _ in merged), np.uint8)
+        degrees = np.array([degree for _, _, degree in merged], dtype=np.int32)
+        languages: Dict[str, List[int]] = {}
+
+        for i, (language, _, _) in enumerate(merged):
+            languages.setdefault(language, [i, i])[1] = i + 1
+
+        np.save(directory / "names.npy", names)
+        np.save(directory / "name_offsets.npy", offsets)
+        np.save(directory / "degrees.npy", degrees)
+
+        with (directory / "languages.json").open("w") as f:
+            json.dump(languages, f)
+
+
+class NameIndex:
+    """A name table written by `NameIndexBuilder`, memory-mapped by default."""
+
+    def __init__(self, directory: Path, mmap: bool = True):
+        mode = "r" if mmap else None
+        self.names = np.load(directory / "names.npy", mmap_mode=mode)
+        self.offsets = np.load(directory / "name_offsets.npy", mmap_mode=mode)
+        self.degrees = np.load(directory / "degrees.npy", mmap_mode=mode)
+
+        with (directory / "languages.json").open() as f:
+            self.languages: Dict[str, Tuple[int, int]] = {
+                language: tuple(bounds) for language, bounds in json.load(f).items()
+            }
+
+        # Indexing memoryviews is much faster than indexing arrays element-wise.
+        self._names = memoryview(self.names)
+        self._offsets = memoryview(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def label(self, i: int) -> str:
+        return self._bytes(i).decode("utf-8")
+
+    def prefix(
+        self, query: str, language: Optional[str] = None, limit: int = 10
+    ) -> List[Completion]:
+        """The names that start with `query`, ranked by degree."""
+
+        encoded = normalize(query).encode("utf-8")
+        candidates = []
+
+        for code, (low, high) in self._ranges(language):
+            start = self._search(encoded, low, high)
+            end = self._search(encoded + b"\xff", start, high)
+
+            for i in self._top(start, end, limit):
+                candidates.append(Completion(self.label(i), code, int(self.degrees[i])))
+
+        return sorted(candidates, key=lambda c: (-c.degree, c.label))[:limit]
+
+    def fuzzy(
+        self,
+        query: str,
+        max_distance: int = 1,
+        language: Optional[str] = None,
+        limit: int = 10,
+    ) -> List[Completion]:
+        """The names within `max_distance` edits (Levenshtein distance) of `query`,
+        ranked by distance and degree.
+        """
+
+        target = normalize(query)
+        found: List[Completion] = []
+
+        for code, (low, high) in self._ranges(language):
+            first_row = list(range(len(target) + 1))
+            self._walk(0, first_row, target, max_distance, low, high, code, found)
+
+        return sorted(found, key=lambda c: (c.distance, -c.degree, c.label))[:limit]
+
+    def _walk(
+        self,
+        depth: int,
+        row: List[int],
+        target: str,
+        max_distance: int,
+        low: int,
+        high: int,
+        language: str,
+        found: List[Completion],
+    ) -> None:
+        """Visit the names in `[low, high)`, which share their first `depth` bytes.
+
+        `row` holds the edit distances between this prefix and the prefixes of
+        `target`.
+        """
+
+        # Sorted first, a name that equals the prefix ends here.
+        if low < high and self._length(low) == depth:
+            self._found(low, row[-1], max_distance, language, found)
+            low += 1
+
+        if low >= high:
+            return
+
+        if min(row) < max_distance:
+            # Any next character may be within the distance, so all are visited.
+            while low < high:
+                char = self._char(low, depth)
+                end = self._child_end(char, depth, low + 1, high)
+                self._visit(
+                    char, depth, row, target, max_distance, low, end, language, found
+                )
+                low = end
+        else:
+            # Without edits left, only characters that continue `target` match.
+            prefix = self._bytes(low)[:depth]
+            letters = {target[j] for j in range(len(target)) if row[j] == max_distance}
+
+            for letter in sorted(letters):
+                char = letter.encode("utf-8")
+                start = self._search(prefix + char, low, high)
+                end = self._search(prefix + char + b"\xff", start, high)
+
+                if start < end:
+                    self._visit(
+                        char,
+                        depth,
+                        row,
+                        target,
+                        max_distance,
+                        start,
+                        end,
+                        language,
+                        found,
+                    )
+
+    def _visit(
+        self,
+        char: bytes,
+        depth: int,
+        row: List[int],
+        target: str,
+        max_distance: int,
+        low: int,
+        high: int,
+        language: str,
+        found: List[Completion],
+    ) -> None:
+        """Visit the names in `[low, high)`, which continue the prefix with `char`."""
+
+        next_row = _next_row(row, char.decode("utf-8"), target, max_distance)
+
+        if next_row is None:
+            return
+
+        depth += len(char)
+
+        if high - low > 1:
+            self._walk(
+                depth, next_row, target, max_distance, low, high, language, found
+            )
+            return
+
+        # Without branches, the rest of the name is compared directly.
+        for letter in self._bytes(low)[depth:].decode("utf-8"):
+            next_row = _next_row(next_row, letter, target, max_distance)
+
+            if next_row is None:
+                return
+
+        self._found(low, next_row[-1], max_distance, language, found)
+
+    def _found(
+        self,
+        i: int,
+        distance: int,
+        max_distance: int,
+        language: str,
+        found: List[Completion],
+    ) -> None:
+        if distance <= max_distance:
+            degree = int(self.degrees[i])
+            found.append(Completion(self.label(i), language, degree, distance))
+
+    def _ranges(self, language: Optional[str]) -> Iterable[Tuple[str, Tuple[int, int]]]:
+        if language is None:
+            return self.languages.items()
+
+        if language not in self.languages:
+            return []
+
+        return [(language, self.languages[language])]
+
+    def _top(self, start: int, end: int, limit: int) -> Iterable[int]:
+        """The `limit` entries with the highest degrees, ties go to the first names."""
+
+        if end - start <= limit:
+            return range(start, end)
+
+        degrees = np.asarray(self.degrees[start:end])
+        threshold = np.partition(degrees, len(degrees) - limit)[len(degrees) - limit]
+        above = np.flatnonzero(degrees > threshold)
+        tied = np.flatnonzero(degrees == threshold)[: limit - len(above)]
+
+        return (start + np.concatenate([above, tied])).tolist()
+
+    def _bytes(self, i: int) -> bytes:
+        return self._names[self._offsets[i] : self._offsets[i + 1]].tobytes()
+
+    def _length(self, i: int) -> int:
+        return self._offsets[i + 1] - self._offsets[i]
+
+    def _char(self, i: int, position: int) -> bytes:
+        """The UTF-8 encoded character at the byte `position` of name `i`."""
+
+        start = self._offsets[i] + position
+        lead = self._names[start]
+        size = 1 if lead < 0x80 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+
+        return self._names[start : start + size].tobytes()
+
+    def _child_end(self, char: bytes, depth: int, low: int, high: int) -> int:
+        """The end of the names in `[low, high)` that have `char` at byte `depth`.
+
+        These names are a prefix of the range, which is searched by galloping,
+        since most ranges of children are short.
+        """
+
+        names, offsets, size, lead = self._names, self._offsets, len(char), char[0]
+
+        def matches(i: int) -> bool:
+            start = offsets[i] + depth
+
+            if size == 1:
+                return names[start] == lead
+
+            return names[start : start + size].tobytes() == char
+
+        step = 1
+
+        while low + step < high and matches(low + step - 1):
+            low += step
+            step *= 2
+
+        high = min(low + step, high)
+
+        while low < high:
+            mid = (low + high) // 2
+
+            if matches(mid):
+                low = mid + 1
+            else:
+                high = mid
+
+        return low
+
+    def _search(self, encoded: bytes, low: int, high: int) -> int:
+        """The first position in `[low, high)` whose name is not less than `encoded`."""
+
+        while low < high:
+            mid = (low + high) // 2
+
+            if self._bytes(mid) < encoded:
+                low = mid + 1
+            else:
+                high = mid
+
+        return low
+
+
+def _next_row(
+    row: List[int], letter: str, target: str, max_distance: int
+) -> Optional[List[int]]:
+    """The edit distances after appending `letter` to the prefix of `row`.
+
+    Only the band of cells that can be within `max_distance` is computed,
+    the other distances are capped at `max_distance + 1`.
+    None means that no name with this prefix is within `max_distance`.
+
+    >>> row = [0, 1, 2, 3]
+    >>> for letter in "cut": row = _next_row(row, letter, "cat", 1); print(row)
+    [1, 0, 1, 2]
+    [2, 1, 1, 2]
+    [3, 2, 2, 1]
+    """
+
+    cap = max_distance + 1
+    depth = row[0] + 1
+    # The first cell is the number of characters of the prefix.
+    next_row = [depth] + [cap] * (len(row) - 1)
+    best = depth
+
+    for j in range(max(1, depth - max_distance), min(len(row), depth + cap)):
+        value = row[j - 1] + (target[j - 1] != letter)
+        value = min(value, row[j] + 1, next_row[j - 1] + 1, cap)
+        next_row[j] = value
+
+        if value < best:
+            best = value
+
+    return next_row if best <= max_distance else None
@@ -0,0 +1,419 @@
+"""
+Precompute aggregates over the relationships of each concept as node properties.
+
+Queries like "the strongest related concepts of X" or normalizing relatedness
+by the degree otherwise aggregate all relationships of a node at query time,
+which is slow for hubs like `/c/en/person`. The following properties are stored:
+
+- `out_degree` and `in_degree`: the number of relationships.
+- `out_degree_<Type>` and `in_degree_<Type>`: the same per relationship type
+  (only if it is not zero, so use `coalesce(n.in_degree_IsA, 0)`).
+- `out_weight_sum`, `out_weight_max`, `in_weight_sum` and `in_weight_max`:
+  the summed and maximal weight (the maxima only if the degree is not zero).
+- `top_neighbors` and `top_weights`: the URIs of the `k` neighbors (in either
+  direction) with the highest weights, ordered by weight and URI.
+
+The statistics are either computed from the converted CSV files, which are
+rewritten with additional node columns before the import, or with batched
+queries in the running database.
+"""
+
+import csv
+import os
+import re
+import typing as t
+from array import array
+from pathlib import Path
+
+import click
+import numpy as np
+
+from . import database, metrics
+from .interning import Vocabulary
+from .online_import import open_rows
+from .sharded_csv import ShardedWriter, find_shards, shard_paths
+
+# Degree, summed weight and maximal weight per relationship type.
+TypeStats = t.Dict[str, t.Tuple[int, float, float]]
+
+
+def _key(type_: str) -> str:
+    """
+    >>> _key("IsA"), _key("dbpedia/genre")
+    ('IsA', 'dbpedia_genre')
+    """
+    return re.sub(r"\W", "_", type_)
+
+
+def properties(
+    out_types: TypeStats,
+    in_types: TypeStats,
+    neighbors: t.Sequence[t.Tuple[str, float]],
+) -> t.Dict[str, t.Any]:
+    """
+    >>> stats = properties({"IsA": (2, 3.0, 2.0)}, {}, [("/c/en/animal", 2.0)])
+    >>> stats["out_degree_IsA"], stats["out_weight_max"], stats["in_degree"]
+    (2, 2.0, 0)
+    >>> "in_weight_max" in stats, stats["top_neighbors"]
+    (False, ['/c/en/animal'])
+    """
+
+    result: t.Dict[str, t.Any] = {}
+
+    for direction, types in (("out", out_types), ("in", in_types)):
+        result[f"{direction}_degree"] = sum(degree for degree, _, _ in types.values())
+        result[f"{direction}_weight_sum"] = float(sum(s for _, s, _ in types.values()))
+
+        for type_, (degree, _, _) in sorted(types.items()):
+            result[f"{direction}_degree_{_key(type_)}"] = degree
+
+        if types:
+            result[f"{direction}_weight_max"] = max(m for _, _, m in types.values())
+
+    result["top_neighbors"] = [neighbor for neighbor, _ in neighbors]
+    result["top_weights"] = [weight for _, weight in neighbors]
+
+    return result
+
+
+class _Groups:
+    """Aggregates of the relationships of each node, grouped by their type."""
+
+    def __init__(
+        self,
+        nodes: np.ndarray,
+        types: np.ndarray,
+        weights: np.ndarray,
+        node_count: int,
+        type_count: int,
+    ):
+        keys = nodes * type_count + types
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        weights = weights[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]][: len(keys)])
+
+        unique = keys[starts]
+        self.types = unique % type_count
+        self.counts = np.diff(np.r_[starts, len(keys)])
+        self.sums = np.add.reduceat(weights, starts) if len(keys) else weights
+        self.maxima = np.maximum.reduceat(weights, starts) if len(keys) else weights
+        self.indptr = np.searchsorted(unique // type_count, np.arange(node_count + 1))
+
+    def get(self, node: int, type_names: t.Sequence[str]) -> TypeStats:
+        return {
+            type_names[self.types[i]]: (
+                int(self.counts[i]),
+                float(self.sums[i]),
+                float(self.maxima[i]),
+            )
+            for i in range(self.indptr[node], self.indptr[node + 1])
+        }
+
+
+def _top_neighbors(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    weights: np.ndarray,
+    ranks: np.ndarray,
+    node_count: int,
+    k: int,
+) -> t.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The `k` strongest neighbors of each node as CSR arrays (indptr, nodes, weights).
+
+    Relationships in both directions count, parallel ones with their highest weight.
+    Ties are broken by `ranks`, the position of each node in URI order.
+    """
+
+    nodes = np.concatenate([starts, ends])
+    neighbors = np.concatenate([ends, starts])
+    weights = np.concatenate([weights, weights])
+
+    # Keep the highest weight per pair of nodes.
+    order = np.lexsort((-weights, neighbors, nodes))
+    nodes, neighbors, weights = nodes[order], neighbors[order], weights[order]
+    first = np.r_[True, (nodes[1:] != nodes[:-1]) | (neighbors[1:] != neighbors[:-1])]
+    nodes, neighbors, weights = nodes[first], neighbors[first], weights[first]
+
+    order = np.lexsort((ranks[neighbors], -weights, nodes))
+    nodes, neighbors, weights = nodes[order], neighbors[order], weights[order]
+    group_starts = np.searchsorted(nodes, np.arange(node_count + 1))
+    keep = np.arange(len(nodes)) - group_starts[nodes] < k
+    nodes, neighbors, weights = nodes[keep], neighbors[keep], weights[keep]
+
+    return np.searchsorted(nodes, np.arange(node_count + 1)), neighbors, weights
+
+
+def _column(header: t.Sequence[str], kind: str) -> int:
+    return next(i for i, c in enumerate(header) if c.partition(":")[2] == kind)
+
+
+def from_csv(nodes_path: Path, relationships_path: Path, sharded: bool, k: int) -> int:
+    """Add the statistics as columns to the nodes file and return the node count."""
+
+    with open_rows(nodes_path, sharded) as (header, rows):
+        id_column = _column(header, "ID")
+        uris = [row[id_column] for row in rows]
+
+    ids = {uri: i for i, uri in enumerate(uris)}
+    type_names: Vocabulary[str] = Vocabulary()
+    starts, ends, types, weights = array("l"), array("l"), array("l"), array("d")
+
+    with open_rows(relationships_path, sharded) as (header, rows):
+        start, end, type_ = (_column(header, k) for k in ("START_ID", "END_ID", "TYPE"))
+        weight = header.index("weight:double")
+
+        for row in rows:
+            starts.append(ids[row[start]])
+            ends.append(ids[row[end]])
+            types.append(type_names.add(row[type_]))
+            weights.append(float(row[weight]))
+
+    node_count = len(uris)
+    arrays = [np.asarray(a) for a in (starts, ends, types, weights)]
+    out_groups = _Groups(arrays[0], arrays[2], arrays[3], node_count, len(type_names))
+    in_groups = _Groups(arrays[1], arrays[2], arrays[3], node_count, len(type_names))
+    ranks = np.empty(node_count, dtype=np.int64)
+    ranks[sorted(range(node_count), key=uris.__getitem__)] = np.arange(node_count)
+    top_indptr, top_nodes, top_weights = _top_neighbors(
+        arrays[0], arrays[1], arrays[3], ranks, node_count, k
+    )
+    del ids, starts, ends, types, weights, arrays
+
+    names = type_names.values
+    columns = [
+        ("out_degree", "int"),
+        ("out_weight_sum", "double"),
+        ("out_weight_max", "double"),
+        ("in_degree", "int"),
+        ("in_weight_sum", "double"),
+        ("in_weight_max", "double"),
+        *((f"out_degree_{_key(name)}", "int") for name in sorted(names)),
+        *((f"in_degree_{_key(name)}", "int") for name in sorted(names)),
+        ("top_neighbors", "string[]"),
+        ("top_weights", "double[]"),
+    ]
+
+    def stats_rows() -> t.Iterator[t.List[str]]:
+        for node in range(node_count):
+            top = range(top_indptr[node], top_indptr[node + 1])
+            values = properties(
+                out_groups.get(node, names),
+                in_groups.get(node, names),
+                [(uris[top_nodes[i]], float(top_weights[i])) for i in top],
+            )
+            yield [_format(values.get(name)) for name, _ in columns]
+
+    with open_rows(nodes_path, sharded) as (header, rows):
+        # The columns of an earlier run are replaced instead of added again.
+        keep = [i for i, column in enumerate(header) if not _is_stat(column)]
+        stats_header = [
+            *(header[i] for i in keep),
+            *(f"{name}:{kind}" for name, kind in columns),
+        ]
+        added = (
+            [row[i] for i in keep] + stats for row, stats in zip(rows, stats_rows())
+        )
+        _rewrite(nodes_path, sharded, stats_header, added)
+
+    return node_count
+
+
+def _is_stat(column: str) -> bool:
+    """
+    >>> _is_stat("out_degree_IsA:int"), _is_stat("top_weights:double[]")
+    (True, True)
+    >>> _is_stat("uri:ID"), _is_stat("name")
+    (False, False)
+    """
+    name = column.split(":", 1)[0]
+
+    return name in _stat_names or name.startswith(("out_degree_", "in_degree_"))
+
+
+_stat_names = {
+    "out_degree",
+    "out_weight_sum",
+    "out_weight_max",
+    "in_degree",
+    "in_weight_sum",
+    "in_weight_max",
+    "top_neighbors",
+    "top_weights",
+}
+
+
+def _format(value: t.Any) -> str:
+    if value is None:
+        return ""
+
+    if isinstance(value, list):
+        return ";".join(map(str, value))
+
+    return str(value)
+
+
+def _rewrite(
+    path: Path, sharded: bool, header: t.Sequence[str], rows: t.Iterator[t.List[str]]
+) -> None:
+    """Write the rows to temporary files that replace those of `path` at the end."""
+
+    tmp_path = path.with_name(f"tmp-{path.name}")
+
+    if not sharded:
+        with tmp_path.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+        os.replace(tmp_path, path)
+        return
+
+    shards = len(find_shards(path)[1])
+
+    with ShardedWriter(tmp_path, header, shards) as writer:
+        for row in rows:
+            writer.writerow(row)
+
+    tmp_header, tmp_parts = shard_paths(tmp_path, shards)
+    final_header, final_parts = shard_paths(path, shards)
+
+    for tmp_file, final_file in zip(
+        [tmp_header, *tmp_parts], [final_header, *final_parts]
+    ):
+        os.replace(tmp_file, final_file)
+
+
+_page = """
+MATCH (n:Concept)
+WHERE n.uri > $after
+RETURN n.uri AS uri,
+    [key IN keys(n) WHERE key STARTS WITH 'out_degree_' OR key STARTS WITH 'in_degree_'] AS keys
+ORDER BY n.uri
+LIMIT $limit
+"""
+
+_type_stats = """
+UNWIND $uris AS uri
+MATCH (n:Concept {uri: uri})%s()
+RETURN uri, type(r) AS type, count(r) AS degree,
+    sum(r.weight) AS weight_sum, max(r.weight) AS weight_max
+"""
+
+_neighbors = """
+UNWIND $uris AS uri
+MATCH (n:Concept {uri: uri})-[r]-(m:Concept)
+WITH uri, m.uri AS neighbor, max(r.weight) AS weight
+ORDER BY uri, weight DESC, neighbor
+RETURN uri, collect([neighbor, weight])[..$k] AS neighbors
+"""
+
+_store = """
+UNWIND $rows AS row
+MATCH (n:Concept {uri: row.uri})
+SET n += row.properties
+"""
+
+
+def _read_batch(tx, uris: t.List[str], k: int) -> t.List[t.Dict[str, t.Any]]:
+    stats: t.Dict[str, t.Tuple[TypeStats, TypeStats, list]] = {
+        uri: ({}, {}, []) for uri in uris
+    }
+
+    for direction, pattern in enumerate(("-[r]->", "<-[r]-")):
+        for record in tx.run(_type_stats % pattern, uris=uris):
+            stats[record["uri"]][direction][record["type"]] = (
+                record["degree"],
+                record["weight_sum"],
+                record["weight_max"],
+            )
+
+    for record in tx.run(_neighbors, uris=uris, k=k):
+        stats[record["uri"]][2].extend(tuple(pair) for pair in record["neighbors"])
+
+    return [
+        {"uri": uri, "properties": properties(*values)} for uri, values in stats.items()
+    ]
+
+
+def _store_batch(tx, rows: t.List[t.Dict[str, t.Any]]) -> None:
+    tx.run(_store, rows=rows).consume()
+
+
+def in_database(k: int, batch_size: int) -> int:
+    """Compute and store the statistics in batches of nodes ordered by URI."""
+
+    driver = database.driver()
+    progress = metrics.Progress()
+    count = 0
+    after = ""
+
+    with driver.session() as session:
+        while True:
+            page = session.read_transaction(
+                lambda tx: tx.run(_page, after=after, limit=batch_size).data()
+            )
+
+            if not page:
+                break
+
+            uris = [record["uri"] for record in page]
+            rows = session.read_transaction(_read_batch, uris, k)
+
+            # Remove degrees of types that no longer occur (e.g., after apply-delta).
+            for record, row in zip(page, rows):
+                for key in record["keys"]:
+                    row["properties"].setdefault(key, None)
+
+            session.write_transaction(_store_batch, rows)
+            count += len(page)
+            after = uris[-1]
+            progress.update(count)
+
+    progress.close()
+    database.next_generation(driver)
+    driver.close()
+
+    return count
+
+
+@click.command("node-stats")
+@click.option("--nodes", default="conceptnet-nodes.csv", show_default=True)
+@click.option(
+    "--relationships", default="conceptnet-relationships.csv", show_default=True
+)
+@click.option("--import-dir", default="data/neo4j/import", show_default=True)
+@click.option(
+    "--sharded",
+    is_flag=True,
+    help="Read and rewrite the header files and gzipped parts of convert --shards.",
+)
+@click.option(
+    "--database",
+    "in_db",
+    is_flag=True,
+    help="Compute the statistics in the running database instead of the CSV files.",
+)
+@click.option("--top-k", default=10, show_default=True)
+@click.option(
+    "--batch-size",
+    default=1000,
+    show_default=True,
+    help="Nodes per transaction of --database.",
+)
+def main(nodes, relationships, import_dir, sharded, in_db, top_k, batch_size):
+    with metrics.run.phase("node-stats"):
+        if in_db:
+            count = in_database(top_k, batch_size)
+        else:
+            directory = Path(import_dir)
+            count = from_csv(
+                directory / nodes, directory / relationships, sharded, top_k
+            )
+
+    click.echo(f"Computed the statistics of {count} nodes")
+    metrics.run.update(node_stats=count)
+
+
+if __name__ == "__main__":
+    main()
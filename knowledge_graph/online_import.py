@@ -0,0 +1,284 @@
+"""
+Load the converted CSV files into a running database.
+
+Unlike `neo4j-admin import`, this does not require downtime and keeps the
+existing graph, so additional languages can be added to it.
+Rows are sent as `UNWIND` batches by a pool of worker threads, each of which
+uses its own session of a shared driver. At most two batches per worker are
+in flight, so reading the files never runs ahead of the database.
+Nodes are merged on their `uri`, which is backed by a uniqueness constraint,
+and all nodes are loaded before the first relationship.
+"""
+
+import csv
+import gzip
+import itertools
+import random
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Sequence, Tuple
+
+import click
+from neo4j import Driver
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
+from neo4j.exceptions import TransientError
+
+from . import database, metrics, post_process
+from .sharded_csv import find_shards
+
+Row = Dict[str, Any]
+Batch = Tuple[str, List[Row]]
+
+_retryable = (ServiceUnavailable, SessionExpired, TransientError)
+
+_merge_nodes = """
+UNWIND $rows AS row
+MERGE (n:Concept {uri: row.id})
+SET n:`%s`
+SET n += row.properties
+"""
+
+_merge_relationships = """
+UNWIND $rows AS row
+MATCH (start:Concept {uri: row.start})
+MATCH (end:Concept {uri: row.end})
+MERGE (start)-[r:`%s`]->(end)
+SET r += row.properties
+"""
+
+
+def parse_header(header: Sequence[str]) -> List[Tuple[str, str]]:
+    """Split the columns of a header for `neo4j-admin import` into names and types.
+
+    >>> parse_header(["uri:ID", ":LABEL", "name", "weight:double", "dataset:string[]"])
+    [('uri', 'ID'), ('', 'LABEL'), ('name', 'string'), ('weight', 'double'), ('dataset', 'string[]')]
+    """
+
+    columns = []
+
+    for column in header:
+        name, _, kind = column.partition(":")
+        columns.append((name, kind or "string"))
+
+    return columns
+
+
+def _convert(value: str, kind: str) -> Any:
+    if kind.endswith("[]"):
+        return [_convert(item, kind[:-2]) for item in value.split(";")] if value else []
+
+    if kind in ("double", "float"):
+        return float(value)
+
+    if kind in ("int", "long", "short", "byte"):
+        return int(value)
+
+    if kind == "boolean":
+        return value.lower() == "true"
+
+    return value
+
+
+def parse_rows(
+    header: Sequence[str], rows: Iterator[Sequence[str]], group: str
+) -> Iterator[Tuple[str, Row]]:
+    """Convert CSV rows into the parameters of the Cypher queries.
+
+    The `group` column (`LABEL` or `TYPE`) is returned separately,
+    because labels and types cannot be passed as parameters.
+
+    >>> header = [":START_ID", ":END_ID", ":TYPE", "weight:double"]
+    >>> list(parse_rows(header, iter([["/c/en/a", "/c/en/b", "IsA", "2.0"]]), "TYPE"))
+    [('IsA', {'properties': {'weight': 2.0}, 'start': '/c/en/a', 'end': '/c/en/b'})]
+    """
+
+    columns = parse_header(header)
+    keys = {"ID": "id", "START_ID": "start", "END_ID": "end"}
+
+    for row in rows:
+        converted: Row = {"properties": {}}
+        group_value = ""
+
+        for (name, kind), value in zip(columns, row):
+            if kind == group:
+                group_value = value
+            elif kind in keys:
+                converted[keys[kind]] = value
+
+                # Like neo4j-admin, keep named ids as properties.
+                if name and kind == "ID":
+                    converted["properties"][name] = value
+            elif value != "" or kind.endswith("[]"):
+                converted["properties"][name] = _convert(value, kind)
+
+        yield group_value, converted
+
+
+def batches(rows: Iterator[Tuple[str, Row]], batch_size: int) -> Iterator[Batch]:
+    """Collect rows of the same label or type into batches.
+
+    >>> rows = iter([("IsA", 1), ("Synonym", 2), ("IsA", 3), ("IsA", 4)])
+    >>> list(batches(rows, 2))
+    [('IsA', [1, 3]), ('Synonym', [2]), ('IsA', [4])]
+    """
+
+    pending: Dict[str, List[Row]] = {}
+
+    for group, row in rows:
+        batch = pending.setdefault(group, [])
+        batch.append(row)
+
+        if len(batch) >= batch_size:
+            yield group, pending.pop(group)
+
+    yield from pending.items()
+
+
+@contextmanager
+def open_rows(path: Path, sharded: bool) -> Iterator[Tuple[List[str], Iterator]]:
+    """Open a CSV file or the header and parts written by `convert --shards`."""
+
+    if not sharded:
+        with path.open(newline="") as f:
+            rows = csv.reader(f)
+            yield next(rows), rows
+
+        return
+
+    header_path, parts = find_shards(path)
+
+    if not header_path.exists() or not parts:
+        raise click.ClickException(f"There are no parts of {path.name}.")
+
+    with header_path.open(newline="") as f:
+        header = next(csv.reader(f))
+
+    def part_rows() -> Iterator[List[str]]:
+        for part in parts:
+            with gzip.open(part, "rt", newline="") as f:
+                yield from csv.reader(f)
+
+    yield header, part_rows()
+
+
+class Loader:
+    """Send batches to the database with `workers` concurrent sessions."""
+
+    def __init__(self, driver: Driver, workers: int, retries: int):
+        self._driver = driver
+        self._workers = workers
+        self._retries = retries
+
+    def load(
+        self,
+        query: str,
+        batches: Iterator[Batch],
+        progress: Callable[[int], None],
+    ) -> int:
+        """Run `query` (with the label or type for `%s`) for all batches.
+
+        Returns the number of rows after all batches have been committed.
+        """
+
+        count = 0
+
+        with ThreadPoolExecutor(self._workers) as executor:
+            pending: Deque["Future[int]"] = deque()
+
+            for group, rows in batches:
+                pending.append(
+                    executor.submit(self._write, query % _escape(group), rows)
+                )
+
+                # Back-pressure: wait for the oldest batch before reading more.
+                while len(pending) >= 2 * self._workers:
+                    count += pending.popleft().result()
+                    progress(count)
+
+            while pending:
+                count += pending.popleft().result()
+                progress(count)
+
+        return count
+
+    def _write(self, query: str, rows: List[Row]) -> int:
+        for attempt in itertools.count():
+            try:
+                with self._driver.session() as session:
+                    session.write_transaction(_run, query, rows)
+
+                return len(rows)
+            except _retryable as e:
+                if attempt >= self._retries:
+                    raise
+
+                click.echo(f"Retrying a batch of {len(rows)} rows: {e}", err=True)
+
+                # Exponential backoff with jitter, so that workers whose batches
+                # deadlocked on the same nodes do not collide again.
+                time.sleep(min(30.0, 0.5 * 2**attempt) * random.uniform(0.5, 1.5))
+
+        raise AssertionError("unreachable")
+
+
+def _run(tx, query: str, rows: List[Row]) -> None:
+    tx.run(query, rows=rows).consume()
+
+
+def _escape(name: str) -> str:
+    """Escape a relationship type or the labels of a node (separated by `;`).
+
+    >>> _escape("Concept;Wiki`Page")
+    'Concept`:`Wiki``Page'
+    """
+    return "`:`".join(part.replace("`", "``") for part in name.split(";"))
+
+
+def load_online(
+    import_dir: Path,
+    nodes: Sequence[str],
+    relationships: Sequence[str],
+    sharded: bool = False,
+    workers: int = 4,
+    batch_size: int = 10000,
+    retries: int = 5,
+) -> None:
+    driver = database.driver(max_connection_pool_size=workers + 1)
+
+    try:
+        with driver.session() as session:
+            post_process.create(session, post_process.uri_constraint)
+
+        loader = Loader(driver, workers, retries)
+        steps = [
+            ("nodes", nodes, "LABEL", _merge_nodes),
+            ("relationships", relationships, "TYPE", _merge_relationships),
+        ]
+
+        for name, files, group, query in steps:
+            started = time.perf_counter()
+            progress = metrics.Progress()
+            count = 0
+
+            with metrics.run.phase(f"import.{name}"):
+                for file in files:
+                    with open_rows(import_dir / file, sharded) as (header, rows):
+                        click.echo(f"Loading {file}")
+                        count += loader.load(
+                            query,
+                            batches(parse_rows(header, rows, group), batch_size),
+                            lambda done: progress.update(count + done),
+                        )
+
+            progress.close()
+            seconds = time.perf_counter() - started
+            rate = count / seconds if seconds else 0.0
+            click.echo(f"Loaded {count} {name} in {seconds:.1f} s ({rate:,.0f}/s)")
+            metrics.run.update(**{f"{name}_loaded": count, f"{name}_per_second": rate})
+
+        database.next_generation(driver)
+    finally:
+        driver.close()
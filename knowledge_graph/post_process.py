@@ -5,31 +5,207 @@ MATCH (n)
 OPTIONAL MATCH (n)-[r]-()
 DELETE n,r
 ```
+
+The indexes and constraints are declared in `schema`.
+Like `IF NOT EXISTS`, entries whose label and properties are already covered
+are skipped, so the command can be run again after each import.
 """
 
+import time
+import typing as t
+
 import click
-import os
-from dotenv import load_dotenv
+from neo4j import Session
+from neo4j.exceptions import ClientError
+
+from . import database, metrics
+
+
+class Index(t.NamedTuple):
+    name: str
+    properties: t.Tuple[str, ...]
+    kind: str = "btree"  # or "unique" or "fulltext"
+    label: str = "Concept"
+
+    def statement(self) -> str:
+        """
+        >>> Index("concept_uri", ("uri",), "unique").statement()
+        'CREATE CONSTRAINT concept_uri ON (n:Concept) ASSERT n.uri IS UNIQUE'
+        >>> Index("concept_language_name", ("language", "name")).statement()
+        'CREATE INDEX concept_language_name FOR (n:Concept) ON (n.language, n.name)'
+        """
+
+        if self.kind == "unique":
+            (key,) = self.properties
+            return (
+                f"CREATE CONSTRAINT {self.name} ON (n:{self.label})"
+                f" ASSERT n.{key} IS UNIQUE"
+            )
+
+        if self.kind == "fulltext":
+            return (
+                f"CALL db.index.fulltext.createNodeIndex('{self.name}',"
+                f" {[self.label]}, {list(self.properties)})"
+            )
+
+        properties = ", ".join(f"n.{key}" for key in self.properties)
+        return f"CREATE INDEX {self.name} FOR (n:{self.label}) ON ({properties})"
+
+
+# The constraint is backed by an index, so `uri` needs no separate one.
+uri_constraint = Index("concept_uri", ("uri",), "unique")
+
+schema = [
+    uri_constraint,
+    Index("concept_name", ("name",)),
+    Index("concept_language", ("language",)),
+    Index("concept_pos", ("pos",)),
+    Index("concept_language_name", ("language", "name")),
+    # Written by `convert --equivalence-relation`.
+    Index("concept_equivalence_class", ("equivalence_class",)),
+    Index("concept_name_fulltext", ("name",), "fulltext"),
+]
+
+
+def _existing(session: Session) -> t.Dict[t.Tuple[str, str, t.Tuple[str, ...]], str]:
+    """Names of the existing indexes by their kind, label and properties."""
+
+    existing = {}
+
+    for record in session.run(
+        "CALL db.indexes() YIELD name, type, uniqueness, labelsOrTypes, properties"
+    ):
+        if record["type"] == "FULLTEXT":
+            kind = "fulltext"
+        elif record["uniqueness"] == "UNIQUE":
+            kind = "unique"
+        else:
+            kind = "btree"
+
+        for label in record["labelsOrTypes"]:
+            key = (kind, label, tuple(record["properties"]))
+            existing[key] = record["name"]
+
+    return existing
+
+
+def create(session: Session, index: Index) -> bool:
+    """Create `index` unless an equivalent one exists and return whether it was created."""
+
+    existing = _existing(session)
 
-load_dotenv()
-from neo4j import GraphDatabase
+    if (index.kind, index.label, index.properties) in existing:
+        return False
+
+    # Earlier versions created a plain index where the constraint is now needed.
+    plain = existing.get(("btree", index.label, index.properties))
+
+    if index.kind == "unique" and plain:
+        click.echo(f"Replacing the index {plain} with the constraint {index.name}")
+        session.run(f"DROP INDEX {plain}").consume()
+
+    try:
+        session.run(index.statement()).consume()
+    except ClientError as e:
+        # Created concurrently (e.g., by `import --online`).
+        if "AlreadyExists" not in (e.code or ""):
+            raise
+
+        return False
+
+    return True
+
+
+def await_online(session: Session, timeout: float) -> None:
+    """Wait until all indexes have been populated and show their progress."""
+
+    deadline = time.monotonic() + timeout
+    fraction = 0.0
+    progress = metrics.Progress(lambda: fraction, unit="indexes")
+
+    try:
+        while True:
+            states = {
+                record["name"]: (record["state"], record["populationPercent"])
+                for record in session.run(
+                    "CALL db.indexes() YIELD name, state, populationPercent"
+                )
+            }
+            failed = [name for name, (state, _) in states.items() if state == "FAILED"]
+
+            if failed:
+                raise click.ClickException(f"Populating {', '.join(failed)} failed.")
+
+            populating = {
+                name: percent
+                for name, (state, percent) in states.items()
+                if state != "ONLINE"
+            }
+
+            if not populating:
+                return
+
+            if time.monotonic() > deadline:
+                raise click.ClickException(
+                    f"{', '.join(populating)} did not come online in {timeout:.0f} s."
+                )
+
+            # Online indexes count as completely populated.
+            populated = 100 * (len(states) - len(populating)) + sum(populating.values())
+            fraction = populated / (100 * len(states))
+            progress.update(len(states) - len(populating), populating=len(populating))
+            time.sleep(1.0)
+    finally:
+        progress.close()
+
+
+def warm_up_page_cache(session: Session) -> None:
+    """Read the graph and the indexes once, so they are in the page cache."""
+
+    try:
+        session.run("CALL apoc.warmup.run(true, true, true)").consume()
+        return
+    except ClientError:
+        # APOC is not installed in data/neo4j/plugins.
+        pass
+
+    session.run("MATCH (n) RETURN count(properties(n))").consume()
+    session.run("MATCH ()-[r]->() RETURN count(properties(r))").consume()
+
+    for index in schema:
+        if index.kind != "fulltext":
+            exists = " AND ".join(f"n.{key} IS NOT NULL" for key in index.properties)
+            session.run(
+                f"MATCH (n:{index.label}) WHERE {exists} RETURN count(*)"
+            ).consume()
 
 
 @click.command("post-process")
-def main():
-    neo4j_url = "neo4j://" + os.getenv("NEO4J_URL")
-    neo4j_auth = os.getenv("NEO4J_AUTH").split("/", 1)
-    driver = GraphDatabase.driver(
-        neo4j_url,
-        auth=tuple(neo4j_auth),
-        encrypted=False,
-    )
+@click.option(
+    "--timeout",
+    default=3600.0,
+    show_default=True,
+    help="Seconds to wait for the indexes to come online.",
+)
+@click.option(
+    "--warm-up",
+    is_flag=True,
+    help="Load the graph and the indexes into the page cache.",
+)
+def main(timeout, warm_up):
+    driver = database.driver()
 
     with driver.session() as session:
-        session.run("CREATE INDEX FOR (n:Concept) ON (n.name)")
-        session.run("CREATE INDEX FOR (n:Concept) ON (n.language)")
-        session.run("CREATE INDEX FOR (n:Concept) ON (n.pos)")
-        session.run("CREATE INDEX FOR (n:Concept) ON (n.uri)")
+        with metrics.run.phase("index"):
+            created = [index.name for index in schema if create(session, index)]
+            click.echo(f"Created {len(created)} of {len(schema)} indexes")
+            await_online(session, timeout)
+
+        if warm_up:
+            with metrics.run.phase("warm-up"):
+                warm_up_page_cache(session)
+
+    driver.close()
 
 
 if __name__ == "__main__":
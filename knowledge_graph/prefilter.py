@@ -0,0 +1,88 @@
+"""
+Cheap filters that operate on the raw bytes of the assertions.
+
+Most rows of the dump are discarded because of their languages or relations.
+Every row has the form `assertion<TAB>relation<TAB>start<TAB>end<TAB>metadata`,
+so these rows can be rejected with a few prefix tests (e.g., `/c/en/` at the
+start of the third field) before they are decoded and parsed as CSV.
+"""
+
+from dataclasses import dataclass
+from typing import Counter, Iterable, Iterator, Tuple
+
+
+@dataclass(frozen=True)
+class Prefilter:
+    """Select rows by the languages of their concepts and their relation.
+
+    Relation categories ending with a slash match all categories with this prefix
+    (e.g., `dbpedia/`), others have to match exactly.
+    If `include_relations` is empty, all relations that are not excluded are kept.
+    Self-loops are dropped unless `keep_self_loops` is set.
+    Only rows with identical start and end URIs are detected here,
+    the remaining ones are dropped after the URIs have been normalized.
+
+    >>> from collections import Counter
+    >>> lines = [
+    ...     b"/a/[/r/IsA/,/c/en/cat/,/c/en/animal/]\\t/r/IsA\\t/c/en/cat\\t/c/en/animal\\t{}",
+    ...     b"/a/[/r/IsA/,/c/fr/chat/,/c/en/cat/]\\t/r/IsA\\t/c/fr/chat\\t/c/en/cat\\t{}",
+    ...     b"/a/[/r/Synonym/,/c/en/a/,/c/en/a/]\\t/r/Synonym\\t/c/en/a\\t/c/en/a\\t{}",
+    ...     b"/a/[/r/dbpedia/genre/,/c/en/x/,/c/en/y/]\\t/r/dbpedia/genre\\t/c/en/x\\t/c/en/y\\t{}",
+    ... ]
+    >>> counts = Counter()
+    >>> [line.split("\\t")[1] for line in Prefilter()(lines, counts)]
+    ['/r/IsA']
+    >>> sorted(counts.items())
+    [('language', 1), ('relation', 1), ('self-loop', 1)]
+    """
+
+    languages: Tuple[str, ...] = ("de", "en")
+    include_relations: Tuple[str, ...] = ()
+    exclude_relations: Tuple[str, ...] = ("dbpedia/",)
+    keep_self_loops: bool = False
+
+    def __call__(self, lines: Iterable[bytes], counts: Counter[str]) -> Iterator[str]:
+        """Yield the decoded lines that pass all filters.
+
+        The number of rejected rows per filter is added to `counts`.
+        """
+
+        languages = tuple(f"/c/{language}/".encode() for language in self.languages)
+        include = _relation_patterns(self.include_relations)
+        exclude = _relation_patterns(self.exclude_relations)
+        keep_self_loops = self.keep_self_loops
+
+        for line in lines:
+            rel = line.find(b"\t") + 1
+            start = line.find(b"\t", rel) + 1
+            end = line.find(b"\t", start) + 1
+
+            if (include and not line.startswith(include, rel)) or (
+                exclude and line.startswith(exclude, rel)
+            ):
+                counts["relation"] += 1
+            elif not (
+                line.startswith(languages, start) and line.startswith(languages, end)
+            ):
+                counts["language"] += 1
+            elif not keep_self_loops and line.startswith(line[start:end], end):
+                counts["self-loop"] += 1
+            else:
+                yield line.decode("utf-8")
+
+
+def _relation_patterns(categories: Iterable[str]) -> Tuple[bytes, ...]:
+    """
+    >>> _relation_patterns(["IsA", "dbpedia/", ""])
+    (b'/r/IsA\\t', b'/r/dbpedia/')
+    """
+
+    return tuple(
+        (
+            f"/r/{category}".encode()
+            if category.endswith("/")
+            else f"/r/{category}\t".encode()
+        )
+        for category in categories
+        if category
+    )
@@ -0,0 +1,226 @@
+"""
+Samples of the graph for development and CI imports.
+
+Unlike the first rows of the dump, these samples keep the structure of the graph:
+
+- `snowball`: breadth-first search from seed concepts that follows up to `fanout`
+  random neighbors per node until enough nodes are reached. The sample is the
+  subgraph induced by these nodes, so their neighborhoods are not cut off.
+- `StratifiedSample`: relationships drawn separately from each combination of
+  languages and relation category, proportionally to its size and with at least
+  one relationship per combination (so rare relations are always present).
+- `Reservoir`: a uniform sample of relationships (reservoir sampling).
+
+All of them draw from a `random.Random` with a fixed seed, so a sample can be
+reproduced. The relationship samples are returned in input order.
+"""
+
+import heapq
+import random
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+import numpy as np
+
+from .interning import Vocabulary
+
+T = TypeVar("T")
+N = TypeVar("N", bound=Hashable)
+
+strategies = ["snowball", "stratified", "reservoir"]
+
+
+@dataclass(frozen=True)
+class Sampling:
+    """How `convert` samples the graph.
+
+    `size` is the number of nodes of a snowball and the number of relationships of
+    the other strategies. `seeds` are the concept URIs that a snowball starts from.
+    """
+
+    strategy: str
+    size: int = 10000
+    seeds: Tuple[str, ...] = ()
+    fanout: int = 20
+    random_seed: int = 0
+
+
+class Reservoir(Generic[T]):
+    """Uniform sample of `size` items of a stream (Algorithm R).
+
+    >>> sample = Reservoir(3, random.Random(0))
+    >>> for i in range(100): sample.add(i)
+    >>> list(sample), sample.count
+    ([1, 28, 53], 100)
+    """
+
+    def __init__(self, size: int, rng: random.Random):
+        self.size = size
+        self.count = 0
+        self._rng = rng
+        self._items: List[Tuple[int, T]] = []
+
+    def add(self, item: T) -> None:
+        if self.count < self.size:
+            self._items.append((self.count, item))
+        else:
+            slot = self._rng.randrange(self.count + 1)
+
+            if slot < self.size:
+                self._items[slot] = (self.count, item)
+
+        self.count += 1
+
+    def __iter__(self) -> Iterator[T]:
+        return (item for _, item in sorted(self._items, key=lambda pair: pair[0]))
+
+
+class StratifiedSample(Generic[T]):
+    """Proportional sample of about `size` items from the strata given by `key`.
+
+    Every item gets a random priority and the `size` items with the lowest
+    priorities (plus some slack) are kept, which is a uniform sample. The quota of
+    each stratum is then taken from its items in this sample, and the item with the
+    lowest priority of each stratum is kept separately for strata that are too
+    small to get a proportional share.
+
+    >>> sample = StratifiedSample(10, random.Random(0), key=lambda i: i % 100 == 0)
+    >>> for i in range(1000): sample.add(i)
+    >>> items = list(sample)
+    >>> len(items), sum(i % 100 == 0 for i in items)
+    (10, 1)
+    """
+
+    def __init__(self, size: int, rng: random.Random, key: Callable[[T], Hashable]):
+        self.size = size
+        self._rng = rng
+        self._key = key
+        # Binomial fluctuations of the strata in the uniform sample.
+        self._capacity = size + 4 * int(size**0.5) + 16
+        self._heap: List[Tuple[float, int, Hashable, T]] = []
+        self._counts: Dict[Hashable, int] = {}
+        self._first: Dict[Hashable, Tuple[float, int, T]] = {}
+        self._seen = 0
+
+    def add(self, item: T) -> None:
+        stratum = self._key(item)
+        priority = self._rng.random()
+        position = self._seen
+        self._seen += 1
+        self._counts[stratum] = self._counts.get(stratum, 0) + 1
+        first = self._first.get(stratum)
+
+        if first is None or priority < first[0]:
+            self._first[stratum] = (priority, position, item)
+
+        # The heap holds the negated priorities, so the largest one is at the top.
+        if len(self._heap) < self._capacity:
+            heapq.heappush(self._heap, (-priority, position, stratum, item))
+        elif priority < -self._heap[0][0]:
+            heapq.heapreplace(self._heap, (-priority, position, stratum, item))
+
+    def quotas(self) -> Dict[Hashable, int]:
+        """Sizes of the strata in the sample (by the largest remainder method)."""
+
+        total = sum(self._counts.values())
+        size = min(self.size, total)
+        # Strata ordered by size, then by key, so ties are broken deterministically.
+        strata = sorted(self._counts, key=lambda s: (-self._counts[s], repr(s)))
+        shares = {s: size * self._counts[s] / total for s in strata}
+        quotas = {s: max(1, int(shares[s])) for s in strata}
+        missing = max(0, size - sum(quotas.values()))
+
+        for s in sorted(strata, key=lambda s: int(shares[s]) - shares[s])[:missing]:
+            quotas[s] += 1
+
+        # With more strata than items, the smallest strata are left out.
+        for s in reversed(strata):
+            if sum(quotas.values()) <= size:
+                break
+
+            quotas[s] -= 1
+
+        return quotas
+
+    def __iter__(self) -> Iterator[T]:
+        members: Dict[Hashable, List[Tuple[float, int, T]]] = {}
+
+        for negated, position, stratum, item in self._heap:
+            members.setdefault(stratum, []).append((-negated, position, item))
+
+        selected: List[Tuple[int, T]] = []
+
+        for stratum, quota in self.quotas().items():
+            candidates = members.get(stratum, [])
+
+            if not candidates and quota:
+                candidates = [self._first[stratum]]
+
+            candidates.sort(key=lambda candidate: candidate[:2])
+            selected.extend(
+                (position, item) for _, position, item in candidates[:quota]
+            )
+
+        return (item for _, item in sorted(selected, key=lambda pair: pair[0]))
+
+
+def snowball(
+    edges: Iterable[Tuple[N, N]],
+    is_seed: Callable[[N], bool],
+    size: int,
+    rng: random.Random,
+    fanout: int,
+) -> Set[N]:
+    """Nodes reached by a breadth-first search from the seeds, ignoring directions.
+
+    Each node adds at most `fanout` of its unvisited neighbors (chosen at random),
+    which keeps hubs from filling the sample with their direct neighbors.
+
+    >>> path = [(i, i + 1) for i in range(10)] + [(5, 20), (20, 21)]
+    >>> sorted(snowball(path, lambda n: n == 5, 5, random.Random(0), 2))
+    [3, 4, 5, 20, 21]
+    """
+
+    nodes: Vocabulary[N] = Vocabulary()
+    ends = [array("q"), array("q")]
+
+    for start, end in edges:
+        ends[0].append(nodes.add(start))
+        ends[1].append(nodes.add(end))
+
+    starts = np.frombuffer(ends[0], dtype=np.int64)
+    targets = np.frombuffer(ends[1], dtype=np.int64)
+    sources = np.concatenate([starts, targets])
+    neighbors = np.concatenate([targets, starts])[np.argsort(sources, kind="stable")]
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(nodes)), out=indptr[1:])
+
+    seeds = [i for i, node in enumerate(nodes.values) if is_seed(node)][:size]
+    visited = set(seeds)
+    queue = deque(seeds)
+
+    while queue and len(visited) < size:
+        node = queue.popleft()
+        candidates = sorted(
+            set(neighbors[indptr[node] : indptr[node + 1]].tolist()) - visited
+        )
+        rng.shuffle(candidates)
+
+        for neighbor in candidates[: min(fanout, size - len(visited))]:
+            visited.add(neighbor)
+            queue.append(neighbor)
+
+    return {nodes[i] for i in visited}
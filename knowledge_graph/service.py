@@ -0,0 +1,430 @@
+"""
+Local HTTP service for lookups that many concurrent callers share.
+
+```
+poetry run python -m knowledge_graph serve --port 8000
+curl 'localhost:8000/neighbors?uri=/c/en/argument&relation=RelatedTo'
+curl 'localhost:8000/concepts?name=argument&language=en'
+curl 'localhost:8000/weights?start=/c/en/cat/noun&end=/c/en/animal'
+curl 'localhost:8000/metrics'
+```
+
+Requests for the same key that arrive while it is being looked up wait for
+that lookup instead of starting another one. Distinct keys that arrive within
+`max_delay` are sent as one batch (see `client.Client`), and results are kept
+in a hot cache until they expire or the graph generation changes.
+The driver is synchronous, so batches run in a thread pool whose size bounds
+the number of concurrent queries.
+"""
+
+import asyncio
+import json
+import time
+import typing as t
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import click
+
+from . import database
+from .client import Client, TtlCache, result_size
+
+Fetch = t.Callable[[t.List[t.Any]], t.List[t.Any]]
+
+_missing = object()
+
+
+class Batcher:
+    """Coalesce identical and batch distinct keys of one kind of lookup."""
+
+    def __init__(
+        self,
+        fetch: Fetch,
+        run: t.Callable[[Fetch, t.List[t.Any]], t.Awaitable[t.List[t.Any]]],
+        cache: TtlCache,
+        max_batch: int,
+        max_delay: float,
+    ):
+        self._fetch = fetch
+        self._run = run
+        self._cache = cache
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._in_flight: t.Dict[t.Any, asyncio.Future] = {}
+        self._pending: t.List[t.Any] = []
+        self._timer: t.Optional[asyncio.TimerHandle] = None
+        self.coalesced = 0
+        self.batches = 0
+        self.keys = 0
+
+    async def get(self, key: t.Any) -> t.Any:
+        cached = self._cache.get(key, _missing)
+
+        if cached is not _missing:
+            return cached
+
+        future = self._in_flight.get(key)
+
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = self._in_flight[key] = loop.create_future()
+        self._pending.append(key)
+
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_delay, self._flush)
+
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        keys, self._pending = self._pending, []
+
+        if keys:
+            asyncio.ensure_future(self._complete(keys))
+
+    async def _complete(self, keys: t.List[t.Any]) -> None:
+        self.batches += 1
+        self.keys += len(keys)
+        # Results of a batch that overlaps a change of the graph are not cached.
+        epoch = self._cache.epoch
+
+        try:
+            results = await self._run(self._fetch, keys)
+        except Exception as e:
+            for key in keys:
+                self._in_flight.pop(key).set_exception(e)
+
+            return
+
+        for key, result in zip(keys, results):
+            self._cache.put(key, result, epoch)
+            self._in_flight.pop(key).set_result(result)
+
+
+class Latencies:
+    """Latencies of the most recent `window` requests.
+
+    >>> latencies = Latencies()
+    >>> for ms in range(1, 101): latencies.add(ms / 1000)
+    >>> latencies.summary()
+    {'count': 100, 'p50_ms': 50.0, 'p99_ms': 99.0}
+    """
+
+    def __init__(self, window: int = 10000):
+        self.count = 0
+        self._values: t.Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self._values.append(seconds)
+
+    def summary(self) -> t.Dict[str, t.Any]:
+        values = sorted(self._values)
+
+        def percentile(p: float) -> t.Optional[float]:
+            if not values:
+                return None
+
+            return round(values[max(0, round(p * len(values)) - 1)] * 1000, 3)
+
+        return {
+            "count": self.count,
+            "p50_ms": percentile(0.5),
+            "p99_ms": percentile(0.99),
+        }
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+_reasons = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    500: "Internal Server Error",
+}
+
+# Latencies of requests for other paths are recorded together,
+# so unknown paths cannot add entries without bound.
+_endpoints = ("/concepts", "/neighbors", "/weights", "/metrics")
+
+
+class Service:
+    def __init__(
+        self,
+        client: Client,
+        max_concurrency: int = 8,
+        max_batch: int = 500,
+        max_delay: float = 0.002,
+        cache_size: int = 100000,
+        ttl: float = 300.0,
+        generation_interval: float = 10.0,
+    ):
+        self.client = client
+        self.cache: TtlCache = TtlCache(cache_size, ttl, sizeof=result_size)
+        self.latencies: t.Dict[str, Latencies] = {}
+        self._executor = ThreadPoolExecutor(max_concurrency)
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._generation_interval = generation_interval
+        self._generation: t.Optional[str] = None
+        self._batchers: t.Dict[t.Hashable, Batcher] = {}
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        await self._check_generation()
+        asyncio.ensure_future(self._watch_generation())
+
+        return await asyncio.start_server(self._handle, host, port)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    async def lookup(self, path: str, query: t.Dict[str, t.List[str]]) -> t.Any:
+        """Answer a request for `path` with the query parameters `query`."""
+
+        relations = tuple(sorted(set(query.get("relation", [])))) or None
+
+        if path == "/concepts":
+            key = (_single(query, "name"), _single(query, "language"))
+            scope: t.Tuple = ("concepts",)
+            fetch: Fetch = self.client.concepts
+        elif path == "/neighbors":
+            direction = query.get("direction", ["out"])[0]
+
+            if direction not in ("out", "in", "both"):
+                raise HttpError(400, f"Unknown direction {direction!r}.")
+
+            key = _single(query, "uri")
+            scope = ("neighbors", relations, direction)
+
+            def fetch(keys):
+                return self.client.neighbors(keys, relations, direction)
+
+        elif path == "/weights":
+            key = (_single(query, "start"), _single(query, "end"))
+            scope = ("weights", relations)
+
+            def fetch(keys):
+                return self.client.weights(keys, relations)
+
+        elif path == "/metrics":
+            return self.metrics()
+        else:
+            raise HttpError(404, f"Unknown path {path}.")
+
+        batcher = self._batchers.get(scope)
+
+        if batcher is None:
+            batcher = self._batchers[scope] = Batcher(
+                fetch,
+                self._run,
+                _ScopedCache(self.cache, scope),
+                self._max_batch,
+                self._max_delay,
+            )
+
+        result = await batcher.get(key)
+
+        return [item._asdict() for item in result] if path != "/weights" else result
+
+    def metrics(self) -> t.Dict[str, t.Any]:
+        batches = sum(b.batches for b in self._batchers.values())
+        keys = sum(b.keys for b in self._batchers.values())
+
+        return {
+            "latency": {path: l.summary() for path, l in self.latencies.items()},
+            "cache": {
+                "entries": len(self.cache),
+                "size": self.cache.size,
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+            },
+            "coalesced": sum(b.coalesced for b in self._batchers.values()),
+            "batches": batches,
+            "mean_batch_size": keys / batches if batches else None,
+        }
+
+    async def _run(self, fetch: Fetch, keys: t.List[t.Any]) -> t.List[t.Any]:
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self._executor, fetch, keys)
+
+    async def _watch_generation(self) -> None:
+        while True:
+            await asyncio.sleep(self._generation_interval)
+
+            try:
+                await self._check_generation()
+            except Exception as e:
+                click.echo(f"Checking the generation failed: {e}", err=True)
+
+    async def _check_generation(self) -> None:
+        loop = asyncio.get_running_loop()
+        generation = await loop.run_in_executor(
+            self._executor, database.generation, self.client.driver
+        )
+
+        if generation != self._generation:
+            self.cache.clear()
+            self._generation = generation
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line:
+                    break
+
+                headers = {}
+
+                while True:
+                    line = await reader.readline()
+
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                status, body = await self._respond(request_line)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {_reasons[status]}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(body)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                        "\r\n"
+                    ).encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                path = urlsplit(request_line.split()[1].decode("latin-1")).path
+                path = path if path in _endpoints else "other"
+                latencies = self.latencies.setdefault(path, Latencies())
+                latencies.add(time.perf_counter() - start)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line: bytes) -> t.Tuple[int, bytes]:
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+
+            if method != "GET":
+                raise HttpError(400, f"Unsupported method {method}.")
+
+            url = urlsplit(target)
+            result = await self.lookup(url.path, parse_qs(url.query))
+            status = 200
+        except HttpError as e:
+            status, result = e.status, {"error": str(e)}
+        except ValueError:
+            status, result = 400, {"error": "Malformed request."}
+        except Exception as e:
+            status, result = 500, {"error": str(e)}
+
+        return status, json.dumps(result).encode("utf-8")
+
+
+class _ScopedCache:
+    """View of the shared hot cache for the keys of one batcher."""
+
+    def __init__(self, cache: TtlCache, scope: t.Hashable):
+        self._cache = cache
+        self._scope = scope
+
+    def get(self, key: t.Any, default: t.Any = None) -> t.Any:
+        return self._cache.get((self._scope, key), default)
+
+    @property
+    def epoch(self) -> int:
+        return self._cache.epoch
+
+    def put(self, key: t.Any, value: t.Any, epoch: t.Optional[int] = None) -> None:
+        self._cache.put((self._scope, key), value, epoch)
+
+
+def _single(query: t.Dict[str, t.List[str]], name: str) -> str:
+    values = query.get(name)
+
+    if not values:
+        raise HttpError(400, f"The parameter {name} is missing.")
+
+    return values[0]
+
+
+@click.command("serve")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8000, show_default=True)
+@click.option(
+    "--max-concurrency",
+    default=8,
+    show_default=True,
+    help="Queries that may run in the database at the same time.",
+)
+@click.option("--max-batch", default=500, show_default=True, help="Keys per query.")
+@click.option(
+    "--max-delay",
+    default=2.0,
+    show_default=True,
+    help="Milliseconds to wait for more keys before sending a batch.",
+)
+@click.option(
+    "--cache-size",
+    default=100000,
+    show_default=True,
+    help="Concepts, neighbors and weights to cache at most.",
+)
+@click.option(
+    "--ttl", default=300.0, show_default=True, help="Seconds to cache results."
+)
+def main(host, port, max_concurrency, max_batch, max_delay, cache_size, ttl):
+    # The service has its own cache, so the client sends every batch.
+    client = Client(
+        database.driver(max_connection_pool_size=max_concurrency),
+        cache_size=0,
+        generation_interval=float("inf"),
+    )
+    service = Service(
+        client, max_concurrency, max_batch, max_delay / 1000, cache_size, ttl
+    )
+
+    async def serve() -> None:
+        server = await service.start(host, port)
+        click.echo(f"Serving on http://{host}:{port}")
+
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        client.driver.close()
+
+
+if __name__ == "__main__":
+    main()
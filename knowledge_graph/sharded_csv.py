@@ -0,0 +1,165 @@
+"""
+CSV files for `neo4j-admin import` that are split into gzipped parts.
+
+The header is written to a separate file, so the parts only contain data rows.
+`neo4j-admin import` accepts such a group as `--nodes=header.csv,part1.csv.gz,...`
+and reads the parts in parallel.
+Rows are collected in chunks that are compressed in a thread pool
+(zlib releases the GIL) and distributed round-robin over the parts.
+Each chunk becomes a separate gzip member, which is valid according to RFC 1952.
+The members do not contain a timestamp, so the same rows yield the same files.
+"""
+
+import csv
+import io
+import os
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, BinaryIO, Deque, Iterator, List, Sequence, Tuple
+
+compresslevel = 6
+
+
+def shard_paths(path: Path, shards: int) -> Tuple[Path, List[Path]]:
+    """
+    >>> header, parts = shard_paths(Path("import/conceptnet-nodes.csv"), 2)
+    >>> header.name, [part.name for part in parts]
+    ('conceptnet-nodes-header.csv', ['conceptnet-nodes-00001.csv.gz', 'conceptnet-nodes-00002.csv.gz'])
+    """
+    stem = _stem(path)
+
+    return (
+        path.with_name(f"{stem}-header.csv"),
+        [path.with_name(f"{stem}-{i:05}.csv.gz") for i in range(1, shards + 1)],
+    )
+
+
+def find_shards(path: Path) -> Tuple[Path, List[Path]]:
+    """Find the header and parts that have been written for `path`."""
+
+    header, _ = shard_paths(path, 0)
+    parts = sorted(path.parent.glob(f"{_stem(path)}-{'[0-9]' * 5}.csv.gz"))
+
+    return header, parts
+
+
+@contextmanager
+def open_atomic(path: Path, mode: str = "w", **kwargs: Any) -> Iterator[IO]:
+    """Write a temporary file that replaces `path` once it is complete.
+
+    Output files are never written in place, since they may be hard links to the
+    builds of a `knowledge_graph.conversion_cache.ConversionCache`.
+    """
+
+    tmp = path.with_name(path.name + ".tmp")
+
+    try:
+        with tmp.open(mode, **kwargs) as f:
+            yield f
+
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def compress(data: bytes) -> bytes:
+    """Gzip member without a timestamp (unlike `gzip.compress` before Python 3.8).
+
+    >>> import gzip
+    >>> gzip.decompress(compress(b"a,b\\n")), compress(b"") == compress(b"")
+    (b'a,b\\n', True)
+    """
+
+    # A window size of 16 + 15 selects the gzip format.
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    return compressor.compress(data) + compressor.flush()
+
+
+def _stem(path: Path) -> str:
+    return path.name[: -len(".csv")] if path.name.endswith(".csv") else path.name
+
+
+class ShardedWriter:
+    """Write CSV rows to a header file and `shards` gzipped parts."""
+
+    def __init__(
+        self,
+        path: Path,
+        header: Sequence[str],
+        shards: int,
+        threads: int = 1,
+        chunk_rows: int = 50000,
+    ):
+        header_path, part_paths = shard_paths(path, shards)
+
+        # New parts are new files, so the old ones do not change.
+        for old_part in find_shards(path)[1]:
+            old_part.unlink()
+
+        with open_atomic(header_path) as f:
+            csv.writer(f).writerow(header)
+
+        self.chunk_rows = chunk_rows
+        self._threads = threads
+        self._parts: List[BinaryIO] = [part.open("wb") for part in part_paths]
+        self._written = [False] * shards
+        self._executor = ThreadPoolExecutor(threads)
+        self._pending: Deque[Tuple[int, "Future[bytes]"]] = deque()
+        self._chunks = 0
+        self._reset()
+
+    def writerow(self, row: Sequence[Any]) -> None:
+        self._writer.writerow(row)
+        self._rows += 1
+
+        if self._rows >= self.chunk_rows:
+            self._flush()
+
+    def close(self) -> None:
+        if self._rows:
+            self._flush()
+
+        while self._pending:
+            self._write_next()
+
+        for i, part in enumerate(self._parts):
+            # An empty file is not a valid gzip file.
+            if not self._written[i]:
+                part.write(compress(b""))
+
+            part.close()
+
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ShardedWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _reset(self) -> None:
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._rows = 0
+
+    def _flush(self) -> None:
+        data = self._buffer.getvalue().encode("utf-8")
+        part = self._chunks % len(self._parts)
+        self._chunks += 1
+        self._reset()
+
+        self._pending.append((part, self._executor.submit(compress, data)))
+
+        # Bound the number of chunks in memory.
+        while len(self._pending) > 2 * self._threads:
+            self._write_next()
+
+    def _write_next(self) -> None:
+        part, future = self._pending.popleft()
+        self._parts[part].write(future.result())
+        self._written[part] = True
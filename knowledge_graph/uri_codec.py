@@ -0,0 +1,256 @@
+"""
+Batched variants of the URI functions in `uri.py`.
+
+The functions of `uri.py` handle one string at a time and split, strip and join
+lists for every call. `UriCodec` parses and builds whole lists of URIs and
+returns the parts as columns. Since the same concepts occur in many assertions,
+parsed and built URIs are kept in bounded memo caches.
+The results are identical to those of `uri.py`, which the tests verify.
+"""
+
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .uri import parse_compound_uri, split_uri
+
+Concept = Tuple[str, str, Optional[str], Optional[str]]
+
+
+class ConceptColumns(NamedTuple):
+    """Parts of concept URIs, e.g. `/c/en/cat/n/wn/animal` has the
+    language `en`, the text `cat`, the pos `n` and the disambiguation `wn/animal`.
+    Missing parts are None.
+    """
+
+    language: List[str]
+    text: List[str]
+    pos: List[Optional[str]]
+    disambiguation: List[Optional[str]]
+
+
+class AssertionColumns(NamedTuple):
+    relation: List[str]
+    start: List[str]
+    end: List[str]
+
+
+def parse_concept(uri: str) -> Concept:
+    """
+    >>> parse_concept('/c/en/cat/n/wn/animal')
+    ('en', 'cat', 'n', 'wn/animal')
+    >>> parse_concept('/c/de/katze')
+    ('de', 'katze', None, None)
+    >>> parse_concept('/r/IsA')
+    Traceback (most recent call last):
+        ...
+    ValueError: '/r/IsA' is not a concept URI
+    """
+    # Like `split_uri`, but the disambiguation is not split and joined again.
+    pieces = uri.lstrip("/").split("/", 4) if uri.startswith("/") else [uri]
+
+    if len(pieces) < 3 or pieces[0] != "c":
+        raise ValueError(f"{uri!r} is not a concept URI")
+
+    return (
+        pieces[1],
+        pieces[2],
+        pieces[3] if len(pieces) > 3 else None,
+        pieces[4] if len(pieces) > 4 else None,
+    )
+
+
+def build_concept(
+    language: str,
+    text: str,
+    pos: Optional[str] = None,
+    disambiguation: Optional[str] = None,
+) -> str:
+    """Equivalent to `concept_uri(language, text, pos, *disambiguation.split("/"))`.
+
+    >>> build_concept('en', 'cat', 'n', 'wn/animal')
+    '/c/en/cat/n/wn/animal'
+    >>> build_concept('en', 'cat')
+    '/c/en/cat'
+    """
+    assert " " not in text, "%r is not in normalized form" % text
+    pieces = ["", "c", language.strip("/"), text.strip("/")]
+
+    if pos is not None:
+        pieces.append(pos.strip("/"))
+
+        if disambiguation is not None:
+            for piece in disambiguation.split("/"):
+                assert " " not in piece, "%r is not in normalized form" % piece
+                pieces.append(piece.strip("/"))
+
+    return "/".join(pieces)
+
+
+def build_assertion(relation: str, start: str, end: str) -> str:
+    """Equivalent to `assertion_uri(relation, start, end)`.
+
+    >>> build_assertion('/r/CapableOf', '/c/en/cat', '/c/en/sleep')
+    '/a/[/r/CapableOf/,/c/en/cat/,/c/en/sleep/]'
+    """
+    assert relation.startswith("/r"), relation
+
+    return f"/a/[/{relation.strip('/')}/,/{start.strip('/')}/,/{end.strip('/')}/]"
+
+
+def _parse_assertion(uri: str) -> List[str]:
+    """Equivalent to `parse_compound_uri(uri)[1]` for URIs starting with `/a/`."""
+
+    # Without brackets, empty pieces or commas in the arguments,
+    # the arguments are separated by exactly two occurrences of `/,`.
+    if (
+        uri.startswith("/a/[/")
+        and uri.endswith("/]")
+        and uri.count("/,") == 2
+        and "[" not in uri[4:]
+        and "]" not in uri[4:-1]
+        and "//" not in uri
+    ):
+        return uri[4:-2].split("/,")
+
+    op, arguments = parse_compound_uri(uri)
+
+    if op != "/a":
+        raise ValueError(f"{uri!r} is not an assertion URI")
+
+    return arguments
+
+
+def _unslashed(values: Sequence[str]) -> bool:
+    """Whether none of the values starts or ends with a slash.
+
+    >>> _unslashed(["en", "cat"]), _unslashed(["en", "/cat"]), _unslashed([])
+    (True, False, True)
+    """
+    text = "\n".join(values)
+
+    return not (
+        text.startswith("/") or text.endswith("/") or "/\n" in text or "\n/" in text
+    )
+
+
+def join_pieces(pieces: Sequence[str]) -> str:
+    """Equivalent to `join_uri(*pieces)`."""
+
+    return "/" + "/".join([piece.strip("/") for piece in pieces])
+
+
+class UriCodec:
+    """Parse and build lists of URIs with memo caches of `cache_size` entries each."""
+
+    def __init__(self, cache_size: int = 1 << 16):
+        self.parse_concept = lru_cache(cache_size)(parse_concept)
+        self.build_concept = lru_cache(cache_size)(build_concept)
+
+    def parse_concepts(self, uris: Iterable[str]) -> ConceptColumns:
+        """
+        >>> UriCodec().parse_concepts(['/c/en/cat/n', '/c/de/katze'])
+        ConceptColumns(language=['en', 'de'], text=['cat', 'katze'], pos=['n', None], disambiguation=[None, None])
+        """
+        languages: List[str] = []
+        texts: List[str] = []
+        pos: List[Optional[str]] = []
+        disambiguations: List[Optional[str]] = []
+        # Bound methods and a single loop avoid most of the per-URI overhead.
+        add_language, add_text = languages.append, texts.append
+        add_pos, add_disambiguation = pos.append, disambiguations.append
+
+        for uri in uris:
+            pieces = uri.split("/", 5)
+            count = len(pieces)
+
+            # Other forms (e.g., `//c/en/cat`) are handled like `split_uri` does.
+            if count < 4 or pieces[0] or pieces[1] != "c":
+                pieces = ["", "c", *self.parse_concept(uri)]
+                count = 4 + (pieces[4] is not None) + (pieces[5] is not None)
+
+            add_language(pieces[2])
+            add_text(pieces[3])
+
+            if count == 4:
+                add_pos(None)
+                add_disambiguation(None)
+            elif count == 5:
+                add_pos(pieces[4])
+                add_disambiguation(None)
+            else:
+                add_pos(pieces[4])
+                add_disambiguation(pieces[5])
+
+        return ConceptColumns(languages, texts, pos, disambiguations)
+
+    def build_concepts(
+        self,
+        languages: Sequence[str],
+        texts: Sequence[str],
+        pos: Optional[Sequence[Optional[str]]] = None,
+        disambiguations: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[str]:
+        """Build concept URIs from columns like those of `parse_concepts`."""
+
+        if pos is None:
+            pos = [None] * len(languages)
+
+        if disambiguations is None:
+            disambiguations = [None] * len(languages)
+
+        present_pos = [value for value in pos if value is not None]
+        present_disambiguations = [d for d in disambiguations if d is not None]
+
+        # Pieces that do not need to be stripped can be formatted directly.
+        if (
+            _unslashed(languages)
+            and _unslashed(texts)
+            and _unslashed(present_pos)
+            and not any(" " in text for text in texts)
+            and not any(" " in d for d in present_disambiguations)
+        ):
+            return [
+                (
+                    f"/c/{language}/{text}"
+                    if p is None
+                    else (
+                        f"/c/{language}/{text}/{p}"
+                        if d is None
+                        else f"/c/{language}/{text}/{p}/{d}"
+                    )
+                )
+                for language, text, p, d in zip(languages, texts, pos, disambiguations)
+            ]
+
+        return list(map(self.build_concept, languages, texts, pos, disambiguations))
+
+    def parse_assertions(self, uris: Iterable[str]) -> AssertionColumns:
+        """Split assertion URIs into their relation, start and end.
+
+        >>> UriCodec().parse_assertions(['/a/[/r/IsA/,/c/en/cat/,/c/en/animal/]'])
+        AssertionColumns(relation=['/r/IsA'], start=['/c/en/cat'], end=['/c/en/animal'])
+        """
+        relations, starts, ends = [], [], []
+
+        for uri in uris:
+            arguments = _parse_assertion(uri)
+
+            if len(arguments) != 3:
+                raise ValueError(f"{uri!r} is not an assertion URI")
+
+            relations.append(arguments[0])
+            starts.append(arguments[1])
+            ends.append(arguments[2])
+
+        return AssertionColumns(relations, starts, ends)
+
+    def build_assertions(
+        self, relations: Sequence[str], starts: Sequence[str], ends: Sequence[str]
+    ) -> List[str]:
+        return list(map(build_assertion, relations, starts, ends))
+
+    def split(self, uris: Iterable[str]) -> List[List[str]]:
+        return list(map(split_uri, uris))
+
+    def join(self, pieces: Iterable[Sequence[str]]) -> List[str]:
+        return list(map(join_pieces, pieces))
@@ -0,0 +1,145 @@
+from knowledge_graph import client
+
+
+class _Driver:
+    """Answers the queries of the client from in-memory relationships."""
+
+    def __init__(self, relationships):
+        self.relationships = relationships
+        self.generation = "a"
+        self.queries = []
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def read_transaction(self, function, *args):
+        return function(self, *args)
+
+    def run(self, query, **params):
+        if "ImportGeneration" in query:
+            return _Result([{"generation": self.generation}])
+
+        self.queries.append(params)
+        records = []
+
+        if "uris" in params:
+            for uri in params["uris"]:
+                for relation, start, end, weight in self.relationships:
+                    if start == uri and params["relations"] in (None, [relation]):
+                        records.append(
+                            {
+                                "uri": uri,
+                                "relation": relation,
+                                "neighbor": end,
+                                "weight": weight,
+                            }
+                        )
+        elif "pairs" in params:
+            for pair in params["pairs"]:
+                for relation, start, end, weight in self.relationships:
+                    if [start, end] == pair:
+                        records.append(
+                            {"pair": pair, "relation": relation, "weight": weight}
+                        )
+
+        return _Result(records)
+
+
+class _Result(list):
+    def single(self):
+        return self[0]
+
+
+RELATIONSHIPS = [
+    ("IsA", "/c/en/cat", "/c/en/animal", 2.0),
+    ("RelatedTo", "/c/en/cat", "/c/en/dog", 1.0),
+    ("IsA", "/c/en/dog", "/c/en/animal", 2.0),
+]
+
+
+def test_neighbors_batched_and_cached():
+    driver = _Driver(RELATIONSHIPS)
+    graph = client.Client(driver, generation_interval=0.0)
+
+    first = graph.neighbors(["/c/en/cat", "/c/en/cat", "/c/en/unknown"])
+    second = graph.neighbors(["/c/en/cat", "/c/en/dog"], relations=["IsA"])
+    third = graph.neighbors(["/c/en/cat", "/c/en/unknown"])
+
+    assert first[0] == first[1] == third[0]
+    assert {n.uri for n in first[0]} == {"/c/en/animal", "/c/en/dog"}
+    assert first[2] == third[1] == []
+    assert second == [
+        [client.Neighbor("IsA", "/c/en/animal", 2.0)],
+        [client.Neighbor("IsA", "/c/en/animal", 2.0)],
+    ]
+    assert [query["uris"] for query in driver.queries] == [
+        ["/c/en/cat", "/c/en/unknown"],
+        ["/c/en/cat", "/c/en/dog"],
+    ]
+
+
+def test_weights_invalidated_by_generation():
+    driver = _Driver(RELATIONSHIPS)
+    graph = client.Client(driver, generation_interval=0.0)
+    pairs = [("/c/en/cat", "/c/en/animal"), ("/c/en/animal", "/c/en/cat")]
+
+    assert graph.weights(pairs) == [{"IsA": 2.0}, {}]
+    driver.relationships = [("IsA", "/c/en/cat", "/c/en/animal", 3.0)]
+    assert graph.weights(pairs) == [{"IsA": 2.0}, {}]
+
+    driver.generation = "b"
+    assert graph.weights(pairs) == [{"IsA": 3.0}, {}]
+    assert len(driver.queries) == 2
+
+
+def test_ttl_cache_expires():
+    now = [0.0]
+    cache = client.TtlCache(10, ttl=5.0, clock=lambda: now[0])
+    cache.put("a", 1)
+    now[0] = 4.0
+    assert cache.get("a") == 1
+    now[0] = 6.0
+    assert cache.get("a") is None
+
+
+def test_cache_bounded_by_result_size():
+    driver = _Driver(RELATIONSHIPS)
+    graph = client.Client(driver, cache_size=2, generation_interval=0.0)
+
+    graph.neighbors(["/c/en/dog"])
+    # The two neighbors of cat fill the cache.
+    graph.neighbors(["/c/en/cat"])
+    assert graph.cache.size == 2
+    graph.neighbors(["/c/en/cat", "/c/en/dog"])
+
+    assert [query["uris"] for query in driver.queries] == [
+        ["/c/en/dog"],
+        ["/c/en/cat"],
+        ["/c/en/dog"],
+    ]
+
+
+def test_lookup_overlapping_generation_change_not_cached():
+    driver = _Driver(RELATIONSHIPS)
+    graph = client.Client(driver, generation_interval=0.0)
+    read = driver.read_transaction
+
+    def read_during_change(function, *args):
+        # Another thread notices a new generation while the query runs.
+        graph.cache.clear()
+        return read(function, *args)
+
+    driver.read_transaction = read_during_change
+    graph.neighbors(["/c/en/cat"])
+    assert len(graph.cache) == 0
+
+    driver.read_transaction = read
+    graph.neighbors(["/c/en/cat"])
+    graph.neighbors(["/c/en/cat"])
+    assert len(driver.queries) == 2
@@ -0,0 +1,422 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from knowledge_graph import convert_csv, csr, name_index, sharded_csv
+from knowledge_graph.conversion_cache import ConversionCache
+
+
+def _assertion(rel, start, end, weight=1.0, dataset="/d/conceptnet/4/en"):
+    metadata = {
+        "dataset": dataset,
+        "license": "cc:by/4.0",
+        "sources": [{"contributor": "/s/contributor/omcs/dev"}],
+        "weight": weight,
+    }
+    uri = f"/a/[{rel}/,{start}/,{end}/]"
+
+    return "\t".join((uri, rel, start, end, json.dumps(metadata)))
+
+
+ROWS = [
+    _assertion("/r/IsA", "/c/en/cat/n", "/c/en/animal"),
+    _assertion("/r/IsA", "/c/en/cat/n", "/c/en/animal", 0.5, "/d/wordnet/3.1"),
+    _assertion("/r/Synonym", "/c/de/katze/n", "/c/en/cat/n", 2.0),
+    _assertion("/r/Synonym", "/c/fr/chat/n", "/c/en/cat/n"),
+    _assertion("/r/RelatedTo", "/c/en/cat", "/c/en/cat"),
+    _assertion("/r/dbpedia/genre", "/c/en/jazz", "/c/en/music"),
+    _assertion("/r/ExternalURL", "/c/en/cat", "http://dbpedia.org/resource/Cat"),
+    _assertion("/r/AtLocation", "/c/en/cat/n", "/c/en/house", 0.1),
+    _assertion("/r/IsA", "/c/en/cat/n", "/c/en/animal", 0.2, "/d/verbosity"),
+]
+
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / "assertions.csv.gz"
+
+    with gzip.open(path, "wt") as f:
+        for row in ROWS * 50:
+            f.write(row + "\n")
+
+    return path
+
+
+def _read(path):
+    with path.open() as f:
+        return list(csv.reader(f))
+
+
+def _convert(dump, tmp_path, name, **kwargs):
+    nodes_path = tmp_path / f"{name}-nodes.csv"
+    relationships_path = tmp_path / f"{name}-relationships.csv"
+    convert_csv.convert(str(dump), nodes_path, relationships_path, **kwargs)
+
+    return _read(nodes_path), _read(relationships_path)
+
+
+def test_convert(dump, tmp_path):
+    nodes, relationships = _convert(dump, tmp_path, "single")
+
+    assert sorted(row[0] for row in nodes[1:]) == [
+        "/c/de/katze/noun",
+        "/c/en/animal",
+        "/c/en/cat/noun",
+        "/c/en/house",
+    ]
+    assert [row[2] for row in relationships[1:]] == ["AtLocation", "IsA", "Synonym"]
+    assert float(relationships[2][4]) == pytest.approx(50 * 1.7)
+
+
+def test_convert_prefilter(dump, tmp_path):
+    prefilter = convert_csv.Prefilter(
+        languages=("en", "fr"),
+        include_relations=("Synonym", "RelatedTo", "dbpedia/"),
+        exclude_relations=(),
+        keep_self_loops=True,
+    )
+    _, relationships = _convert(dump, tmp_path, "prefilter", prefilter=prefilter)
+
+    assert [row[:3] for row in relationships[1:]] == [
+        ["/c/en/cat", "/c/en/cat", "RelatedTo"],
+        ["/c/fr/chat/noun", "/c/en/cat/noun", "Synonym"],
+        ["/c/en/jazz", "/c/en/music", "dbpedia/genre"],
+    ]
+
+
+def test_convert_parallel(dump, tmp_path):
+    single_nodes, single_relationships = _convert(dump, tmp_path, "single")
+    parallel_nodes, parallel_relationships = _convert(
+        dump, tmp_path, "parallel", workers=3, batch_size=7
+    )
+
+    assert single_nodes == parallel_nodes
+    assert single_relationships == parallel_relationships
+
+
+def test_convert_memory_budget(dump, tmp_path, monkeypatch):
+    # Force several runs per sorter with a budget of a few kilobytes.
+    monkeypatch.setattr(convert_csv, "_mebibyte", 64)
+    memory_nodes, memory_relationships = _convert(
+        dump, tmp_path, "memory", metadata=("dataset",)
+    )
+    external_nodes, external_relationships = _convert(
+        dump,
+        tmp_path,
+        "external",
+        memory_budget=64,
+        spill_dir=str(tmp_path),
+        metadata=("dataset",),
+    )
+
+    assert memory_nodes == external_nodes
+    assert memory_relationships == external_relationships
+
+
+def test_convert_metadata(dump, tmp_path):
+    _, relationships = _convert(
+        dump, tmp_path, "metadata", metadata=("contributors", "dataset")
+    )
+
+    assert relationships[0][4:7] == [
+        "dataset:string[]",
+        "contributors:string[]",
+        "weight:double",
+    ]
+    assert relationships[2][2] == "IsA"
+    assert relationships[2][4:6] == [
+        "/d/conceptnet/4/en;/d/wordnet/3.1;/d/verbosity",
+        "/s/contributor/omcs/dev",
+    ]
+
+
+def test_convert_since(dump, tmp_path):
+    manifest = tmp_path / "manifest.tsv.gz"
+    _convert(dump, tmp_path, "previous", manifest_path=manifest)
+
+    updated = tmp_path / "updated.csv.gz"
+
+    with gzip.open(updated, "wt") as f:
+        for row in ROWS[1:] + [_assertion("/r/IsA", "/c/en/dog/n", "/c/en/animal")]:
+            f.write(row + "\n")
+
+    delta_dir = tmp_path / "delta"
+    convert_csv.convert(
+        str(updated),
+        tmp_path / "unused-nodes.csv",
+        tmp_path / "unused-relationships.csv",
+        manifest_path=manifest,
+        since=manifest,
+        delta_dir=delta_dir,
+    )
+
+    assert not (tmp_path / "unused-nodes.csv").exists()
+    assert _read(delta_dir / "nodes-added.csv")[1:] == [
+        ["/c/en/dog/noun", "dog", "en", "noun"]
+    ]
+    assert _read(delta_dir / "nodes-removed.csv")[1:] == []
+    assert _read(delta_dir / "relationships-added.csv")[1:] == [
+        ["IsA", "/c/en/dog/noun", "/c/en/animal", "1.0"]
+    ]
+    assert _read(delta_dir / "relationships-removed.csv")[1:] == []
+    assert _read(delta_dir / "relationships-reweighted.csv")[1:] == [
+        ["AtLocation", "/c/en/cat/noun", "/c/en/house", "0.1"],
+        ["IsA", "/c/en/cat/noun", "/c/en/animal", "0.7"],
+        ["Synonym", "/c/de/katze/noun", "/c/en/cat/noun", "2.0"],
+    ]
+
+
+def test_convert_shards(dump, tmp_path):
+    nodes, relationships = _convert(dump, tmp_path, "single")
+    convert_csv.convert(
+        str(dump),
+        tmp_path / "sharded-nodes.csv",
+        tmp_path / "sharded-relationships.csv",
+        shards=2,
+    )
+
+    for name, rows in (("nodes", nodes), ("relationships", relationships)):
+        header, parts = sharded_csv.find_shards(tmp_path / f"sharded-{name}.csv")
+        sharded_rows = _read(header)
+
+        for part in parts:
+            with gzip.open(part, "rt", newline="") as f:
+                sharded_rows.extend(csv.reader(f))
+
+        assert len(parts) == 2
+        assert sharded_rows == rows
+
+
+def test_convert_cache(dump, tmp_path, monkeypatch):
+    cache = ConversionCache(tmp_path / "cache", max_builds=2)
+    nodes_path = tmp_path / "nodes.csv"
+    relationships_path = tmp_path / "relationships.csv"
+
+    def convert(**kwargs):
+        convert_csv.convert(
+            str(dump), nodes_path, relationships_path, cache=cache, **kwargs
+        )
+        return nodes_path.read_bytes(), relationships_path.read_bytes()
+
+    output = convert()
+    english = convert(prefilter=convert_csv.Prefilter(languages=("en",)))
+    assert english != output
+
+    # Hits do not read the dump.
+    def fail(*args):
+        raise AssertionError("The dump has been read.")
+
+    with monkeypatch.context() as m:
+        m.setattr(convert_csv, "_open_lines", fail)
+        assert convert() == output
+        assert convert(workers=2, memory_budget=1) == output
+
+    # The English build is the least recently used one.
+    convert(shards=2)
+    assert len(list(cache.directory.glob("*/build.json"))) == 2
+    assert convert() == output
+
+    with monkeypatch.context() as m:
+        m.setattr(convert_csv, "_open_lines", fail)
+
+        with pytest.raises(AssertionError):
+            convert(prefilter=convert_csv.Prefilter(languages=("en",)))
+
+
+@pytest.mark.parametrize("shards", [0, 2])
+def test_convert_cache_not_overwritten(dump, tmp_path, shards):
+    cache = ConversionCache(tmp_path / "cache")
+    nodes_path = tmp_path / "nodes.csv"
+    relationships_path = tmp_path / "relationships.csv"
+
+    def convert(**kwargs):
+        convert_csv.convert(
+            str(dump), nodes_path, relationships_path, shards=shards, **kwargs
+        )
+        files = convert_csv._cache_files(nodes_path, relationships_path, shards)
+
+        return {name: path.read_bytes() for name, path in files.items()}
+
+    output = convert(cache=cache)
+    # The output files are links to the cached build, which a conversion
+    # without the cache must not change.
+    english = convert(prefilter=convert_csv.Prefilter(languages=("en",)))
+    assert english != output
+    assert convert(cache=cache) == output
+
+
+def test_convert_cache_format_version(dump, tmp_path, monkeypatch):
+    cache = ConversionCache(tmp_path / "cache")
+    nodes_path = tmp_path / "nodes.csv"
+    relationships_path = tmp_path / "relationships.csv"
+
+    convert_csv.convert(str(dump), nodes_path, relationships_path, cache=cache)
+    monkeypatch.setattr(convert_csv, "FORMAT_VERSION", convert_csv.FORMAT_VERSION + 1)
+    convert_csv.convert(str(dump), nodes_path, relationships_path, cache=cache)
+
+    assert len(list(cache.directory.glob("*/build.json"))) == 2
+
+
+def test_convert_cache_fewer_shards(dump, tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    nodes_path = tmp_path / "nodes.csv"
+    relationships_path = tmp_path / "relationships.csv"
+
+    # The second conversions with 4 and 2 shards are cache hits.
+    for shards in (4, 2, 4, 2):
+        convert_csv.convert(
+            str(dump), nodes_path, relationships_path, shards=shards, cache=cache
+        )
+
+    for path in (nodes_path, relationships_path):
+        assert len(sharded_csv.find_shards(path)[1]) == 2
+
+
+def test_convert_deterministic(dump, tmp_path):
+    paths = []
+
+    for name in ("first", "second"):
+        nodes = tmp_path / name / "nodes.csv"
+        nodes.parent.mkdir()
+        convert_csv.convert(
+            str(dump), nodes, nodes.with_name("relationships.csv"), shards=2
+        )
+        paths.append(sorted(nodes.parent.iterdir()))
+
+    assert [path.name for path in paths[0]] == [path.name for path in paths[1]]
+    assert [path.read_bytes() for path in paths[0]] == [
+        path.read_bytes() for path in paths[1]
+    ]
+
+
+@pytest.mark.parametrize("memory_budget", [None, 1])
+def test_convert_csr(dump, tmp_path, memory_budget):
+    nodes, relationships = _convert(
+        dump, tmp_path, "csr", csr_dir=tmp_path / "csr", memory_budget=memory_budget
+    )
+    graph = csr.CsrGraph(tmp_path / "csr")
+
+    assert sorted(graph.uri(i) for i in range(graph.node_count)) == sorted(
+        row[0] for row in nodes[1:]
+    )
+
+    edges = [
+        (
+            graph.uri(start),
+            graph.uri(end),
+            graph.relation_names[relation],
+            pytest.approx(weight),
+        )
+        for start in range(graph.node_count)
+        for end, relation, weight in zip(*graph.successors(start))
+    ]
+    assert sorted(edges) == sorted(
+        (row[0], row[1], row[2], float(row[-2])) for row in relationships[1:]
+    )
+
+
+def test_convert_names(dump, tmp_path):
+    _convert(dump, tmp_path, "names", names_dir=tmp_path / "names")
+    index = name_index.NameIndex(tmp_path / "names")
+
+    assert [(c.label, c.language, c.degree) for c in index.prefix("")] == [
+        ("cat", "en", 3),
+        ("animal", "en", 1),
+        ("house", "en", 1),
+        ("katze", "de", 1),
+    ]
+
+
+@pytest.mark.parametrize("memory_budget", [None, 1])
+def test_convert_equivalence(dump, tmp_path, memory_budget):
+    prefilter = convert_csv.Prefilter(languages=("de", "en", "fr"))
+    members = tmp_path / "members.csv"
+    nodes, _ = _convert(
+        dump,
+        tmp_path,
+        "equivalence",
+        prefilter=prefilter,
+        memory_budget=memory_budget,
+        equivalence_relations=("Synonym",),
+        equivalence_members=members,
+    )
+
+    assert nodes[0][-2:] == ["equivalence_class", "equivalence_class_size:int"]
+    classes = {row[0]: tuple(row[-2:]) for row in nodes[1:]}
+    assert classes["/c/en/cat/noun"] == ("/c/de/katze/noun", "3")
+    assert classes["/c/fr/chat/noun"] == ("/c/de/katze/noun", "3")
+    assert classes["/c/en/animal"] == ("/c/en/animal", "1")
+    assert _read(members) == [
+        ["class", "uri"],
+        ["/c/de/katze/noun", "/c/de/katze/noun"],
+        ["/c/de/katze/noun", "/c/en/cat/noun"],
+        ["/c/de/katze/noun", "/c/fr/chat/noun"],
+    ]
+
+
+def test_convert_snowball(dump, tmp_path):
+    sample_graph = convert_csv.sampling.Sampling(
+        "snowball", size=3, seeds=("/c/de/katze",), fanout=2
+    )
+    nodes, relationships = _convert(
+        dump, tmp_path, "snowball", sample_graph=sample_graph
+    )
+
+    # Katze reaches cat, which adds one of its other neighbors.
+    uris = {row[0] for row in nodes[1:]}
+    assert len(uris) == 3
+    assert {"/c/de/katze/noun", "/c/en/cat/noun"} < uris
+    # The sample is the subgraph induced by these nodes.
+    assert len(relationships) == 3
+    assert all(row[0] in uris and row[1] in uris for row in relationships[1:])
+
+    with pytest.raises(convert_csv.click.ClickException):
+        convert_csv.convert(
+            str(dump),
+            tmp_path / "nodes.csv",
+            tmp_path / "relationships.csv",
+            sample_graph=convert_csv.sampling.Sampling("snowball"),
+        )
+
+
+@pytest.mark.parametrize("strategy", ["stratified", "reservoir"])
+def test_convert_sample_relationships(dump, tmp_path, strategy):
+    sample_graph = convert_csv.sampling.Sampling(strategy, size=20, random_seed=3)
+    first = _convert(dump, tmp_path, "first", sample_graph=sample_graph)
+    second = _convert(dump, tmp_path, "second", sample_graph=sample_graph)
+
+    assert first == second
+    assert sum(float(row[4]) for row in first[1][1:]) <= 20 * 2.0
+
+    if strategy == "stratified":
+        # Every combination of languages and relation is part of the sample.
+        assert [row[2] for row in first[1][1:]] == ["AtLocation", "IsA", "Synonym"]
+
+
+def test_convert_progress(dump, tmp_path, monkeypatch):
+    updates = []
+
+    class Progress:
+        def __init__(self, fraction):
+            pass
+
+        def update(self, rows, **counters):
+            updates.append((rows, counters["kept"]))
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(convert_csv.metrics, "Progress", Progress)
+    monkeypatch.setattr(convert_csv._Lines, "report_every", 100)
+    # No rows are kept and the sample yields nothing until the end.
+    _convert(
+        dump,
+        tmp_path,
+        "progress",
+        prefilter=convert_csv.Prefilter(languages=("es",)),
+        sample_graph=convert_csv.sampling.Sampling("reservoir", size=10),
+    )
+
+    assert updates == [(100, 0), (200, 0), (300, 0), (400, 0)]
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from knowledge_graph.csr import CsrBuilder, CsrGraph
+
+
+@pytest.fixture
+def graph(tmp_path):
+    builder = CsrBuilder()
+
+    for uri in ("/c/en/cat", "/c/en/animal", "/c/de/katze", "/c/en/house"):
+        builder.add_node(uri)
+
+    builder.add_relationship("IsA", "/c/en/cat", "/c/en/animal", 2.0)
+    builder.add_relationship("Synonym", "/c/de/katze", "/c/en/cat", 1.0)
+    builder.add_relationship("AtLocation", "/c/en/cat", "/c/en/house", 0.5)
+    builder.write(tmp_path / "csr")
+
+    return CsrGraph(tmp_path / "csr")
+
+
+def test_nodes(graph):
+    assert graph.node_count == 4
+    assert graph.relationship_count == 3
+    assert [graph.uri(i) for i in range(graph.node_count)] == [
+        "/c/de/katze",
+        "/c/en/animal",
+        "/c/en/cat",
+        "/c/en/house",
+    ]
+    assert graph.node("/c/en/cat") == 2
+    assert isinstance(graph.indices, np.memmap)
+
+    with pytest.raises(KeyError):
+        graph.node("/c/en/dog")
+
+
+def test_adjacency(graph):
+    ends, relations, weights = graph.successors(graph.node("/c/en/cat"))
+    assert [graph.uri(i) for i in ends] == ["/c/en/animal", "/c/en/house"]
+    assert [graph.relation_names[r] for r in relations] == ["IsA", "AtLocation"]
+    assert weights.tolist() == [2.0, 0.5]
+
+    starts, relations, weights = graph.predecessors(graph.node("/c/en/cat"))
+    assert [graph.uri(i) for i in starts] == ["/c/de/katze"]
+    assert [graph.relation_names[r] for r in relations] == ["Synonym"]
+    assert weights.tolist() == [1.0]
+
+    assert len(graph.successors(graph.node("/c/en/house"))[0]) == 0
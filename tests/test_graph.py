@@ -0,0 +1,121 @@
+import pytest
+
+from knowledge_graph.csr import CsrBuilder
+from knowledge_graph.graph import Graph
+
+NODES = ["/c/en/cat", "/c/en/animal", "/c/en/pet", "/c/en/house", "/c/de/katze"]
+RELATIONSHIPS = [
+    ("IsA", "/c/en/cat", "/c/en/animal", 1.0),
+    ("IsA", "/c/en/cat", "/c/en/pet", 4.0),
+    ("IsA", "/c/en/pet", "/c/en/animal", 4.0),
+    ("AtLocation", "/c/en/cat", "/c/en/house", 0.5),
+    ("Synonym", "/c/de/katze", "/c/en/cat", 2.0),
+]
+
+
+@pytest.fixture
+def graph(tmp_path):
+    builder = CsrBuilder()
+
+    for uri in NODES:
+        builder.add_node(uri)
+
+    for relationship in RELATIONSHIPS:
+        builder.add_relationship(*relationship)
+
+    builder.write(tmp_path / "csr")
+
+    return Graph.load(tmp_path / "csr", cache_size=2)
+
+
+def _pairs(graph, queries, nodes):
+    return sorted(
+        (queries[query], uri) for query, uri in zip(nodes[0], graph.uris(nodes[1]))
+    )
+
+
+def test_ids(graph):
+    ids = graph.ids(["/c/en/cat", "/c/en/dog", "/c/en/cat"])
+
+    assert ids[1] == -1
+    assert graph.uris([ids[0]]) == ["/c/en/cat"]
+    assert graph._id_cache.hits == 1
+
+
+def test_neighbors(graph):
+    queries = ["/c/en/cat", "/c/en/animal"]
+    ids = graph.ids(queries)
+
+    found = graph.neighbors(ids)
+    assert _pairs(graph, queries, found) == [
+        ("/c/en/cat", "/c/en/animal"),
+        ("/c/en/cat", "/c/en/house"),
+        ("/c/en/cat", "/c/en/pet"),
+    ]
+
+    found = graph.neighbors(ids, categories=["IsA"], min_weight=2.0)
+    assert _pairs(graph, queries, found) == [("/c/en/cat", "/c/en/pet")]
+
+    found = graph.neighbors(ids, direction="in")
+    assert _pairs(graph, queries, found) == [
+        ("/c/en/animal", "/c/en/cat"),
+        ("/c/en/animal", "/c/en/pet"),
+        ("/c/en/cat", "/c/de/katze"),
+    ]
+
+
+def test_expand(graph):
+    queries = ["/c/de/katze", "/c/en/pet", "/c/de/katze"]
+
+    for _ in range(2):
+        found = graph.expand(graph.ids(queries), 2, categories=["Synonym", "IsA"])
+        reached = {
+            (queries[seed], uri, hops)
+            for seed, uri, hops in zip(found.seed, graph.uris(found.node), found.hops)
+        }
+
+        assert reached == {
+            ("/c/de/katze", "/c/de/katze", 0),
+            ("/c/de/katze", "/c/en/cat", 1),
+            ("/c/de/katze", "/c/en/animal", 2),
+            ("/c/de/katze", "/c/en/pet", 2),
+            ("/c/en/pet", "/c/en/pet", 0),
+            ("/c/en/pet", "/c/en/animal", 1),
+        }
+        assert len(found.node) == 10
+
+    assert graph._expansion_cache.hits == 2
+
+
+def test_shortest_paths(graph):
+    cat, animal, katze = graph.ids(["/c/en/cat", "/c/en/animal", "/c/de/katze"])
+    paths = graph.shortest_paths([(cat, animal), (katze, animal), (animal, cat)])
+
+    assert graph.uris(paths[0].nodes) == ["/c/en/cat", "/c/en/pet", "/c/en/animal"]
+    assert paths[0].cost == pytest.approx(0.5)
+    assert len(paths[1].nodes) == 4
+    assert paths[2] is None
+
+    path = graph.shortest_paths([(animal, cat)], direction="both")[0]
+    assert graph.uris(path.nodes) == ["/c/en/animal", "/c/en/pet", "/c/en/cat"]
+
+    path = graph.shortest_paths([(cat, animal)], min_weight=2.0, max_cost=0.2)[0]
+    assert path is None
+
+
+def test_unknown_nodes(graph):
+    queries = ["/c/en/dog", "/c/de/katze"]
+    ids = graph.ids(queries)
+
+    for direction in ("out", "both"):
+        found = graph.neighbors(ids, direction=direction)
+        assert _pairs(graph, queries, found) == [("/c/de/katze", "/c/en/cat")]
+
+    found = graph.expand(ids, 2)
+    assert found.seed.tolist() == [1, 1, 1, 1, 1]
+
+    dog, cat = graph.ids(["/c/en/dog", "/c/en/cat"])
+    assert graph.shortest_paths([(dog, cat), (cat, dog)], direction="both") == [
+        None,
+        None,
+    ]
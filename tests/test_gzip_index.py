@@ -0,0 +1,39 @@
+import gzip
+
+import pytest
+
+from knowledge_graph import gzip_index
+
+pytest.importorskip("indexed_gzip")
+
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / "rows.csv.gz"
+
+    with gzip.open(path, "wt") as f:
+        for i in range(1000):
+            f.write(f"row\t{i}\n")
+
+    gzip_index.build_index(path, spacing=65536, every=64)
+
+    return path
+
+
+def test_lines(dump):
+    indexed = gzip_index.IndexedDump(dump)
+
+    assert indexed.rows == 1000
+    assert list(indexed.lines(130, 133)) == [
+        b"row\t130\n",
+        b"row\t131\n",
+        b"row\t132\n",
+    ]
+    assert list(indexed.lines(998)) == [b"row\t998\n", b"row\t999\n"]
+
+
+def test_sample(dump):
+    sample = list(gzip_index.IndexedDump(dump).sample(16, chunks=4))
+
+    assert len(sample) == 16
+    assert sample[::4] == [b"row\t0\n", b"row\t256\n", b"row\t512\n", b"row\t768\n"]
@@ -0,0 +1,126 @@
+import gzip
+import threading
+
+import pytest
+
+from knowledge_graph import convert_csv, load_postgres
+
+
+class _Database:
+    """Records the statements and the data of `COPY` of all connections."""
+
+    def __init__(self, fail_copy=False):
+        self.statements = []
+        self.copies = []
+        self.fail_copy = fail_copy
+        self._lock = threading.Lock()
+
+    def connect(self):
+        return _Connection(self)
+
+
+class _Connection:
+    def __init__(self, database):
+        self.database = database
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def cursor(self):
+        return self
+
+    def close(self):
+        self.closed = True
+
+    def execute(self, statement):
+        with self.database._lock:
+            self.database.statements.append(statement)
+
+    def copy_expert(self, statement, stream, size):
+        if self.database.fail_copy:
+            raise RuntimeError("connection lost")
+
+        data = b""
+
+        while True:
+            chunk = stream.read(size)
+
+            if not chunk:
+                break
+
+            data += chunk
+
+        with self.database._lock:
+            self.database.copies.append((statement, data.decode("utf-8")))
+
+
+def _rows(database, table):
+    return sorted(
+        tuple(line.split("\t"))
+        for statement, data in database.copies
+        if statement.startswith(f"COPY {table} ")
+        for line in data.splitlines()
+    )
+
+
+def test_copy_parallel():
+    database = _Database()
+    rows = [(i, f"a\tb{i}", None) for i in range(1005)]
+
+    count = load_postgres.copy_parallel(
+        database.connect, "COPY t FROM STDIN", rows, streams=3, chunk_rows=100
+    )
+
+    assert count == 1005
+    assert len(database.copies) == 3
+    assert _rows(database, "t") == sorted(
+        (str(i), f"a\\tb{i}", "\\N") for i in range(1005)
+    )
+
+
+def test_copy_parallel_error():
+    database = _Database(fail_copy=True)
+    rows = ((i,) for i in range(10000))
+
+    with pytest.raises(RuntimeError):
+        load_postgres.copy_parallel(
+            database.connect, "COPY t FROM STDIN", rows, streams=2, chunk_rows=10
+        )
+
+
+def test_load(tmp_path):
+    dump = tmp_path / "assertions.csv.gz"
+
+    with gzip.open(dump, "wt") as f:
+        f.write("/a/[/r/IsA/,/c/en/cat/n/,/c/en/animal/]\t/r/IsA\t/c/en/cat/n\t")
+        f.write('/c/en/animal\t{"dataset": "/d/wordnet/3.1", "weight": 2.0}\n')
+        f.write("/a/[/r/Synonym/,/c/de/katze/n/,/c/en/cat/n/]\t/r/Synonym\t")
+        f.write('/c/de/katze/n\t/c/en/cat/n\t{"dataset": "/d/wiktionary/de"}\n')
+
+    nodes = tmp_path / "nodes.csv"
+    relationships = tmp_path / "relationships.csv"
+    convert_csv.convert(dump, nodes, relationships, metadata=("dataset",))
+    database = _Database()
+
+    counts = load_postgres.load(database.connect, nodes, relationships, False, 2)
+
+    assert counts == (3, 2)
+    concepts = _rows(database, "concept")
+    ids = {uri: (language, i) for i, uri, _, language, _ in concepts}
+    assert set(ids) == {"/c/en/cat/noun", "/c/en/animal", "/c/de/katze/noun"}
+
+    relations = dict(_rows(database, "relation"))
+    (isa,) = [
+        row for row in _rows(database, "relationship") if relations[row[4]] == "IsA"
+    ]
+    assert isa[:4] == (*ids["/c/en/cat/noun"], *ids["/c/en/animal"])
+    assert isa[5:] == ("2.0", '{"/d/wordnet/3.1"}')
+
+    assert any(
+        "PARTITION OF concept FOR VALUES IN ('de')" in s for s in database.statements
+    )
+    assert database.statements[-1] == "ANALYZE relationship"
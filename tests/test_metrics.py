@@ -0,0 +1,42 @@
+import gzip
+import io
+import json
+
+from click.testing import CliRunner
+
+from knowledge_graph import cli, metrics
+
+
+def test_progress():
+    stream = io.StringIO()
+    progress = metrics.Progress(lambda: 0.25, stream, interval=1e-9)
+    progress.update(1000, kept=10)
+    progress.close()
+
+    line = stream.getvalue()
+    assert line.startswith("1,000 rows | 10 kept | ")
+    assert "25.0% | ETA 0:00:00" in line
+
+
+def test_metrics_json(tmp_path):
+    dump = tmp_path / "assertions.csv.gz"
+
+    with gzip.open(dump, "wt") as f:
+        f.write("/a/[/r/IsA/,/c/en/cat/,/c/en/animal/]\t/r/IsA\t/c/en/cat\t")
+        f.write('/c/en/animal\t{"weight": 1.0}\n')
+
+    report_path = tmp_path / "metrics.json"
+    result = CliRunner().invoke(
+        cli.main,
+        ["--metrics-json", str(report_path), "convert", str(tmp_path), str(dump)],
+    )
+    assert result.exit_code == 0, result.output
+
+    with report_path.open() as f:
+        report = json.load(f)
+
+    assert report["completed"]
+    assert report["counters"]["rows_read"] == 1
+    assert report["counters"]["nodes_written"] == 2
+    assert {"convert.read", "convert.parse", "convert.write"} <= set(report["phases"])
+    assert report["peak_rss_mib"] > 0
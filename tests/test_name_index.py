@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from knowledge_graph.name_index import Completion, NameIndex, NameIndexBuilder
+
+
+@pytest.fixture
+def index(tmp_path):
+    builder = NameIndexBuilder()
+    uris = [
+        "/c/en/cat/n",
+        "/c/en/cat/v",
+        "/c/en/catalog",
+        "/c/en/cart",
+        "/c/en/cat_food",
+        "/c/en/dog",
+        "/c/de/katze/n",
+        "/c/de/käse",
+    ]
+
+    for uri in uris:
+        builder.add_node(uri)
+
+    builder.add_relationship("/c/en/cat/n", "/c/en/dog")
+    builder.add_relationship("/c/en/cat/v", "/c/en/cart")
+    builder.add_relationship("/c/en/cat_food", "/c/en/cat/n")
+    builder.add_relationship("/c/en/dog", "/c/en/cart")
+    builder.add_relationship("/c/de/katze/n", "/c/en/cat/n")
+    builder.write(tmp_path / "names")
+
+    return NameIndex(tmp_path / "names")
+
+
+def test_table(index):
+    assert len(index) == 7
+    assert [index.label(i) for i in range(len(index))] == [
+        "katze",
+        "käse",
+        "cart",
+        "cat",
+        "cat food",
+        "catalog",
+        "dog",
+    ]
+    assert index.languages == {"de": (0, 2), "en": (2, 7)}
+    # The POS variants of cat are folded.
+    assert index.degrees.tolist() == [1, 0, 2, 4, 1, 0, 2]
+    assert isinstance(index.degrees, np.memmap)
+
+
+def test_prefix(index):
+    assert index.prefix("cat") == [
+        Completion("cat", "en", 4),
+        Completion("cat food", "en", 1),
+        Completion("catalog", "en", 0),
+    ]
+    assert index.prefix("Cat_f")[0].name == "cat_food"
+    assert [c.label for c in index.prefix("ca", limit=2)] == ["cat", "cart"]
+    assert [c.label for c in index.prefix("k")] == ["katze", "käse"]
+    assert index.prefix("k", language="en") == []
+    assert index.prefix("k", language="fr") == []
+    assert index.prefix("x") == []
+
+
+def test_fuzzy(index):
+    assert index.fuzzy("cat", 0) == [Completion("cat", "en", 4, 0)]
+    assert index.fuzzy("cat") == [
+        Completion("cat", "en", 4, 0),
+        Completion("cart", "en", 2, 1),
+    ]
+    assert [(c.label, c.distance) for c in index.fuzzy("cta", 2)] == [("cat", 2)]
+    assert [c.label for c in index.fuzzy("kase", language="de")] == ["käse"]
+    assert [c.label for c in index.fuzzy("catfood")] == ["cat food"]
+    assert index.fuzzy("dgo") == []
+    assert [c.label for c in index.fuzzy("dgo", 2, limit=1)] == ["dog"]
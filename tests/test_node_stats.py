@@ -0,0 +1,112 @@
+import gzip
+import random
+from collections import defaultdict
+
+import pytest
+
+from knowledge_graph import convert_csv, node_stats, online_import
+
+LANGUAGES = ["de", "en"]
+RELATIONS = ["/r/IsA", "/r/RelatedTo", "/r/Synonym", "/r/dbpedia/genre"]
+
+
+@pytest.fixture
+def dump(tmp_path):
+    rng = random.Random(0)
+    path = tmp_path / "assertions.csv.gz"
+
+    with gzip.open(path, "wt") as f:
+        for _ in range(2000):
+            rel = rng.choice(RELATIONS)
+            start = f"/c/{rng.choice(LANGUAGES)}/w{int(rng.paretovariate(1.0))}"
+            end = f"/c/{rng.choice(LANGUAGES)}/w{rng.randrange(50)}"
+            weight = rng.choice([0.5, 1.0, 2.0])
+            f.write(f"/a/[{rel}/,{start}/,{end}/]\t{rel}\t{start}\t{end}\t")
+            f.write(f'{{"weight": {weight}}}\n')
+
+    return path
+
+
+def _rows(path, sharded):
+    with online_import.open_rows(path, sharded) as (header, rows):
+        return [dict(zip(header, row)) for row in rows]
+
+
+def _expected(relationships, k):
+    degrees = defaultdict(lambda: defaultdict(int))
+    weights = defaultdict(list)
+    neighbors = defaultdict(dict)
+
+    for row in relationships:
+        start, end = row[":START_ID"], row[":END_ID"]
+        weight = float(row["weight:double"])
+        type_ = row[":TYPE"].replace("/", "_")
+        degrees[start][f"out_degree_{type_}:int"] += 1
+        degrees[end][f"in_degree_{type_}:int"] += 1
+        weights[start, "out"].append(weight)
+        weights[end, "in"].append(weight)
+
+        for node, neighbor in ((start, end), (end, start)):
+            neighbors[node][neighbor] = max(neighbors[node].get(neighbor, 0), weight)
+
+    def top(node):
+        pairs = sorted(neighbors[node].items(), key=lambda p: (-p[1], p[0]))[:k]
+        return ";".join(n for n, _ in pairs), ";".join(str(w) for _, w in pairs)
+
+    return degrees, weights, top
+
+
+@pytest.mark.parametrize("shards", [0, 2])
+def test_from_csv(tmp_path, dump, shards):
+    nodes = tmp_path / "nodes.csv"
+    relationships = tmp_path / "relationships.csv"
+    convert_csv.convert(dump, nodes, relationships, shards=shards)
+    sharded = shards > 0
+    before = _rows(nodes, sharded)
+
+    assert node_stats.from_csv(nodes, relationships, sharded, 3) == len(before)
+
+    after = _rows(nodes, sharded)
+    degrees, weights, top = _expected(_rows(relationships, sharded), 3)
+
+    assert [row["uri:ID"] for row in after] == [row["uri:ID"] for row in before]
+    assert sum(1 for row in after if row["out_degree:int"] != "0") > 10
+
+    for row in after:
+        uri = row["uri:ID"]
+
+        for column, value in row.items():
+            if column.startswith(("out_degree_", "in_degree_")):
+                assert value == (
+                    str(degrees[uri][column]) if degrees[uri][column] else ""
+                )
+
+        for direction in ("out", "in"):
+            values = weights[uri, direction]
+            assert row[f"{direction}_degree:int"] == str(len(values))
+            assert float(row[f"{direction}_weight_sum:double"]) == pytest.approx(
+                sum(values)
+            )
+            assert row[f"{direction}_weight_max:double"] == (
+                str(max(values)) if values else ""
+            )
+
+        assert (row["top_neighbors:string[]"], row["top_weights:double[]"]) == top(uri)
+
+
+@pytest.mark.parametrize("shards", [0, 2])
+def test_from_csv_twice(tmp_path, dump, shards):
+    nodes = tmp_path / "nodes.csv"
+    relationships = tmp_path / "relationships.csv"
+    convert_csv.convert(dump, nodes, relationships, shards=shards)
+    sharded = shards > 0
+
+    def header():
+        with online_import.open_rows(nodes, sharded) as (header, _):
+            return header
+
+    node_stats.from_csv(nodes, relationships, sharded, 3)
+    once = header(), _rows(nodes, sharded)
+    node_stats.from_csv(nodes, relationships, sharded, 3)
+
+    assert (header(), _rows(nodes, sharded)) == once
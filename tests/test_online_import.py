@@ -0,0 +1,78 @@
+import gzip
+
+from neo4j.exceptions import TransientError
+
+from knowledge_graph import convert_csv, online_import
+
+
+class _Driver:
+    """Records the batches and fails the first transaction."""
+
+    def __init__(self):
+        self.batches = []
+        self.failures = 1
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def write_transaction(self, function, query, rows):
+        if self.failures:
+            self.failures -= 1
+            raise TransientError("deadlock")
+
+        self.batches.append((query, rows))
+
+
+def test_parse_converted_csv(tmp_path):
+    dump = tmp_path / "assertions.csv.gz"
+
+    with gzip.open(dump, "wt") as f:
+        f.write("/a/[/r/IsA/,/c/en/cat/n/,/c/en/animal/]\t/r/IsA\t/c/en/cat/n\t")
+        f.write('/c/en/animal\t{"dataset": "/d/wordnet/3.1", "weight": 2.0}\n')
+
+    nodes = tmp_path / "nodes.csv"
+    relationships = tmp_path / "relationships.csv"
+    convert_csv.convert(dump, nodes, relationships)
+
+    with online_import.open_rows(nodes, False) as (header, rows):
+        parsed = list(online_import.parse_rows(header, rows, "LABEL"))
+
+    assert [label for label, _ in parsed] == ["Concept", "Concept"]
+    assert parsed[1][1]["id"] == "/c/en/cat/noun"
+    assert parsed[1][1]["properties"]["uri"] == "/c/en/cat/noun"
+    assert parsed[1][1]["properties"]["pos"] == "noun"
+
+    with online_import.open_rows(relationships, False) as (header, rows):
+        ((category, row),) = online_import.parse_rows(header, rows, "TYPE")
+
+    assert category == "IsA"
+    assert row["start"] == "/c/en/cat/noun"
+    assert row["end"] == "/c/en/animal"
+    assert row["properties"]["weight"] == 2.0
+    assert row["properties"]["source"] == "conceptnet"
+
+
+def test_loader_retries(monkeypatch):
+    monkeypatch.setattr(online_import.time, "sleep", lambda seconds: None)
+    driver = _Driver()
+    loader = online_import.Loader(driver, workers=2, retries=1)
+    rows = ((category, {"id": i}) for i, category in enumerate("ABABA"))
+    progress = []
+
+    count = loader.load(
+        "MERGE (:`%s`)", online_import.batches(rows, 2), progress.append
+    )
+
+    assert count == 5
+    assert progress[-1] == 5
+    assert sorted((query, len(batch)) for query, batch in driver.batches) == [
+        ("MERGE (:`A`)", 1),
+        ("MERGE (:`A`)", 2),
+        ("MERGE (:`B`)", 2),
+    ]
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from knowledge_graph.csr import CsrBuilder, CsrGraph
+from knowledge_graph.pagerank import PersonalizedPageRank
+
+pytest.importorskip("scipy")
+
+URIS = ["/c/de/katze", "/c/en/animal", "/c/en/cat", "/c/en/dog", "/c/en/house"]
+
+
+@pytest.fixture
+def graph(tmp_path):
+    builder = CsrBuilder()
+
+    for uri in URIS:
+        builder.add_node(uri)
+
+    builder.add_relationship("IsA", "/c/en/cat", "/c/en/animal", 2.0)
+    builder.add_relationship("IsA", "/c/en/dog", "/c/en/animal", 2.0)
+    builder.add_relationship("Synonym", "/c/de/katze", "/c/en/cat", 1.0)
+    builder.add_relationship("AtLocation", "/c/en/cat", "/c/en/house", 0.5)
+    builder.add_relationship("AtLocation", "/c/en/dog", "/c/en/house", 1.0)
+    builder.write(tmp_path / "csr")
+
+    return CsrGraph(tmp_path / "csr")
+
+
+def _exact(graph, seeds, damping=0.85):
+    """Solve the random walk with restart as a linear system."""
+
+    weights = np.zeros((graph.node_count, graph.node_count))
+
+    for node in range(graph.node_count):
+        ends, _, edge_weights = graph.successors(node)
+        weights[node, ends] += edge_weights
+        weights[ends, node] += edge_weights
+
+    transitions = weights / weights.sum(axis=1, keepdims=True)
+    restart = np.zeros(graph.node_count)
+    restart[[graph.node(uri) for uri in seeds]] = 1 / len(seeds)
+
+    return (1 - damping) * np.linalg.solve(
+        np.eye(graph.node_count) - damping * transitions.T, restart
+    )
+
+
+def test_scores(graph):
+    ranking = PersonalizedPageRank(graph, tolerance=1e-10)
+    seed_sets = [["/c/en/cat"], ["/c/de/katze", "/c/en/dog"]]
+    scores = ranking.scores(seed_sets)
+
+    assert scores.shape == (5, 2)
+    assert scores.sum(axis=0) == pytest.approx([1, 1])
+
+    for i, seeds in enumerate(seed_sets):
+        assert scores[:, i] == pytest.approx(_exact(graph, seeds), abs=1e-6)
+
+
+def test_blocks(graph):
+    seed_sets = [["/c/en/cat"], ["/c/de/katze", "/c/en/dog"], {"/c/en/house": 1}]
+    ranking = PersonalizedPageRank(graph, tolerance=1e-10, block_size=2)
+
+    assert ranking.scores(seed_sets) == pytest.approx(
+        PersonalizedPageRank(graph, tolerance=1e-10).scores(seed_sets), abs=1e-7
+    )
+
+
+def test_top_k(graph):
+    ranking = PersonalizedPageRank(graph)
+    top = ranking.top_k(["/c/de/katze"], k=3)
+
+    assert [uri for uri, _ in top] == ["/c/en/cat", "/c/en/animal", "/c/en/dog"]
+    assert top[0][1] > top[1][1] > top[2][1]
+    assert [uri for uri, _ in ranking.top_k(["/c/de/katze"], 3, True)] == [
+        "/c/en/cat",
+        "/c/en/animal",
+        "/c/de/katze",
+    ]
+    assert ranking.top_k_batch([["/c/de/katze"], ["/c/en/dog"]], k=3)[0] == top
+
+    with pytest.raises(KeyError):
+        ranking.top_k(["/c/en/bird"])
+
+
+def test_relations(graph):
+    ranking = PersonalizedPageRank(graph, relations=["IsA", "Synonym"])
+
+    assert [uri for uri, _ in ranking.top_k(["/c/en/cat"])] == [
+        "/c/en/animal",
+        "/c/en/dog",
+        "/c/de/katze",
+    ]
+
+    ranking = PersonalizedPageRank(graph, exclude_relations=["Synonym"])
+    assert ranking.top_k(["/c/de/katze"]) == []
+
+    # The walk only follows the direction of the relationships.
+    ranking = PersonalizedPageRank(graph, directed=True)
+    assert [uri for uri, _ in ranking.top_k(["/c/en/cat"])] == [
+        "/c/en/animal",
+        "/c/en/house",
+    ]
+
+
+def test_warm_start(graph):
+    ranking = PersonalizedPageRank(graph, warm_after=1)
+    cold = PersonalizedPageRank(graph).scores([{"/c/de/katze": 1, "/c/en/dog": 3}])
+    ranking.scores([["/c/de/katze", "/c/en/house"], ["/c/en/dog"]])
+    warm = ranking.scores([{"/c/de/katze": 1, "/c/en/dog": 3}])
+
+    # The results of both seeds are cached and, since every node has
+    # relationships in both directions, their combination is the result.
+    assert ranking.iterations == 1
+    assert warm == pytest.approx(cold, abs=1e-6)
+
+
+def test_warm_start_directed(graph):
+    seeds = {"/c/de/katze": 1, "/c/en/dog": 3}
+    ranking = PersonalizedPageRank(graph, directed=True, warm_after=1)
+    ranking.scores([["/c/de/katze", "/c/en/house"], ["/c/en/dog"]])
+
+    # Walks restart at both seeds from the nodes without outgoing relationships,
+    # so the combination is only a start, but the result is the same.
+    assert ranking.scores([seeds]) == pytest.approx(
+        PersonalizedPageRank(graph, directed=True).scores([seeds]), abs=1e-6
+    )
+
+
+def test_cache(graph):
+    ranking = PersonalizedPageRank(graph, cache_size=2)
+    ranking.scores([["/c/en/cat"]])
+    iterations = ranking.iterations
+    ranking.scores([["/c/en/dog"], ["/c/en/cat"]])
+
+    assert ranking.iterations == iterations
+    assert len(ranking._cache) == 2
+
+    ranking.scores([["/c/en/house"], ["/c/en/animal"]])
+    assert len(ranking._cache) == 2
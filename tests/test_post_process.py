@@ -0,0 +1,87 @@
+import functools
+import io
+
+from knowledge_graph import metrics, post_process
+
+
+class _Result(list):
+    def consume(self):
+        pass
+
+
+class _Session:
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self.statements = []
+
+    def run(self, statement):
+        if statement.startswith("CALL db.indexes()"):
+            return _Result(self.indexes)
+
+        self.statements.append(statement)
+        return _Result()
+
+
+def _index(name, properties, uniqueness="NONUNIQUE", type="BTREE"):
+    return {
+        "name": name,
+        "type": type,
+        "uniqueness": uniqueness,
+        "labelsOrTypes": ["Concept"],
+        "properties": properties,
+    }
+
+
+def test_create_skips_existing():
+    session = _Session([_index("index_1", ["name"])])
+
+    assert not post_process.create(session, post_process.Index("names", ("name",)))
+    assert post_process.create(session, post_process.Index("pos", ("pos",)))
+    assert session.statements == ["CREATE INDEX pos FOR (n:Concept) ON (n.pos)"]
+
+
+def test_create_replaces_uri_index():
+    session = _Session([_index("index_2", ["uri"])])
+
+    assert post_process.create(session, post_process.uri_constraint)
+    assert session.statements == [
+        "DROP INDEX index_2",
+        post_process.uri_constraint.statement(),
+    ]
+
+
+def test_create_fulltext():
+    session = _Session([_index("concept_name", ["name"])])
+    index = post_process.Index("concept_name_fulltext", ("name",), "fulltext")
+
+    assert post_process.create(session, index)
+    assert session.statements == [
+        "CALL db.index.fulltext.createNodeIndex('concept_name_fulltext',"
+        " ['Concept'], ['name'])"
+    ]
+
+
+def test_await_online(monkeypatch):
+    states = iter(
+        [
+            [("ONLINE", 100.0), ("POPULATING", 50.0)],
+            [("ONLINE", 100.0), ("ONLINE", 100.0)],
+        ]
+    )
+
+    class Session:
+        def run(self, statement):
+            return [
+                {"name": f"index_{i}", "state": state, "populationPercent": percent}
+                for i, (state, percent) in enumerate(next(states))
+            ]
+
+    stream = io.StringIO()
+    progress = functools.partial(metrics.Progress, stream=stream, interval=1e-9)
+    monkeypatch.setattr(metrics, "Progress", progress)
+    monkeypatch.setattr(post_process.time, "sleep", lambda seconds: None)
+    post_process.await_online(Session(), timeout=60)
+
+    line = stream.getvalue()
+    assert line.startswith("1 indexes | 1 populating | ")
+    assert "75.0% | ETA" in line
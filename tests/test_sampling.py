@@ -0,0 +1,55 @@
+import random
+from collections import Counter
+
+from knowledge_graph import sampling
+
+
+def test_reservoir_is_uniform():
+    counts = Counter()
+
+    for seed in range(2000):
+        sample = sampling.Reservoir(2, random.Random(seed))
+
+        for i in range(10):
+            sample.add(i)
+
+        counts.update(sample)
+
+    assert sorted(counts) == list(range(10))
+    assert max(counts.values()) < 1.25 * min(counts.values())
+
+
+def test_stratified_sample_keeps_rare_strata():
+    items = [("common", i) for i in range(10000)] + [("rare", i) for i in range(3)]
+    random.Random(1).shuffle(items)
+    sample = sampling.StratifiedSample(100, random.Random(0), key=lambda i: i[0])
+
+    for item in items:
+        sample.add(item)
+
+    selected = list(sample)
+
+    assert Counter(stratum for stratum, _ in selected) == {"common": 99, "rare": 1}
+    # The sample keeps the order of the input.
+    assert sorted(selected, key=items.index) == selected
+
+
+def test_stratified_sample_with_more_strata_than_items():
+    sample = sampling.StratifiedSample(2, random.Random(0), key=lambda i: i)
+
+    for i in [1, 1, 1, 2, 2, 3]:
+        sample.add(i)
+
+    assert list(sample) == [1, 2]
+
+
+def test_snowball_is_reproducible():
+    rng = random.Random(0)
+    edges = [(rng.randrange(500), rng.randrange(500)) for _ in range(3000)]
+
+    def run(seed):
+        return sampling.snowball(edges, lambda n: n == 0, 50, random.Random(seed), 5)
+
+    assert len(run(0)) == 50
+    assert run(0) == run(0)
+    assert run(0) != run(1)
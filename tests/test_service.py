@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from knowledge_graph import service
+from knowledge_graph.client import Neighbor
+
+
+class _Client:
+    """Answers lookups in memory and records the batches."""
+
+    def __init__(self):
+        self.driver = self
+        self.batches = []
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, query):
+        return self
+
+    def single(self):
+        return {"generation": "a"}
+
+    def neighbors(self, uris, relations, direction):
+        self.batches.append(list(uris))
+        return [[Neighbor("IsA", uri + "/parent", 1.0)] for uri in uris]
+
+    def weights(self, pairs, relations):
+        self.batches.append(list(pairs))
+        return [{"IsA": 2.0} for _ in pairs]
+
+
+def test_coalescing_and_batching():
+    client = _Client()
+    graph = service.Service(client, max_delay=0.01)
+
+    async def requests():
+        uris = ["/c/en/a", "/c/en/b", "/c/en/a", "/c/en/a"]
+        results = await asyncio.gather(
+            *(graph.lookup("/neighbors", {"uri": [uri]}) for uri in uris)
+        )
+        cached = await graph.lookup("/neighbors", {"uri": ["/c/en/b"]})
+
+        return results, cached
+
+    results, cached = asyncio.run(requests())
+    graph.close()
+
+    assert client.batches == [["/c/en/a", "/c/en/b"]]
+    assert results[0] == results[2] == results[3]
+    assert cached == [{"relation": "IsA", "uri": "/c/en/b/parent", "weight": 1.0}]
+
+    metrics = graph.metrics()
+    assert metrics["coalesced"] == 2
+    assert metrics["batches"] == 1
+    assert metrics["cache"]["hits"] == 1
+
+
+def test_http():
+    client = _Client()
+    graph = service.Service(client, max_delay=0.001)
+
+    async def request(port, target):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {target} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+
+        return int(head.split()[1]), json.loads(body)
+
+    async def requests():
+        server = await graph.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async with server:
+            return [
+                await request(port, "/weights?start=/c/en/a&end=/c/en/b"),
+                await request(port, "/weights?start=/c/en/a"),
+                await request(port, "/unknown"),
+                await request(port, "/other-unknown"),
+                await request(port, "/metrics"),
+            ]
+
+    responses = asyncio.run(requests())
+    graph.close()
+
+    assert responses[0] == (200, {"IsA": 2.0})
+    assert responses[1][0] == 400
+    assert responses[2][0] == 404
+    status, metrics = responses[4]
+    assert status == 200
+    assert metrics["latency"]["/weights"]["count"] == 2
+    assert metrics["latency"]["other"]["count"] == 2
+    assert sorted(metrics["latency"]) == ["/weights", "other"]
@@ -0,0 +1,23 @@
+from benchmarks import synthetic
+from knowledge_graph import convert_csv
+
+
+def test_generate(tmp_path):
+    paths = [tmp_path / "a.csv.gz", tmp_path / "b.csv.gz"]
+
+    for path in paths:
+        synthetic.generate(path, 2000)
+
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+
+    rows = list(synthetic.assertions(2000))
+    assert len(rows) == 2000
+    assert len({row[0] for row in rows}) < len(rows)
+    assert any(row[1].startswith("/r/dbpedia/") for row in rows)
+    assert any(row[3].startswith("http://") for row in rows)
+
+    nodes_path = tmp_path / "nodes.csv"
+    convert_csv.convert(str(paths[0]), nodes_path, tmp_path / "relationships.csv")
+
+    with nodes_path.open() as f:
+        assert len(f.readlines()) > 1
@@ -0,0 +1,83 @@
+import pytest
+
+from benchmarks import synthetic
+from knowledge_graph import uri
+from knowledge_graph.uri_codec import UriCodec
+
+CONCEPTS = [
+    "/c/en/cat",
+    "/c/en/cat/n",
+    "/c/en/cat/n/wn/animal",
+    "/c/de/größe_ändern/v",
+    "/c/en/cat/",
+    "//c/en/cat",
+    "/c/en//n",
+]
+ASSERTIONS = [
+    "/a/[/r/IsA/,/c/en/cat/,/c/en/animal/]",
+    "/a/[/r/IsA/,/c/en/cat//,/c/en/animal/]",
+    "/a/[/r/dbpedia/genre/,/c/en/jazz/n/wn/music/,/c/en/music/]",
+]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return [row for row in synthetic.assertions(5000) if uri.is_concept(row[3])]
+
+
+def _split_concept(concept):
+    pieces = uri.split_uri(concept)
+
+    return (
+        pieces[1],
+        pieces[2],
+        pieces[3] if len(pieces) > 3 else None,
+        "/".join(pieces[4:]) if len(pieces) > 4 else None,
+    )
+
+
+def test_concepts(rows):
+    codec = UriCodec(cache_size=16)
+    concepts = [row[2] for row in rows] + [row[3] for row in rows] + CONCEPTS
+    columns = codec.parse_concepts(concepts)
+
+    assert list(zip(*columns)) == [_split_concept(c) for c in concepts]
+    assert [codec.parse_concept(c) for c in concepts] == list(zip(*columns))
+
+    expected = []
+
+    for language, text, pos, disambiguation in zip(*columns):
+        more = [] if pos is None else [pos]
+
+        if pos is not None and disambiguation is not None:
+            more.extend(disambiguation.split("/"))
+
+        expected.append(uri.concept_uri(language, text, *more))
+
+    assert codec.build_concepts(*columns) == expected
+    assert codec.build_concepts(["/en/"], ["cat"]) == [uri.concept_uri("/en/", "cat")]
+    assert codec.build_concept("en", "cat", "n") == uri.concept_uri("en", "cat", "n")
+
+    with pytest.raises(ValueError):
+        codec.parse_concepts(["/r/IsA"])
+
+    with pytest.raises(AssertionError):
+        codec.build_concepts(["en"], ["not normalized"])
+
+
+def test_assertions(rows):
+    codec = UriCodec()
+    uris = [row[0] for row in rows] + ASSERTIONS
+    columns = codec.parse_assertions(uris)
+
+    assert [list(c) for c in zip(*columns)] == [
+        uri.parse_compound_uri(a)[1] for a in uris
+    ]
+    assert codec.build_assertions(*columns) == [
+        uri.assertion_uri(*c) for c in zip(*columns)
+    ]
+    with pytest.raises(ValueError):
+        codec.parse_assertions(["/a/[/r/IsA/,/c/en/,/,/c/en/comma/]"])
+
+    assert codec.split(CONCEPTS) == [uri.split_uri(c) for c in CONCEPTS]
+    assert codec.join([["/c/", "en", "cat/"]]) == [uri.join_uri("/c/", "en", "cat/")]